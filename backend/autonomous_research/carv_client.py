@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from autonomous_research.decoding import loads, decode_result
+from utils import metrics
+
+# Corrected: Removed trailing slash to prevent double slashes in the final URL
+CARV_DATA_API_BASE_URL = "https://api.carv.io"
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    `rate` tokens are added per second up to `capacity`. Callers reserve a token and
+    get back how long they must wait, so the same bucket works for threads and asyncio.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes one token and returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CarvClient:
+    """
+    Client for the CARV D.A.T.A. Framework SQL API.
+
+    A single requests.Session keeps TLS connections alive and pooled across queries.
+    `query_many` runs a batch of SQL queries concurrently under a concurrency limit and
+    a token-bucket rate limiter, so a batch takes roughly as long as its slowest query.
+    An optional QueryCache answers repeated queries without a round trip, and an optional
+    LocalMirror answers queries over mirrored date partitions without touching the API.
+    """
+
+    def __init__(self, api_key, base_url=CARV_DATA_API_BASE_URL, max_connections=10,
+                 rate_limit=5.0, burst=None, timeout=30, cache=None, local=None):
+        self.api_key = api_key
+        self.cache = cache
+        self.local = local
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate_limit, burst) if rate_limit else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def query(self, sql_query: str, result_format: str = "raw"):
+        """
+        Sends a SQL query to the CARV D.A.T.A. Framework backend and returns the result.
+
+        Args:
+            sql_query (str): The SQL query string to execute.
+            result_format (str): 'raw' for the response dict, 'dataframe' for a typed
+                                 DataFrame or 'numpy' for a dict of typed column arrays.
+
+        Returns:
+            dict | pd.DataFrame | None: The query result (column_infos, rows by default)
+                                        or None if an error occurred.
+        """
+        return decode_result(self._query_raw(sql_query), result_format)
+
+    def _query_local(self, sql_query):
+        """
+        Returns (handled, result): the mirror's result if it covers sql_query, and (True, None)
+        in offline mode when it does not, so no request is sent.
+        """
+        if self.local is None:
+            return False, None
+        if self.local.can_answer(sql_query):
+            metrics.count("carv_local_hits")
+            try:
+                return True, self.local.query_raw(sql_query)
+            except Exception as e:
+                print(f"Local query failed: {e}")
+                if self.local.offline:
+                    return True, None
+                return False, None
+        if self.local.offline:
+            print("Offline mode: the local mirror does not cover this query; it was not sent to the CARV API.")
+            return True, None
+        return False, None
+
+    def _query_raw(self, sql_query, use_local=True):
+        if use_local:
+            handled, result = self._query_local(sql_query)
+            if handled:
+                return result
+
+        if self.cache is not None:
+            cached = self.cache.get(sql_query)
+            if cached is not None:
+                print("Query served from cache.")
+                metrics.count("carv_cache_hits")
+                return cached
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        result = self._send(sql_query)
+
+        # Errors are not cached so the next call retries
+        if self.cache is not None and result is not None:
+            self.cache.set(sql_query, result)
+        return result
+
+    def _send(self, sql_query):
+        """Posts one query over the pooled session (no rate limiting)."""
+        with metrics.timer("carv_query"):
+            result = self._post(sql_query)
+        if result is None:
+            metrics.count("carv_query_errors")
+        return result
+
+    def _post(self, sql_query):
+        if not self.api_key:
+            print("Error: CARV_DATA_API_KEY is not set. Cannot query CARV D.A.T.A. API.")
+            return None
+
+        # Construct the full URL without a double slash
+        query_endpoint = f"{self.base_url}/sql_query"
+        payload = {
+            "sql_content": sql_query
+        }
+
+        print(f"\nAttempting to query CARV D.A.T.A. API with SQL:\n{sql_query}")
+        print(f"Endpoint: {query_endpoint}")
+
+        try:
+            response = self.session.post(query_endpoint, json=payload, timeout=self.timeout)
+            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+
+            response_data = loads(response.content)
+
+            if response_data.get("code") == 0 and response_data.get("msg") == "Success":
+                print("Query successful!")
+                return response_data.get("data")
+            else:
+                print(f"CARV API returned an error: {response_data.get('msg', 'Unknown error')}")
+                return None
+
+        except requests.exceptions.HTTPError as e:
+            print(f"HTTP Error querying CARV API: {e.response.status_code} - {e.response.text}")
+            return None
+        except requests.exceptions.ConnectionError as e:
+            print(f"Connection Error querying CARV API: {e}")
+            return None
+        except requests.exceptions.Timeout as e:
+            print(f"Timeout Error querying CARV API: {e}")
+            return None
+        except requests.exceptions.RequestException as e:
+            print(f"An unexpected Request Error occurred: {e}")
+            return None
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON response from CARV API: {e}")
+            print(f"Raw response: {response.text}")
+            return None
+
+    async def query_many_async(self, sql_queries, concurrency=None, result_format="raw", use_local=True):
+        """
+        Runs many SQL queries concurrently and returns their results in input order.
+
+        Args:
+            sql_queries (list[str]): The queries to run.
+            concurrency (int | None): Maximum in-flight queries, defaults to max_connections.
+            result_format (str): 'raw', 'dataframe' or 'numpy', as for query().
+            use_local (bool): Let the local mirror answer the queries it covers.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def run_one(sql_query):
+            if use_local:
+                handled, result = await asyncio.to_thread(self._query_local, sql_query)
+                if handled:
+                    return result
+            if self.cache is not None:
+                cached = self.cache.get(sql_query)
+                if cached is not None:
+                    metrics.count("carv_cache_hits")
+                    return cached
+            async with semaphore:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async()
+                # Blocking HTTP runs in a worker thread over the shared pooled session
+                result = await asyncio.to_thread(self._send, sql_query)
+            if self.cache is not None and result is not None:
+                self.cache.set(sql_query, result)
+            return result
+
+        results = await asyncio.gather(*(run_one(q) for q in sql_queries))
+        return [decode_result(result, result_format) for result in results]
+
+    def query_many(self, sql_queries, concurrency=None, result_format="raw", use_local=True):
+        """Synchronous wrapper around query_many_async."""
+        return asyncio.run(self.query_many_async(sql_queries, concurrency, result_format, use_local))
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,92 @@
+import json
+
+# orjson parses large responses several times faster than the stdlib; fall back when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RESULT_FORMATS = ("raw", "dataframe", "numpy")
+
+# CARV/Trino column types -> NumPy dtype names. NumPy and pandas are imported on first decode,
+# so clients that only need raw results never pay for them.
+_TYPE_MAP = {
+    'tinyint': 'int64', 'smallint': 'int64', 'integer': 'int64', 'int': 'int64', 'bigint': 'int64',
+    'hugeint': 'int64', 'ubigint': 'int64', 'uinteger': 'int64', # DuckDB (local mirror) integer types
+    'real': 'float64', 'double': 'float64', 'float': 'float64', 'decimal': 'float64',
+    'boolean': 'bool',
+}
+_INT64_MAX = 2**63 - 1
+
+
+def loads(content):
+    """Parses a JSON response body (bytes or str)."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _column_spec(info, index):
+    """Returns (name, type) for a column_infos entry, which may be a name or a {name, type} dict."""
+    if isinstance(info, dict):
+        name = info.get('name') or info.get('column_name') or f"col_{index}"
+        col_type = info.get('type') or info.get('data_type')
+        return name, (col_type or '').lower().split('(')[0]
+    return str(info), ''
+
+
+def _convert(values, col_type):
+    """Converts one column of raw values to a typed array without per-value Python casts."""
+    import numpy as np
+    import pandas as pd
+
+    dtype = _TYPE_MAP.get(col_type)
+    if dtype == 'bool':
+        return pd.Series(values).astype(str).str.lower().eq('true').to_numpy()
+    if dtype is None and col_type:
+        # Declared non-numeric type (varchar, timestamp, ...)
+        return np.asarray(values, dtype=object)
+
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+    if dtype is None and numeric.notna().sum() != sum(v is not None for v in values):
+        # Untyped columns only become numeric when every non-null value parses
+        return np.asarray(values, dtype=object)
+
+    if numeric.dtype.kind in 'iu' and (len(numeric) == 0 or numeric.max() <= _INT64_MAX):
+        return numeric.astype(np.int64).to_numpy()
+    # Values beyond int64 (e.g. wei totals), decimals and nulls use float64
+    return numeric.astype(np.float64).to_numpy()
+
+
+def decode_columns(data):
+    """
+    Decodes a CARV result ({'column_infos': [...], 'rows': [{'items': [...]}, ...]})
+    into an ordered dict of column name -> NumPy array.
+    """
+    column_infos = data.get('column_infos') or []
+    rows = data.get('rows') or []
+    items = [row['items'] for row in rows]
+
+    num_columns = max(len(column_infos), len(items[0]) if items else 0)
+    specs = [_column_spec(column_infos[i] if i < len(column_infos) else f"col_{i}", i) for i in range(num_columns)]
+
+    # Transpose rows to columns in one pass
+    columns = list(zip(*items)) if items else [()] * num_columns
+    return {name: _convert(list(values), col_type) for (name, col_type), values in zip(specs, columns)}
+
+
+def to_dataframe(data):
+    """Decodes a CARV result into a typed pandas DataFrame."""
+    import pandas as pd
+    return pd.DataFrame(decode_columns(data))
+
+
+def decode_result(data, result_format="raw"):
+    """Returns data unchanged ('raw'), as a DataFrame ('dataframe') or as NumPy columns ('numpy')."""
+    if data is None or result_format == "raw":
+        return data
+    if result_format == "dataframe":
+        return to_dataframe(data)
+    if result_format == "numpy":
+        return decode_columns(data)
+    raise ValueError(f"Unknown result format '{result_format}'. Expected one of {RESULT_FORMATS}.")
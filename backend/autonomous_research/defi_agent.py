@@ -1,82 +1,246 @@
-import pandas as pd
+from __future__ import annotations
+
 import json
 import os
-import requests
-import time
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if __name__ == "__main__":
+    # Run as a script: put the backend directory on the path before the imports below
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from autonomous_research.carv_client import CarvClient, CARV_DATA_API_BASE_URL
+from autonomous_research.incremental import IncrementalQuery, IncrementalStore
+from autonomous_research.local_sql import LocalMirror
+from autonomous_research.streaming import DEFAULT_WHALE_THRESHOLD, WhaleDetector
+from autonomous_research.query_cache import QueryCache
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # --- Configuration ---
 # IMPORTANT: Replace with your actual CARV D.A.T.A. Framework API key.
 # This should be obtained from CARV directly (e.g., via their Discord or developer@carv.io).
 # It's highly recommended to set this as an an environment variable.
-# CARV_DATA_API_KEY = os.getenv("CARV_DATA_API_KEY", "")
-# Corrected: Removed trailing slash to prevent double slashes in the final URL
-CARV_DATA_API_BASE_URL = "https://api.carv.io" 
+CARV_DATA_API_KEY = os.getenv("CARV_DATA_API_KEY", "")
+# Directory for local run artifacts (query cache, incremental store), independent of the working directory
+AGENTFORGE_RUN_DIR = os.getenv("AGENTFORGE_RUN_DIR") or str(Path(__file__).resolve().parent.parent / "runs")
+# SQLite file backing the query result cache; set to an empty string to keep the cache in memory only
+CARV_QUERY_CACHE_PATH = os.getenv("CARV_QUERY_CACHE_PATH", os.path.join(AGENTFORGE_RUN_DIR, "carv_query_cache.db"))
+
+# SQLite file holding per-day partial aggregates for incremental runs
+CARV_INCREMENTAL_STORE_PATH = os.getenv("CARV_INCREMENTAL_STORE_PATH",
+                                        os.path.join(AGENTFORGE_RUN_DIR, "carv_incremental.db"))
+
+# Directory of local Parquet mirrors of CARV tables (see local_sql.py); empty disables the mirror
+CARV_MIRROR_PATH = os.getenv("CARV_MIRROR_PATH", "")
+# Answer queries only from the mirror and never call the API (e.g. in CI)
+CARV_OFFLINE = os.getenv("CARV_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# One pooled client per API key, so repeated queries reuse keep-alive connections
+_clients = {}
+_incremental_store = None
+_local_mirror = None
+
+def get_local_mirror() -> LocalMirror | None:
+    """Returns the shared local mirror, or None when CARV_MIRROR_PATH is not set."""
+    global _local_mirror
+    if _local_mirror is None and CARV_MIRROR_PATH:
+        _local_mirror = LocalMirror(CARV_MIRROR_PATH, offline=CARV_OFFLINE)
+    return _local_mirror
+
+def get_carv_client(api_key: str) -> CarvClient:
+    """Returns the shared pooled CarvClient for api_key, creating it on first use."""
+    if api_key not in _clients:
+        cache = QueryCache(path=CARV_QUERY_CACHE_PATH or None)
+        _clients[api_key] = CarvClient(api_key, cache=cache, local=get_local_mirror())
+    return _clients[api_key]
 
 # --- Function to Query CARV D.A.T.A. Framework ---
-def query_carv_data(sql_query: str, api_key: str) -> dict | None:
+def query_carv_data(sql_query: str, api_key: str, result_format: str = "raw") -> dict | pd.DataFrame | None:
     """
     Sends a SQL query to the CARV D.A.T.A. Framework backend and returns the result.
 
     Args:
         sql_query (str): The SQL query string to execute.
         api_key (str): Your CARV D.A.T.A. Framework API key.
+        result_format (str): 'raw' (default) for the response dict, 'dataframe' for a typed
+                             DataFrame or 'numpy' for a dict of typed column arrays.
+
+    Returns:
+        dict | pd.DataFrame | None: The query result (column_infos, rows by default)
+                                    or None if an error occurred.
+    """
+    return get_carv_client(api_key).query(sql_query, result_format)
+
+def query_carv_data_many(sql_queries: list, api_key: str, concurrency: int | None = None,
+                         result_format: str = "raw") -> list:
+    """
+    Runs several SQL queries concurrently over the pooled client.
 
     Returns:
-        dict | None: A dictionary containing the query result (column_infos, rows)
-                     or None if an error occurred.
+        list: One result per query (see query_carv_data), in input order.
+    """
+    return get_carv_client(api_key).query_many(sql_queries, concurrency, result_format)
+
+def get_incremental_store() -> IncrementalStore:
+    """Returns the shared store of per-day partial aggregates, opening it on first use."""
+    global _incremental_store
+    if _incremental_store is None:
+        _incremental_store = IncrementalStore(CARV_INCREMENTAL_STORE_PATH or None)
+    return _incremental_store
+
+# --- Incremental Queries ---
+# Addresses kept per day in the top-address partials
+TOP_ADDRESSES_PER_DAY = 1000
+
+# Per-day partials of the rolling top-address ranking: the TOP_ADDRESSES_PER_DAY most active
+# addresses of each day with their transaction counts. Keeping every address would pull hundreds
+# of thousands of rows per day. The merged totals are therefore approximate: a day where an
+# address is not in the top list adds nothing to its total, so totals are lower bounds that are
+# short by at most that day's cut-off count. When each of the window's top 5 addresses is in every
+# day's top list (the busiest addresses are far above the 1000th), the ranking and totals match
+# the full 7-day query exactly.
+TOP_ADDRESSES_QUERY = IncrementalQuery(
+    name="eth_address_activity",
+    partial_sql=f"""
+    WITH address_activity AS (
+        SELECT date, from_address AS address, COUNT(*) AS tx_count
+        FROM eth.transactions
+        WHERE date_parse(date, '%Y-%m-%d') BETWEEN date_parse('{{start}}', '%Y-%m-%d') AND date_parse('{{end}}', '%Y-%m-%d')
+        GROUP BY date, from_address
+        UNION ALL
+        SELECT date, to_address AS address, COUNT(*) AS tx_count
+        FROM eth.transactions
+        WHERE date_parse(date, '%Y-%m-%d') BETWEEN date_parse('{{start}}', '%Y-%m-%d') AND date_parse('{{end}}', '%Y-%m-%d')
+        GROUP BY date, to_address
+    ),
+    daily AS (
+        SELECT date AS day, address, SUM(tx_count) AS tx_count
+        FROM address_activity
+        GROUP BY date, address
+    )
+    SELECT day, address, tx_count
+    FROM (
+        SELECT day, address, tx_count,
+            ROW_NUMBER() OVER (PARTITION BY day ORDER BY tx_count DESC, address) AS day_rank
+        FROM daily
+    ) ranked
+    WHERE day_rank <= {TOP_ADDRESSES_PER_DAY};
+    """,
+    columns=[("day", "TEXT"), ("address", "TEXT"), ("tx_count", "INTEGER")],
+    merge_sql="""
+    SELECT address, SUM(tx_count) AS total_transactions
+    FROM {table}
+    WHERE day BETWEEN :start AND :end
+    GROUP BY address
+    ORDER BY total_transactions DESC
+    LIMIT 5
+    """,
+)
+
+def token_transfers_query(token_address: str) -> IncrementalQuery:
+    """Per-day partials of the token transfer summary (count, sum, max, min, max_by) for one token."""
+    return IncrementalQuery(
+        name=f"token_transfers_{token_address.lower()}",
+        partial_sql=f"""
+        SELECT
+            date AS day,
+            COUNT(*) AS transaction_count,
+            SUM(value) AS total_transaction_value,
+            MAX(value) AS max_transaction_value,
+            MIN(value) AS min_transaction_value,
+            MAX_BY(from_address, value) AS max_value_from_address,
+            MAX_BY(to_address, value) AS max_value_to_address
+        FROM eth.token_transfers
+        WHERE token_address = '{token_address}'
+            AND date_parse(date, '%Y-%m-%d') BETWEEN date_parse('{{start}}', '%Y-%m-%d') AND date_parse('{{end}}', '%Y-%m-%d')
+        GROUP BY date;
+        """,
+        columns=[("day", "TEXT"), ("transaction_count", "INTEGER"), ("total_transaction_value", "NUMERIC"),
+                 ("max_transaction_value", "NUMERIC"), ("min_transaction_value", "NUMERIC"),
+                 ("max_value_from_address", "TEXT"), ("max_value_to_address", "TEXT")],
+        merge_sql="""
+        WITH days AS (SELECT * FROM {table} WHERE day BETWEEN :start AND :end)
+        SELECT
+            COALESCE(SUM(transaction_count), 0) AS transaction_count,
+            SUM(total_transaction_value) AS total_transaction_value,
+            MAX(max_transaction_value) AS max_transaction_value,
+            MIN(min_transaction_value) AS min_transaction_value,
+            (SELECT max_value_from_address FROM days ORDER BY max_transaction_value DESC LIMIT 1)
+                AS max_value_from_address,
+            (SELECT max_value_to_address FROM days ORDER BY max_transaction_value DESC LIMIT 1)
+                AS max_value_to_address
+        FROM days
+        """,
+    )
+
+USDC_TOKEN_ADDRESS = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48" # Example USDC address on Ethereum
+
+# --- Streaming Whale Watch ---
+def stream_token_transfers(token_address: str, start: date, end: date, api_key: str = CARV_DATA_API_KEY):
+    """
+    Yields the transfers of one token day by day (start..end, inclusive) as DataFrame chunks,
+    so a consumer can process each day while the next one is fetched. Days that fail are skipped.
+    """
+    client = get_carv_client(api_key)
+    day = start
+    while day <= end:
+        chunk = client.query(f"""
+        SELECT from_address, to_address, value, block_timestamp
+        FROM eth.token_transfers
+        WHERE token_address = '{token_address}' AND date = '{day.isoformat()}';
+        """, result_format="dataframe")
+        if chunk is None:
+            print(f"Failed to retrieve token transfers for {day}; skipping it.")
+        else:
+            yield chunk
+        day += timedelta(days=1)
+
+def run_whale_watch(token_address: str = USDC_TOKEN_ADDRESS, start: date | None = None, end: date | None = None,
+                    threshold: float = DEFAULT_WHALE_THRESHOLD, top_k: int = 5) -> WhaleDetector:
     """
-    if not api_key:
-        print("Error: CARV_DATA_API_KEY is not set. Cannot query CARV D.A.T.A. API.")
-        return None
-
-    # Construct the full URL without a double slash
-    query_endpoint = f"{CARV_DATA_API_BASE_URL}/sql_query"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "sql_content": sql_query
-    }
-
-    print(f"\nAttempting to query CARV D.A.T.A. API with SQL:\n{sql_query}")
-    print(f"Endpoint: {query_endpoint}")
-
-    try:
-        response = requests.post(query_endpoint, headers=headers, json=payload, timeout=30)
-        response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-
-        response_data = response.json()
-
-        if response_data.get("code") == 0 and response_data.get("msg") == "Success":
-            print("Query successful!")
-            return response_data.get("data")
+    Streams a token's transfers through a WhaleDetector, printing whale alerts as they are
+    found, then the top addresses and the transfer summary. Defaults to the last 7 complete days.
+    """
+    end = end or datetime.now(timezone.utc).date() - timedelta(days=1)
+    start = start or end - timedelta(days=6)
+    print(f"\n--- Streaming Whale Watch for {token_address} ({start}..{end}, threshold {threshold}) ---")
+
+    def report(alert):
+        if alert['type'] == "whale_movement":
+            print(f"Whale Alert: {alert['value']} moved from {alert['from_address']} to {alert['to_address']}"
+                  f" at {alert['timestamp']}")
         else:
-            print(f"CARV API returned an error: {response_data.get('msg', 'Unknown error')}")
-            return None
-
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP Error querying CARV API: {e.response.status_code} - {e.response.text}")
-        return None
-    except requests.exceptions.ConnectionError as e:
-        print(f"Connection Error querying CARV API: {e}")
-        return None
-    except requests.exceptions.Timeout as e:
-        print(f"Timeout Error querying CARV API: {e}")
-        return None
-    except requests.exceptions.RequestException as e:
-        print(f"An unexpected Request Error occurred: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON response from CARV API: {e}")
-        print(f"Raw response: {response.text}")
-        return None
+            print(f"Accumulation Alert: {alert['address']} sent about {alert['estimated_volume']:.0f}")
+
+    detector = WhaleDetector(threshold=threshold, on_alert=report)
+    detector.consume(stream_token_transfers(token_address, start, end))
+
+    summary = detector.summary()
+    print(f"Transfers: {summary['transaction_count']}, Total Value: {summary['total_transaction_value']}")
+    print(f"Max Single Transfer Value: {summary['max_transaction_value']} "
+          f"(from {summary['max_value_from_address']} to {summary['max_value_to_address']})")
+    print(f"Top {top_k} Most Active Addresses:")
+    for address, transfers, error in detector.top_addresses(top_k):
+        print(f"- Address: {address}, Transfers: {transfers}" + (f" (may overcount by {error})" if error else ""))
+    print(f"Top {top_k} Senders by Volume:")
+    for address, volume, error in detector.top_senders(top_k):
+        print(f"- Address: {address}, Volume: {volume}" + (f" (may overcount by {error})" if error else ""))
+    return detector
 
 # --- DeFi Research & Risk Agent Logic (Conceptual) ---
-def run_defi_agent():
+def run_defi_agent(incremental: bool = False, as_of: date | None = None):
     """
     Simulates an AI-powered DeFi research/risk agent.
     It constructs queries, fetches data from CARV, and provides conceptual analysis.
+
+    Args:
+        incremental (bool): Serve the top-address ranking and the token transfer summary from
+                            locally stored per-day partials, fetching only days not stored yet.
+                            Windows then end with the last complete day (as_of - 1).
+        as_of (date | None): Reference date for incremental windows, defaults to today (UTC).
     """
     print("--- Starting DeFi Research/Risk Agent ---")
 
@@ -94,26 +258,6 @@ def run_defi_agent():
     FROM eth.transactions
     WHERE date_parse(date, '%Y-%m-%d') = date_parse('{yesterday_date_str}', '%Y-%m-%d');
     """
-    gas_tx_data = query_carv_data(query_gas_and_tx_count, CARV_DATA_API_KEY)
-
-    if gas_tx_data:
-        print("\n--- Analysis: Daily Ethereum Activity ---")
-        if gas_tx_data['rows']:
-            total_gas = gas_tx_data['rows'][0]['items'][0]
-            tx_count = gas_tx_data['rows'][0]['items'][1]
-            print(f"Total Gas Used on {yesterday_date_str}: {total_gas}")
-            print(f"Total Transactions on {yesterday_date_str}: {tx_count}")
-            # Conceptual Risk/Research:
-            if total_gas and float(total_gas) > 10000000000000000000: # Example threshold
-                print("Research Insight: High gas usage, indicates significant network activity or congestion.")
-            if tx_count and int(tx_count) < 500000: # Example threshold
-                print("Risk Alert: Transaction count is unusually low, investigate potential network issues or reduced activity.")
-        else:
-            print("No data found for gas usage and transaction count.")
-    else:
-        print("Failed to retrieve gas usage and transaction count data.")
-
-    time.sleep(1) # Small delay between queries
 
     # --- Example 2: Find top 5 most active addresses in last 7 days (Ethereum) ---
     print("\n--- Querying Top Active Ethereum Addresses (Last 7 Days) ---")
@@ -149,32 +293,11 @@ def run_defi_agent():
         total_transactions DESC
     LIMIT 5;
     """
-    top_addresses_data = query_carv_data(query_top_addresses, CARV_DATA_API_KEY)
-
-    if top_addresses_data:
-        print("\n--- Analysis: Top Active Addresses ---")
-        if top_addresses_data['rows']:
-            print("Top 5 Most Active Ethereum Addresses (Last 7 Days):")
-            for row in top_addresses_data['rows']:
-                address = row['items'][0]
-                tx_count = row['items'][1]
-                print(f"- Address: {address}, Transactions: {tx_count}")
-                # Conceptual Risk/Research:
-                if tx_count and int(tx_count) > 10000: # Example threshold for very high activity
-                    print(f"  Research Insight: {address} is a highly active address, potentially a large exchange, bot, or power user.")
-                # Further analysis could involve checking if these addresses are known entities,
-                # or if their activity patterns are unusual.
-        else:
-            print("No data found for top active addresses.")
-    else:
-        print("Failed to retrieve top active addresses data.")
-
-    time.sleep(1)
 
     # --- Example 3: Token Transfer Analysis for a specific token (e.g., USDC on Ethereum) ---
     # This example requires a specific token address.
     # Replace with a real token address for a live agent.
-    usdc_token_address = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48" # Example USDC address on Ethereum
+    usdc_token_address = USDC_TOKEN_ADDRESS
     start_date_for_token_tx = "2024-11-01" # Example start date
 
     print(f"\n--- Querying Token Transfer Analysis for USDC ({usdc_token_address}) from {start_date_for_token_tx} ---")
@@ -199,18 +322,80 @@ def run_defi_agent():
         MAX_BY(to_address, value) AS max_value_to_address
     FROM filtered_transactions;
     """
-    token_transfer_data = query_carv_data(query_token_transfers, CARV_DATA_API_KEY)
 
-    if token_transfer_data:
+    if incremental:
+        # Only days missing from the local store are fetched (one per daily run), as partial
+        # aggregates; the windows are then merged locally with the same results as the full queries
+        as_of = as_of or datetime.now(timezone.utc).date()
+        last_complete_day = as_of - timedelta(days=1)
+        store = get_incremental_store()
+        token_query = token_transfers_query(usdc_token_address)
+        windows = [(TOP_ADDRESSES_QUERY, as_of - timedelta(days=7), last_complete_day),
+                   (token_query, date.fromisoformat(start_date_for_token_tx), last_complete_day)]
+        client = get_carv_client(CARV_DATA_API_KEY)
+        for (query, start, end), days in zip(windows, store.refresh_many(client, windows)):
+            status = "fetch failed, using stored days" if days is None else f"{days} new day(s) fetched"
+            print(f"Incremental '{query.name}' {start}..{end}: {status}")
+        # Days that left the rolling window are not needed again
+        store.prune(TOP_ADDRESSES_QUERY, windows[0][1])
+        gas_tx_data = query_carv_data(query_gas_and_tx_count, CARV_DATA_API_KEY, result_format="dataframe")
+        top_addresses_data, token_transfer_data = (store.result(query, start, end, result_format="dataframe")
+                                                   for query, start, end in windows)
+    else:
+        # Run all queries concurrently over the pooled client instead of one by one with fixed sleeps,
+        # so the agent waits roughly as long as the slowest query.
+        # Results come back as typed DataFrames, so the analysis below needs no per-row casts.
+        gas_tx_data, top_addresses_data, token_transfer_data = query_carv_data_many(
+            [query_gas_and_tx_count, query_top_addresses, query_token_transfers], CARV_DATA_API_KEY,
+            result_format="dataframe"
+        )
+
+    if gas_tx_data is not None:
+        print("\n--- Analysis: Daily Ethereum Activity ---")
+        if not gas_tx_data.empty:
+            total_gas = gas_tx_data.iloc[0, 0]
+            tx_count = gas_tx_data.iloc[0, 1]
+            print(f"Total Gas Used on {yesterday_date_str}: {total_gas}")
+            print(f"Total Transactions on {yesterday_date_str}: {tx_count}")
+            # Conceptual Risk/Research:
+            if total_gas and total_gas > 10000000000000000000: # Example threshold
+                print("Research Insight: High gas usage, indicates significant network activity or congestion.")
+            if tx_count and tx_count < 500000: # Example threshold
+                print("Risk Alert: Transaction count is unusually low, investigate potential network issues or reduced activity.")
+        else:
+            print("No data found for gas usage and transaction count.")
+    else:
+        print("Failed to retrieve gas usage and transaction count data.")
+
+    if top_addresses_data is not None:
+        print("\n--- Analysis: Top Active Addresses ---")
+        if not top_addresses_data.empty:
+            print("Top 5 Most Active Ethereum Addresses (Last 7 Days):")
+            addresses = top_addresses_data.iloc[:, 0].to_numpy()
+            tx_counts = top_addresses_data.iloc[:, 1].to_numpy()
+            # Conceptual Risk/Research: flag very active addresses in one vectorized comparison
+            highly_active = tx_counts > 10000 # Example threshold for very high activity
+            for address, tx_count, is_highly_active in zip(addresses, tx_counts, highly_active):
+                print(f"- Address: {address}, Transactions: {tx_count}")
+                if is_highly_active:
+                    print(f"  Research Insight: {address} is a highly active address, potentially a large exchange, bot, or power user.")
+                # Further analysis could involve checking if these addresses are known entities,
+                # or if their activity patterns are unusual.
+        else:
+            print("No data found for top active addresses.")
+    else:
+        print("Failed to retrieve top active addresses data.")
+
+    if token_transfer_data is not None:
         print("\n--- Analysis: Token Transfer Insights ---")
-        if token_transfer_data['rows']:
-            row = token_transfer_data['rows'][0]['items']
-            tx_count = row[0]
-            total_value = row[1]
-            max_value = row[2]
-            min_value = row[3]
-            max_value_from_address = row[4]
-            max_value_to_address = row[5]
+        if not token_transfer_data.empty:
+            row = token_transfer_data.iloc[0]
+            tx_count = row.iloc[0]
+            total_value = row.iloc[1]
+            max_value = row.iloc[2]
+            min_value = row.iloc[3]
+            max_value_from_address = row.iloc[4]
+            max_value_to_address = row.iloc[5]
 
             print(f"Token: USDC ({usdc_token_address})")
             print(f"Total Transfers: {tx_count}")
@@ -219,15 +404,21 @@ def run_defi_agent():
             print(f"Min Single Transfer Value: {min_value}")
 
             # Conceptual Risk/Research:
-            if tx_count and int(tx_count) == 0:
+            if tx_count == 0:
                 print("Research Insight: No token transfers found for this period. Verify token address or date range.")
-            if max_value and float(max_value) > 1000000: # Example threshold for large transfers
+            if max_value and max_value > 1000000: # Example threshold for large transfers
                 print(f"Risk Alert: Very large single transfer detected ({max_value}). Investigate source and destination for unusual activity (e.g., potential whale movements, bridge exploits).")
         else:
             print("No token transfer data found for the specified token and period.")
     else:
         print("Failed to retrieve token transfer data.")
 
+    cache = get_carv_client(CARV_DATA_API_KEY).cache
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\nQuery cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+              f"{stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+
     print("\n--- DeFi Research/Risk Agent Finished ---")
 
 if __name__ == "__main__":
@@ -238,4 +429,6 @@ if __name__ == "__main__":
         # You might want to add mock data generation here if you want to run without API key
         # For now, it will just print the warning and attempt to call the API, which will fail.
     
-    run_defi_agent() 
\ No newline at end of file
+    run_defi_agent(incremental=os.getenv("CARV_INCREMENTAL", "").lower() in ("1", "true", "yes"))
+    if os.getenv("CARV_WHALE_WATCH", "").lower() in ("1", "true", "yes"):
+        run_whale_watch() 
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from autonomous_research.decoding import decode_result
+from utils import metrics
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class IncrementalQuery:
+    """
+    A CARV aggregate split into per-day partial aggregates and a local merge.
+
+    `partial_sql` runs remotely for a closed date range ({start} and {end}, inclusive,
+    formatted as YYYY-MM-DD) and must return one or more rows per day, with the day as
+    its first column. Its columns are declared in `columns` as (name, SQLite type) pairs.
+    `merge_sql` runs locally in SQLite over `{table}`, the stored partials, with the
+    window bound to :start and :end. It combines the partials the way the original query
+    would: counts and sums are summed, MAX/MIN are taken again, and MAX_BY picks the
+    row holding the maximum.
+    """
+
+    def __init__(self, name, partial_sql, columns, merge_sql):
+        if not name.isidentifier():
+            raise ValueError(f"Query name '{name}' must be a valid identifier (it names a table).")
+        self.name = name
+        self.partial_sql = partial_sql
+        self.columns = list(columns)
+        self.merge_sql = merge_sql
+
+    @property
+    def table(self):
+        return f"partial_{self.name}"
+
+    def remote_sql(self, start, end):
+        """The partial aggregate query for the days start..end."""
+        return self.partial_sql.format(start=start.isoformat(), end=end.isoformat())
+
+
+class IncrementalStore:
+    """
+    Local SQLite store of per-day partial aggregates with a watermark per query.
+
+    `refresh` only asks CARV for the days not stored yet, so a rolling window needs one
+    new day per daily run instead of the whole window. Completed days never change, so
+    callers should only refresh up to yesterday. `result` then merges the stored days of
+    any window locally, without a round trip.
+    """
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        if path and path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "query TEXT PRIMARY KEY, first_day TEXT, last_day TEXT, updated_at REAL)"
+        )
+        self._db.commit()
+
+    def _ensure_table(self, query):
+        columns = ", ".join(f'"{name}" {col_type}' for name, col_type in query.columns)
+        self._db.execute(f'CREATE TABLE IF NOT EXISTS "{query.table}" ({columns})')
+        day_column = query.columns[0][0]
+        self._db.execute(f'CREATE INDEX IF NOT EXISTS "{query.table}_day" ON "{query.table}" ("{day_column}")')
+
+    def _watermark(self, query_name):
+        """(first_day, last_day) strings of a query; must be called with the lock held."""
+        return self._db.execute("SELECT first_day, last_day FROM watermarks WHERE query = ?", (query_name,)).fetchone()
+
+    def coverage(self, query_name):
+        """Returns (first_day, last_day) of the stored days, or None before the first refresh."""
+        with self._lock:
+            row = self._watermark(query_name)
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    def missing_ranges(self, query, start, end):
+        """Date ranges in start..end that still have to be fetched."""
+        start, end = _as_date(start), _as_date(end)
+        if end < start:
+            return []
+        covered = self.coverage(query.name)
+        if covered is None or start > covered[1] + timedelta(days=1) or end < covered[0] - timedelta(days=1):
+            # Nothing stored, or the stored days do not touch the window: fetch all of it
+            return [(start, end)]
+        first, last = covered
+        ranges = []
+        if start < first:
+            ranges.append((start, first - timedelta(days=1)))
+        if end > last:
+            ranges.append((last + timedelta(days=1), end))
+        return ranges
+
+    def refresh(self, client, query, start, end):
+        """Fetches the missing days of one query; see refresh_many."""
+        return self.refresh_many(client, [(query, start, end)])[0]
+
+    def refresh_many(self, client, windows):
+        """
+        Brings several queries up to date with one concurrent batch of CARV requests.
+
+        Args:
+            client (CarvClient): Client used for the remote partial queries.
+            windows (list[tuple]): (IncrementalQuery, start, end) per query; dates are
+                                   date objects or YYYY-MM-DD strings, both inclusive.
+
+        Returns:
+            list[int | None]: Days fetched per query (0 if already up to date), or None if a
+                              fetch failed. The watermark only advances on success.
+        """
+        plan = []  # (window index, query, start, end)
+        for i, (query, start, end) in enumerate(windows):
+            for range_start, range_end in self.missing_ranges(query, start, end):
+                plan.append((i, query, range_start, range_end))
+
+        fetched = [0] * len(windows)
+        if not plan:
+            return fetched
+        results = client.query_many([query.remote_sql(start, end) for _, query, start, end in plan])
+        for (i, query, start, end), data in zip(plan, results):
+            if data is None or fetched[i] is None:
+                fetched[i] = None
+                continue
+            self.ingest(query, data, start, end)
+            days = (end - start).days + 1
+            fetched[i] += days
+            metrics.count("incremental_days_fetched", days, query=query.name)
+        return fetched
+
+    def ingest(self, query, data, start, end):
+        """Stores a raw CARV result of query.remote_sql(start, end) and extends the watermark."""
+        start, end = _as_date(start), _as_date(end)
+        rows = [row['items'] for row in (data.get('rows') or [])]
+        width = len(query.columns)
+        day_column = query.columns[0][0]
+        placeholders = ", ".join("?" * width)
+        with self._lock:
+            self._ensure_table(query)
+            # Replacing the range keeps re-ingesting the same days idempotent
+            self._db.execute(f'DELETE FROM "{query.table}" WHERE "{day_column}" BETWEEN ? AND ?',
+                             (start.isoformat(), end.isoformat()))
+            self._db.executemany(f'INSERT INTO "{query.table}" VALUES ({placeholders})',
+                                 [items[:width] for items in rows])
+            row = self._watermark(query.name)
+            if row is not None and date.fromisoformat(row[0]) <= end + timedelta(days=1) \
+                    and date.fromisoformat(row[1]) >= start - timedelta(days=1):
+                first, last = min(row[0], start.isoformat()), max(row[1], end.isoformat())
+            else:
+                first, last = start.isoformat(), end.isoformat()
+            self._db.execute(
+                "INSERT OR REPLACE INTO watermarks (query, first_day, last_day, updated_at) VALUES (?, ?, ?, ?)",
+                (query.name, first, last, time.time()),
+            )
+            self._db.commit()
+
+    def result(self, query, start, end, result_format="raw"):
+        """
+        Merges the stored partials of start..end into the final aggregate.
+
+        Returns:
+            dict | pd.DataFrame | None: The result in CARV's shape (column_infos, rows), or
+                                        decoded like CarvClient.query; None if nothing is stored.
+        """
+        start, end = _as_date(start), _as_date(end)
+        with self._lock:
+            if self._watermark(query.name) is None:
+                return None
+            cursor = self._db.execute(query.merge_sql.format(table=f'"{query.table}"'),
+                                      {'start': start.isoformat(), 'end': end.isoformat()})
+            column_infos = [description[0] for description in cursor.description]
+            rows = [{'items': list(items)} for items in cursor.fetchall()]
+        return decode_result({'column_infos': column_infos, 'rows': rows}, result_format)
+
+    def prune(self, query, before):
+        """Drops stored days older than before (e.g. once they left every window)."""
+        before = _as_date(before)
+        day_column = query.columns[0][0]
+        with self._lock:
+            row = self._watermark(query.name)
+            if row is None:
+                return
+            self._db.execute(f'DELETE FROM "{query.table}" WHERE "{day_column}" < ?', (before.isoformat(),))
+            if before.isoformat() > row[1]:
+                self._db.execute("DELETE FROM watermarks WHERE query = ?", (query.name,))
+            elif before.isoformat() > row[0]:
+                self._db.execute("UPDATE watermarks SET first_day = ? WHERE query = ?",
+                                 (before.isoformat(), query.name))
+            self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
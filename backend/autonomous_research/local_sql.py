@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Offline SQL over local Parquet mirrors of CARV tables.
+
+`LocalMirror` copies date partitions of CARV tables (e.g. eth.transactions) into
+`<root>/<schema>/<table>/<YYYY-MM-DD>.parquet` once, and runs the agent's SQL against
+them with DuckDB. `CarvClient` asks the mirror first: a query is answered locally when
+every table it reads is mirrored for every day the query's date filters can touch.
+Otherwise it goes to the API as before, or, in offline mode, fails without a request.
+
+Usage:
+    python -m autonomous_research.local_sql mirror eth.transactions 2024-11-25 2024-12-01
+    python -m autonomous_research.local_sql query "SELECT COUNT(*) FROM eth.transactions"
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+if __name__ == "__main__":
+    # Run as a script: put the backend directory on the path before the imports below
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils import metrics
+
+# Tables the agent reads; only these are routed to the mirror
+MIRRORED_TABLES = ("eth.transactions", "eth.token_transfers")
+# Columns the agent reads from each table. A table whose mirrored days all had no rows has no
+# Parquet files, and is served as an empty relation of these columns instead.
+TABLE_COLUMNS = {
+    "eth.transactions": {
+        'date': "VARCHAR", 'hash': "VARCHAR", 'block_number': "BIGINT", 'block_timestamp': "TIMESTAMP",
+        'from_address': "VARCHAR", 'to_address': "VARCHAR", 'value': "DOUBLE", 'gas': "BIGINT",
+        'gas_price': "DOUBLE", 'gas_used': "BIGINT",
+    },
+    "eth.token_transfers": {
+        'date': "VARCHAR", 'transaction_hash': "VARCHAR", 'block_number': "BIGINT", 'block_timestamp': "TIMESTAMP",
+        'token_address': "VARCHAR", 'from_address': "VARCHAR", 'to_address': "VARCHAR", 'value': "DOUBLE",
+    },
+}
+
+_TABLE_REF = re.compile(r"\b(\w+)\.(\w+)\b")
+_DATE_LITERAL = re.compile(r"'(\d{4}-\d{2}-\d{2})'")
+_RELATIVE_DATE = re.compile(r"date_add\s*\(\s*'day'\s*,\s*(-?\d+)\s*,\s*current_date\s*\)", re.IGNORECASE)
+_CURRENT_DATE = re.compile(r"\bcurrent_date\b", re.IGNORECASE)
+_LOWER_BOUND = re.compile(r"(>=|>)\s*date_parse\s*\(\s*'\d{4}-\d{2}-\d{2}'", re.IGNORECASE)
+_UPPER_BOUND = re.compile(r"(<=|<(?!>))\s*date_parse\s*\(\s*'\d{4}-\d{2}-\d{2}'|\bbetween\b|(?<![<>!])=\s*date_parse",
+                          re.IGNORECASE)
+# Trino date_add(unit, n, x) -> DuckDB interval arithmetic
+_DATE_ADD = re.compile(r"date_add\s*\(\s*'(\w+)'\s*,\s*(-?\d+)\s*,\s*([^()]+?|\w+\([^()]*\))\s*\)", re.IGNORECASE)
+
+
+def _require_duckdb():
+    try:
+        import duckdb
+        return duckdb
+    except ImportError:
+        raise ImportError("Local SQL over mirrored data requires duckdb: pip install duckdb") from None
+
+
+def to_duckdb(sql_query):
+    """Rewrites the Trino functions used by CARV queries into DuckDB equivalents."""
+    sql = _DATE_ADD.sub(lambda m: f"(CAST({m.group(3)} AS DATE) + INTERVAL ({m.group(2)}) {m.group(1).upper()})",
+                        sql_query)
+    return re.sub(r"\bdate_parse\s*\(", "strptime(", sql, flags=re.IGNORECASE)
+
+
+def referenced_tables(sql_query):
+    """Mirrorable tables the query reads, e.g. {'eth.transactions'}."""
+    return {f"{schema}.{table}".lower() for schema, table in _TABLE_REF.findall(sql_query)
+            if f"{schema}.{table}".lower() in MIRRORED_TABLES}
+
+
+def required_days(sql_query, today=None):
+    """
+    Inclusive (first, last) day range the query's date filters can touch, or None when it
+    has no recognizable date filter (it may read the whole table).
+    """
+    today = today or datetime.now(timezone.utc).date()
+    days = [date.fromisoformat(literal) for literal in _DATE_LITERAL.findall(sql_query)]
+    days += [today + timedelta(days=int(offset)) for offset in _RELATIVE_DATE.findall(sql_query)]
+    if not days:
+        return None
+    last = max(days)
+    if _CURRENT_DATE.search(sql_query) or (_LOWER_BOUND.search(sql_query) and not _UPPER_BOUND.search(sql_query)):
+        # Open-ended ranges reach up to the last complete day. Today's partition is still
+        # growing and never mirrored, so local answers to these queries exclude today.
+        last = max(last, today - timedelta(days=1))
+    return min(days), last
+
+
+class LocalMirror:
+    """
+    Parquet mirror of CARV date partitions plus an embedded DuckDB engine.
+
+    A manifest (`manifest.json`) records which days of which tables are mirrored, including
+    days that had no rows, so routing never mistakes a missing day for an empty one.
+    """
+
+    def __init__(self, root="carv_mirror", offline=False):
+        """
+        Args:
+            root (str): Directory holding the Parquet partitions and the manifest.
+            offline (bool): Never send queries to the API; unanswerable queries fail.
+        """
+        self.root = root
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(root, "manifest.json")
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+        self._con = None
+
+    def days(self, table):
+        """Mirrored days of table, as a set of YYYY-MM-DD strings."""
+        with self._lock:
+            return set(self._manifest.get(table, []))
+
+    def _partition_path(self, table, day):
+        schema, name = table.split(".")
+        return os.path.join(self.root, schema, name, f"{day}.parquet")
+
+    def write_partition(self, table, day, df):
+        """Stores one day of table (a DataFrame; may be empty) and records it in the manifest."""
+        day = str(day)
+        path = self._partition_path(table, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if len(df):
+            from utils.storage import write_table
+            write_table(df, path)
+        elif os.path.exists(path):
+            os.remove(path)
+        with self._lock:
+            self._manifest[table] = sorted(set(self._manifest.get(table, [])) | {day})
+            tmp_path = f"{self._manifest_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._manifest, f, indent=1)
+            os.replace(tmp_path, self._manifest_path)
+            # Views are rebuilt over the new files on the next query
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    def mirror(self, client, table, start, end, refresh=False):
+        """
+        Copies the days start..end of table from the API, skipping days already mirrored.
+        Today is never mirrored, since its partition is still growing.
+
+        Returns:
+            list[str]: The days fetched.
+        """
+        if table not in MIRRORED_TABLES:
+            raise ValueError(f"Unknown table '{table}'. Expected one of {MIRRORED_TABLES}.")
+        start, end = date.fromisoformat(str(start)), date.fromisoformat(str(end))
+        end = min(end, datetime.now(timezone.utc).date() - timedelta(days=1))
+        have = set() if refresh else self.days(table)
+        wanted = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        wanted = [day for day in wanted if day not in have]
+        if not wanted:
+            return []
+        queries = [f"SELECT * FROM {table} WHERE date = '{day}'" for day in wanted]
+        fetched = []
+        for day, df in zip(wanted, client.query_many(queries, result_format="dataframe", use_local=False)):
+            if df is None:
+                print(f"Could not mirror {table} for {day}; it will be retried on the next run.")
+                continue
+            self.write_partition(table, day, df)
+            fetched.append(day)
+        return fetched
+
+    def can_answer(self, sql_query, today=None):
+        """True if every table the query reads is mirrored for every day its filters can touch."""
+        tables = referenced_tables(sql_query)
+        if not tables:
+            return False
+        day_range = required_days(sql_query, today)
+        if day_range is None and not self.offline:
+            return False # Unbounded query: only answer from a partial mirror when offline
+        for table in tables:
+            have = self.days(table)
+            if not have:
+                return False
+            if day_range is None:
+                continue
+            first, last = day_range
+            needed = ((first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1))
+            if not all(day in have for day in needed):
+                return False
+        return True
+
+    def _connection(self):
+        with self._lock:
+            if self._con is None:
+                duckdb = _require_duckdb()
+                con = duckdb.connect()
+                # current_date / current_timestamp in UTC, the same days required_days works with.
+                # GLOBAL so the per-query cursors get it too.
+                con.execute("SET GLOBAL TimeZone='UTC'")
+                for table in MIRRORED_TABLES:
+                    schema, name = table.split(".")
+                    con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+                    pattern = os.path.join(self.root, schema, name, "*.parquet")
+                    has_files = any(os.path.exists(self._partition_path(table, day))
+                                    for day in self._manifest.get(table, []))
+                    if has_files:
+                        source = f"SELECT * FROM read_parquet('{pattern}', union_by_name=true)"
+                    else:
+                        # Empty (or not yet mirrored) tables still answer with zero rows
+                        columns = ", ".join(f"CAST(NULL AS {col_type}) AS {name}"
+                                            for name, col_type in TABLE_COLUMNS[table].items())
+                        source = f"SELECT {columns} WHERE false"
+                    con.execute(f"CREATE OR REPLACE VIEW {table} AS {source}")
+                self._con = con
+            # A cursor per query lets threads share the database
+            return self._con.cursor()
+
+    def query_raw(self, sql_query):
+        """Runs sql_query locally and returns it in CARV's response shape (column_infos, rows)."""
+        with metrics.timer("local_query"):
+            relation = self._connection().sql(to_duckdb(sql_query))
+            column_infos = [{'name': name, 'type': str(col_type).lower()}
+                            for name, col_type in zip(relation.columns, relation.types)]
+            rows = [{'items': [_jsonable(value) for value in row]} for row in relation.fetchall()]
+        return {'column_infos': column_infos, 'rows': rows}
+
+    def query(self, sql_query, result_format="raw"):
+        from autonomous_research.decoding import decode_result
+        return decode_result(self.query_raw(sql_query), result_format)
+
+
+def _jsonable(value):
+    """Keeps rows shaped like API responses (numbers, strings, None)."""
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def main():
+    from autonomous_research.defi_agent import CARV_DATA_API_KEY, get_carv_client, get_local_mirror
+
+    parser = argparse.ArgumentParser(description="Mirror CARV date partitions locally and query them offline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    mirror_cmd = commands.add_parser("mirror", help="Copy date partitions of a table into the mirror")
+    mirror_cmd.add_argument("table", choices=MIRRORED_TABLES)
+    mirror_cmd.add_argument("start", help="First day (YYYY-MM-DD)")
+    mirror_cmd.add_argument("end", help="Last day (YYYY-MM-DD), capped at yesterday")
+    mirror_cmd.add_argument("--refresh", action="store_true", help="Fetch days that are already mirrored again")
+    query_cmd = commands.add_parser("query", help="Run SQL against the mirror")
+    query_cmd.add_argument("sql")
+    args = parser.parse_args()
+
+    mirror = get_local_mirror()
+    if mirror is None:
+        parser.error("Set CARV_MIRROR_PATH to the mirror directory.")
+    if args.command == "mirror":
+        fetched = mirror.mirror(get_carv_client(CARV_DATA_API_KEY), args.table, args.start, args.end, args.refresh)
+        print(f"Mirrored {len(fetched)} day(s) of {args.table} into {mirror.root}")
+    else:
+        print(mirror.query(args.sql, result_format="dataframe").to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
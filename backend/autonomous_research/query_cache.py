@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Queries referencing the current time change as new blocks arrive
+_RELATIVE_TIME = re.compile(r"\b(current_date|current_timestamp|now\s*\(|localtimestamp)", re.IGNORECASE)
+# A date or timestamp literal: '2024-11-01', date '2024-11-01', timestamp '2024-11-01 00:00:00'
+# or date_parse('2024-11-01', ...); group 1 is the day
+_DATE_LITERAL = r"(?:date_parse\s*\(\s*|(?:date|timestamp)\s+)?'(\d{4}-\d{2}-\d{2})[^']*'"
+_DATE_LITERALS = re.compile(_DATE_LITERAL, re.IGNORECASE)
+# An upper bound closing the date window: "< '...'", "<= date '...'", "= '...'" or BETWEEN
+_UPPER_BOUND = re.compile(r"(?:<=|<(?!>)|(?<![<>!])=)\s*" + _DATE_LITERAL + r"|\bbetween\b", re.IGNORECASE)
+
+# String literals and quoted identifiers, with doubled quotes as escapes
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE = re.compile(r"\s+")
+
+# Default TTL (seconds) for queries whose result can still change
+VOLATILE_TTL = 300
+
+
+def normalize_sql(sql_query):
+    """
+    Collapses whitespace outside quoted literals and identifiers and strips a trailing
+    semicolon, so formatting does not change the cache key but literal values do.
+    """
+    parts = _QUOTED.split(sql_query)
+    # Odd parts are the quoted strings, kept verbatim
+    sql = "".join(part if i % 2 else _WHITESPACE.sub(" ", part) for i, part in enumerate(parts)).strip()
+    return sql.rstrip(";").rstrip()
+
+
+def default_ttl(sql_query, volatile_ttl=VOLATILE_TTL):
+    """
+    Picks a TTL for a query: None (cache forever) only for windows closed by an upper date
+    bound that lies before today (UTC). Anything relative to the current date, open-ended,
+    reaching today, or without a recognizable date filter gets volatile_ttl.
+    """
+    if _RELATIVE_TIME.search(sql_query):
+        return volatile_ttl
+    days = _DATE_LITERALS.findall(sql_query)
+    if not days or not _UPPER_BOUND.search(sql_query):
+        return volatile_ttl
+    today = datetime.now(timezone.utc).date().isoformat()
+    if max(days) >= today:
+        return volatile_ttl
+    return None
+
+
+class QueryCache:
+    """
+    Two-tier cache for CARV query results keyed on normalized SQL text.
+
+    An in-memory LRU tier sits in front of an optional SQLite tier on disk. Every entry
+    carries its own expiry, so historical queries can be kept forever while queries on
+    `current_date` expire. Hit/miss counters are available through `stats()`.
+    """
+
+    def __init__(self, path=None, max_entries=256, volatile_ttl=VOLATILE_TTL):
+        self.max_entries = max_entries
+        self.volatile_ttl = volatile_ttl
+        # key -> (expires_at | None, JSON text); every get decodes a fresh copy, so callers
+        # may modify results without changing the cache
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                "key TEXT PRIMARY KEY, sql TEXT, expires_at REAL, created_at REAL, value TEXT)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(sql_query):
+        return hashlib.sha256(normalize_sql(sql_query).encode()).hexdigest()
+
+    def get(self, sql_query):
+        """Returns the cached result for sql_query, or None on a miss."""
+        key = self.key(sql_query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, raw = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return json.loads(raw)
+                del self._memory[key]
+                self._stats['expired'] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    expires_at, raw = row
+                    if expires_at is None or expires_at > now:
+                        self._put_memory(key, expires_at, raw)
+                        self._stats['disk_hits'] += 1
+                        return json.loads(raw)
+                    self._db.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats['expired'] += 1
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, sql_query, value, ttl="auto"):
+        """
+        Stores a result. ttl is seconds, None to keep forever, or "auto" to pick
+        one from the query text (see default_ttl).
+        """
+        if ttl == "auto":
+            ttl = default_ttl(sql_query, self.volatile_ttl)
+        key = self.key(sql_query)
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+        raw = json.dumps(value)
+        with self._lock:
+            self._put_memory(key, expires_at, raw)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, sql, expires_at, created_at, value) VALUES (?, ?, ?, ?, ?)",
+                    (key, normalize_sql(sql_query), expires_at, now, raw),
+                )
+                self._db.commit()
+            self._stats['stores'] += 1
+
+    def _put_memory(self, key, expires_at, raw):
+        self._memory[key] = (expires_at, raw)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_cache")
+                self._db.commit()
+
+    def stats(self):
+        """Returns hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,280 @@
+import heapq
+import time
+from collections import deque
+
+import numpy as np
+
+from utils import metrics
+
+# Single transfers at or above this value raise a whale alert (the demo agents' threshold_amount)
+DEFAULT_WHALE_THRESHOLD = 1_000_000
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters: approximate top-K counts in `capacity` counters.
+
+    Every key whose true count exceeds total / capacity is guaranteed to be tracked, and each
+    tracked count overestimates the true count by at most its `error`. Updates may be
+    weighted, so pre-aggregated batches (or volumes instead of counts) can be fed directly.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        # Min-heap of (count, key); entries go stale when a key is incremented or evicted
+        self._heap = []
+
+    def update(self, key, weight=1):
+        self.total += weight
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0
+        else:
+            floor, evicted = self._pop_min()
+            del counts[evicted], self.errors[evicted]
+            counts[key] = floor + weight
+            self.errors[key] = floor
+        heapq.heappush(self._heap, (counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, k) for k, count in counts.items()]
+            heapq.heapify(self._heap)
+
+    def update_many(self, keys, weights):
+        """
+        Adds a batch of (ideally distinct, pre-aggregated) keys in one merge: new keys enter at
+        the current minimum, as in update, and only the `capacity` largest counters are kept.
+        This keeps the guarantees of per-key updates at a fraction of their cost.
+        """
+        counts, errors = self.counts, self.errors
+        floor = min(counts.values()) if len(counts) >= self.capacity else 0
+        for key, weight in zip(keys, weights):
+            if key in counts:
+                counts[key] += weight
+            else:
+                counts[key] = floor + weight
+                errors[key] = floor
+            self.total += weight
+        if len(counts) > self.capacity:
+            self.counts = dict(heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1]))
+            self.errors = {key: errors[key] for key in self.counts}
+        self._heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        heap, counts = self._heap, self.counts
+        while True:
+            count, key = heapq.heappop(heap)
+            if counts.get(key) == count:
+                return count, key
+
+    def top(self, k=5):
+        """The k largest counters as (key, count, error); the true count lies in [count - error, count]."""
+        best = heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+        return [(key, count, self.errors[key]) for key, count in best]
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch: per-key totals in a fixed depth x width table.
+
+    Estimates never undercount; with width w and depth d they overcount by at most
+    e / w of the stream total with probability 1 - exp(-d). Sketches with the same width,
+    depth and seed can be merged with `merge`.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, width=2048, depth=4, seed=0):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.float64)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, self._PRIME, size=(depth, 1), dtype=np.uint64)
+        self._b = rng.integers(0, self._PRIME, size=(depth, 1), dtype=np.uint64)
+        self._rows = np.arange(depth)[:, None]
+
+    def _columns(self, keys):
+        import pandas as pd
+        # Stable across processes (unlike the salted builtin hash), so sketches built in different runs
+        # or workers have the same layout and can be merged by adding their tables
+        hashes = pd.util.hash_array(np.asarray(keys, dtype=object))
+        # Multiply-shift hashing; uint64 overflow wraps around, which is intended
+        with np.errstate(over="ignore"):
+            mixed = self._a * hashes[None, :] + self._b
+        return ((mixed >> np.uint64(29)) % np.uint64(self.width)).astype(np.intp)
+
+    def add_many(self, keys, weights):
+        columns = self._columns(keys)
+        np.add.at(self.table, (np.broadcast_to(self._rows, columns.shape), columns),
+                  np.broadcast_to(np.asarray(weights, dtype=np.float64), columns.shape))
+
+    def merge(self, other):
+        """Adds another sketch's counts (e.g. from a worker process) into this one."""
+        if (other.width, other.depth) != (self.width, self.depth) or not (
+                np.array_equal(other._a, self._a) and np.array_equal(other._b, self._b)):
+            raise ValueError("Only sketches with the same width, depth and seed can be merged.")
+        self.table += other.table
+        return self
+
+    def estimate_many(self, keys):
+        return self.table[self._rows, self._columns(keys)].min(axis=0)
+
+    def estimate(self, key):
+        return float(self.estimate_many([key])[0])
+
+
+class WhaleDetector:
+    """
+    Streaming token transfer analytics in fixed memory.
+
+    Transfers arrive as DataFrame chunks (`consume_frame`) or as an iterator of records
+    (`consume`) with from_address, to_address and value, plus optional transaction_hash and
+    block_timestamp. The detector keeps running totals, max/min and the MAX_BY addresses,
+    Space-Saving counters for the most active addresses (as sender or receiver) and the
+    largest senders by volume, and a Count-Min sketch of volume sent per address. Alerts are
+    raised as transfers arrive: one for every transfer of at least `threshold`, and one the
+    first time an address's estimated volume sent reaches `cumulative_threshold`.
+    """
+
+    def __init__(self, threshold=DEFAULT_WHALE_THRESHOLD, cumulative_threshold=None, capacity=1000,
+                 sketch_width=2048, sketch_depth=4, max_alerts=1000, on_alert=None):
+        """
+        Args:
+            threshold (float): Value of a single transfer that raises a whale alert.
+            cumulative_threshold (float | None): Volume sent by one address that raises an
+                                                 accumulation alert, default 5 x threshold.
+            capacity (int): Counters per Space-Saving summary.
+            sketch_width (int), sketch_depth (int): Count-Min sketch dimensions.
+            max_alerts (int | None): Most recent alerts kept in `alerts`; None keeps all of them.
+            on_alert (callable | None): Called with each alert dict as it is raised.
+        """
+        self.threshold = threshold
+        self.cumulative_threshold = cumulative_threshold if cumulative_threshold is not None else 5 * threshold
+        self.activity = SpaceSaving(capacity)
+        self.volume = SpaceSaving(capacity)
+        self.sketch = CountMinSketch(sketch_width, sketch_depth)
+        self.alerts = deque(maxlen=max_alerts)
+        self.on_alert = on_alert
+        # Addresses already reported for accumulation; bounded by total volume / cumulative_threshold
+        self._accumulators = set()
+        self.transaction_count = 0
+        self.total_value = 0.0
+        self.whale_count = 0
+        self.whale_value = 0.0
+        self.max_value = None
+        self.min_value = None
+        self.max_value_from_address = None
+        self.max_value_to_address = None
+
+    def _alert(self, alert):
+        self.alerts.append(alert)
+        metrics.count("whale_alerts", kind=alert['type'])
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def consume_frame(self, df):
+        """Updates every statistic with one chunk of transfers (a DataFrame)."""
+        import pandas as pd
+        if df is None or len(df) == 0:
+            return
+        with metrics.timer("whale_stream_chunk"):
+            values = np.asarray(df['value'], dtype=np.float64)
+            senders = df['from_address'].to_numpy()
+            receivers = df['to_address'].to_numpy()
+            # Like SQL aggregates, transfers without a value are counted but left out of the value
+            # statistics; a NaN would otherwise turn the sum, max and min into NaN for good
+            valid = ~np.isnan(values)
+            if not valid.all():
+                values = np.where(valid, values, 0.0)
+
+            self.transaction_count += len(values)
+            if valid.any():
+                self.total_value += float(values.sum())
+                top = int(np.where(valid, values, -np.inf).argmax())
+                if self.max_value is None or values[top] > self.max_value:
+                    self.max_value = float(values[top])
+                    self.max_value_from_address, self.max_value_to_address = senders[top], receivers[top]
+                low = float(values[valid].min())
+                self.min_value = low if self.min_value is None else min(self.min_value, low)
+
+            whales = np.flatnonzero(valid & (values >= self.threshold))
+            self.whale_count += len(whales)
+            self.whale_value += float(values[whales].sum())
+            for i in whales:
+                self._alert({
+                    'type': "whale_movement",
+                    'value': float(values[i]),
+                    'from_address': senders[i],
+                    'to_address': receivers[i],
+                    'token_address': df['token_address'].iat[i] if 'token_address' in df else None,
+                    'transaction_hash': df['transaction_hash'].iat[i] if 'transaction_hash' in df else None,
+                    'timestamp': df['block_timestamp'].iat[i] if 'block_timestamp' in df else None,
+                })
+
+            # Aggregating the chunk first turns thousands of counter updates into one per address
+            activity = pd.Series(np.concatenate([senders, receivers])).value_counts(sort=False)
+            self.activity.update_many(activity.index.tolist(), activity.tolist())
+            sender_index, sender_keys = pd.factorize(senders)
+            sent = np.bincount(sender_index, weights=values, minlength=len(sender_keys))
+            sender_keys = sender_keys.tolist()
+            self.volume.update_many(sender_keys, sent.tolist())
+            self.sketch.add_many(sender_keys, sent)
+
+            estimates = self.sketch.estimate_many(sender_keys)
+            for i in np.flatnonzero(estimates >= self.cumulative_threshold):
+                address = sender_keys[i]
+                if address not in self._accumulators:
+                    self._accumulators.add(address)
+                    self._alert({'type': "accumulation", 'address': address, 'estimated_volume': float(estimates[i])})
+
+    def consume(self, records, chunk_size=1000):
+        """
+        Consumes an iterator of transfer dicts (or of DataFrame chunks) and returns self.
+        Records are processed in chunks of chunk_size, so alerts trail the stream by at most
+        one chunk; chunk_size=1 updates on every record.
+        """
+        import pandas as pd
+        start = time.perf_counter()
+        batch = []
+        for record in records:
+            if isinstance(record, pd.DataFrame):
+                self.consume_frame(record)
+                continue
+            batch.append(record)
+            if len(batch) >= chunk_size:
+                self.consume_frame(pd.DataFrame.from_records(batch))
+                batch = []
+        if batch:
+            self.consume_frame(pd.DataFrame.from_records(batch))
+        metrics.record("whale_stream", time.perf_counter() - start)
+        return self
+
+    def top_addresses(self, k=5):
+        """Most active addresses as (address, transfers, error), like the top-address query."""
+        return self.activity.top(k)
+
+    def top_senders(self, k=5):
+        """Largest senders by volume as (address, volume, error)."""
+        return self.volume.top(k)
+
+    def summary(self):
+        """
+        Running totals with the same fields as the token transfer summary query, plus the
+        number and total value of transfers at or above the whale threshold.
+        """
+        return {
+            'transaction_count': self.transaction_count,
+            'total_transaction_value': self.total_value,
+            'max_transaction_value': self.max_value,
+            'min_transaction_value': self.min_value,
+            'max_value_from_address': self.max_value_from_address,
+            'max_value_to_address': self.max_value_to_address,
+            'whale_transaction_count': self.whale_count,
+            'whale_transaction_value': self.whale_value,
+        }
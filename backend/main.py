@@ -8,56 +8,120 @@ autonomous research tracks of the AgentForge project.
 Usage:
     python main.py --track orchestration
     python main.py --track autonomous
-    python main.py --track both
+    python main.py --track both --critical-path
+    python main.py --track autonomous --profile-startup
+    python main.py --serve
+    python main.py --metrics-log metrics.jsonl --metrics-prom metrics.prom
+
+Only the standard library is imported here; each track imports its own dependencies
+when it runs, so short-lived jobs only pay for the track they use.
 """
 
 import argparse
 import sys
 import os
+import subprocess
+import time
+from collections import Counter
+from functools import partial
 from pathlib import Path
 
 # Add the backend directory to the Python path
 backend_dir = Path(__file__).parent
 sys.path.append(str(backend_dir))
+from utils import metrics
+# The orchestration modules import their siblings by name
+orchestration_dir = backend_dir / "orchestration"
+sys.path.append(str(orchestration_dir))
+
+# Entry modules of each track, imported by --profile-startup
+TRACK_MODULES = {
+    'orchestration': ['utils.data_provider', 'orchestration.orchestrator'],
+    'autonomous': ['autonomous_research.defi_agent'],
+}
 
-def run_orchestration():
-    """Run the orchestration track (medical research with federated learning)."""
+def generate_sample_data(data_path="anonymized_medical_data.csv"):
+    """Orchestration stage: generate the synthetic medical dataset and return its path."""
     print("\n" + "="*60)
     print("🚀 Starting ORCHESTRATION Track")
     print("="*60)
-    
-    try:
-        # First, generate sample data
-        from utils.data_provider import generate_medical_data, save_anonymized_data
-        print("📊 Generating sample medical data...")
-        medical_data = generate_medical_data(1000)
-        save_anonymized_data(medical_data, "anonymized_medical_data.csv")
-        
-        # Then run the orchestrator
-        from orchestration.orchestrator import run_decentralized_research
-        run_decentralized_research()
-        
-    except ImportError as e:
-        print(f"❌ Import error: {e}")
-        print("Make sure all required packages are installed: pip install -r requirements.txt")
-    except Exception as e:
-        print(f"❌ Error running orchestration: {e}")
+    from utils.data_provider import generate_medical_data, save_anonymized_data
+    print("📊 Generating sample medical data...")
+    medical_data = generate_medical_data(1000)
+    save_anonymized_data(medical_data, data_path)
+    return data_path
+
+def run_federated_research(data_path):
+    """Orchestration stage: federated learning on the generated data and on-chain submission."""
+    from orchestration.orchestrator import run_decentralized_research
+    run_decentralized_research(data_path=data_path)
 
-def run_autonomous():
-    """Run the autonomous research track (DeFi analysis)."""
+def run_defi_research(incremental=False):
+    """Autonomous research stage: DeFi analysis over the CARV D.A.T.A. API."""
     print("\n" + "="*60)
     print("🔍 Starting AUTONOMOUS RESEARCH Track")
     print("="*60)
-    
-    try:
-        from autonomous_research.defi_agent import run_defi_agent
-        run_defi_agent()
-        
-    except ImportError as e:
-        print(f"❌ Import error: {e}")
-        print("Make sure all required packages are installed: pip install -r requirements.txt")
-    except Exception as e:
-        print(f"❌ Error running autonomous research: {e}")
+    from autonomous_research.defi_agent import run_defi_agent
+    run_defi_agent(incremental=incremental)
+
+def run_whale_watch():
+    """Autonomous research stage: streaming whale detection over recent token transfers."""
+    from autonomous_research.defi_agent import run_whale_watch as watch
+    watch()
+
+def build_graph(tracks, incremental=False, whale_watch=False):
+    """
+    Declares the stages of the selected tracks. The two tracks share nothing, so with
+    both selected they run side by side: the orchestration stages (data generation and
+    training) in a worker process, the autonomous stage (API bound) on the event loop.
+    """
+    from utils.taskgraph import TaskGraph
+    # A single track is one chain of stages; running it in this process keeps all its metrics here
+    graph = TaskGraph(cpu_executor="process" if len(tracks) > 1 else "thread")
+    if 'orchestration' in tracks:
+        graph.add("generate_data", generate_sample_data, kind="cpu")
+        graph.add("federated_research", run_federated_research, deps=["generate_data"], kind="cpu")
+    if 'autonomous' in tracks:
+        graph.add("defi_research", partial(run_defi_research, incremental), kind="io")
+        if whale_watch:
+            graph.add("whale_watch", run_whale_watch, kind="io")
+    return graph
+
+def profile_startup(tracks, top=8):
+    """
+    Reports the import-time cost of each track's entry modules.
+
+    Every module is imported in a fresh interpreter with `python -X importtime`, so modules
+    already loaded by this process do not hide their cost. Self times are summed per
+    top-level package to show which dependencies dominate.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(backend_dir), str(orchestration_dir)]))
+    print("⏱️  Startup profile (fresh interpreter per module)")
+    for track in tracks:
+        for module in TRACK_MODULES[track]:
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                    capture_output=True, text=True, env=env, cwd=backend_dir)
+            wall_time = time.perf_counter() - start
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+                print(f"\n[{track}] {module}: import failed ({error})")
+                continue
+
+            total_us = 0
+            package_us = Counter()
+            for line in result.stderr.splitlines():
+                if not line.startswith("import time:") or "self [us]" in line:
+                    continue
+                self_us, cumulative_us, name = line[len("import time:"):].split("|")
+                package_us[name.strip().split(".")[0]] += int(self_us)
+                if name.strip() == module:
+                    total_us = int(cumulative_us)
+
+            print(f"\n[{track}] {module}: {total_us / 1000:.1f} ms to import "
+                  f"({wall_time * 1000:.1f} ms including interpreter start)")
+            for package, package_time in package_us.most_common(top):
+                print(f"    {package:<24} {package_time / 1000:8.1f} ms")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -67,7 +131,11 @@ def main():
 Examples:
   python main.py --track orchestration    # Run medical research orchestration
   python main.py --track autonomous       # Run DeFi autonomous research
-  python main.py --track both             # Run both tracks
+  python main.py --track both             # Run both tracks concurrently
+  python main.py --critical-path          # Also print stage timings and the critical path
+  python main.py --profile-startup        # Show import-time costs per track
+  python main.py --serve --workers 4      # Serve requests from jobs/inbox
+  python main.py --metrics-log m.jsonl    # Record per-stage timings
         """
     )
     
@@ -83,8 +151,76 @@ Examples:
         default='.env',
         help='Path to environment file (default: .env)'
     )
+
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Report import-time costs of the selected track(s) and exit'
+    )
+
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='Run as a long-lived service that executes queued requests (see service.py)'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Worker threads in service mode (default: 4)'
+    )
+
+    parser.add_argument(
+        '--critical-path',
+        action='store_true',
+        help='Print per-stage timings and the critical path of the run'
+    )
+
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Autonomous track: fetch only new days of data and merge stored per-day aggregates'
+    )
+
+    parser.add_argument(
+        '--whale-watch',
+        action='store_true',
+        help='Autonomous track: also stream recent token transfers through the whale detector'
+    )
+
+    parser.add_argument(
+        '--metrics-log',
+        help='Append per-stage timing and counter events to this JSON lines file'
+    )
+
+    parser.add_argument(
+        '--metrics-prom',
+        help='Write Prometheus text metrics to this file (on exit, and after every job in service mode)'
+    )
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='Serve Prometheus text metrics on http://127.0.0.1:PORT/metrics'
+    )
     
     args = parser.parse_args()
+    tracks = ['orchestration', 'autonomous'] if args.track == 'both' else [args.track]
+
+    if args.profile_startup:
+        profile_startup(tracks)
+        return
+
+    if args.metrics_log or args.metrics_prom or args.metrics_port:
+        metrics.configure(args.metrics_log, args.metrics_prom)
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+
+    if args.serve:
+        from service import serve
+        serve(workers=args.workers)
+        return
     
     # Check if environment file exists
     if not os.path.exists(args.env_file):
@@ -96,13 +232,13 @@ Examples:
     print("Decentralized AI Agent Orchestration and Autonomous Research")
     print("-" * 60)
     
-    if args.track == 'orchestration':
-        run_orchestration()
-    elif args.track == 'autonomous':
-        run_autonomous()
-    elif args.track == 'both':
-        run_orchestration()
-        run_autonomous()
+    graph = build_graph(tracks, args.incremental, args.whale_watch)
+    graph.run()
+    failed = [name for name, record in graph.records.items() if record['status'] == "failed"]
+    if any(isinstance(graph.records[name]['error'], ImportError) for name in failed):
+        print("Make sure all required packages are installed: pip install -r requirements.txt")
+    if args.critical_path:
+        print("\n" + graph.format_report())
     
     print("\n" + "="*60)
     print("✅ AgentForge Backend execution complete!")
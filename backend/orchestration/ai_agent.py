@@ -1,55 +1,127 @@
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.model_selection import train_test_split
 import numpy as np
 import json
+import os
+import time
+from functools import partial
+from encoder import FeatureEncoder, CATEGORICAL_DTYPES, TREATMENT_OUTCOMES
+from executor import run_parallel
+from inference import BatchScorer
+from sharding import ShardRef, row_hashes
+from utils.storage import read_table, iter_table
+from utils import metrics
 
 def load_anonymized_data(data_path="anonymized_medical_data.csv"):
-    """Loads the anonymized medical data."""
+    """Loads the anonymized medical data (CSV, Parquet or Arrow IPC, picked by extension)."""
     try:
-        df = pd.read_csv(data_path)
+        with metrics.timer("data_load"):
+            df = read_table(data_path, dtype=CATEGORICAL_DTYPES)
+        metrics.count("rows_loaded", len(df))
         return df
     except FileNotFoundError:
         print(f"Error: Data file not found at {data_path}. Please run data_provider.py first.")
         return None
 
-def train_local_model(local_df):
-    """Trains a simple logistic regression model on local data."""
-    if local_df.empty:
-        return None, 0.0
+def iter_anonymized_data(data_path="anonymized_medical_data.csv", chunksize=100_000):
+    """
+    Streams the anonymized medical data in chunks of at most chunksize rows.
+
+    Categorical columns are parsed with explicit dtypes, so every chunk shares the
+    same categories and memory stays bounded whatever the file size.
+    """
+    yield from iter_table(data_path, chunksize, dtype=CATEGORICAL_DTYPES)
+
+def split_chunk(chunk, num_agents, test_size=0.1, random_state=42):
+    """
+    Routes the rows of one chunk to agent shards and a held-out test set.
+
+    A row's destination depends only on its patient_id hash, so the chunked split
+    gives the same result for any chunk size.
+
+    Returns:
+        tuple: (list of num_agents train DataFrames, test DataFrame)
+    """
+    hashes = row_hashes(chunk, random_state)
+    # High bits decide train/test, low bits pick the agent
+    is_test = (hashes >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+    agent_ids = (hashes % np.uint64(num_agents)).astype(np.int64)
+
+    train = chunk[~is_test]
+    train_agents = agent_ids[~is_test]
+    shards = [train[train_agents == i] for i in range(num_agents)]
+    return shards, chunk[is_test]
+
+def iter_agent_shards(data_path, num_agents, chunksize=100_000, test_size=0.1, random_state=42):
+    """Yields (agent_chunks, test_chunk) for every chunk streamed from data_path."""
+    for chunk in iter_anonymized_data(data_path, chunksize):
+        yield split_chunk(chunk, num_agents, test_size, random_state)
 
+def spill_agent_shards(data_path, out_dir, num_agents, chunksize=100_000, test_size=0.1, random_state=42):
+    """
+    Streams data_path once and writes one file per agent shard plus a test file.
+
+    Only one chunk is held in memory at a time, so inputs larger than RAM can be
+    sharded. Each agent then loads just its own shard.
+
+    Returns:
+        tuple: (list of shard file paths, test file path)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    shard_paths = [os.path.join(out_dir, f"agent_{i}.csv") for i in range(num_agents)]
+    test_path = os.path.join(out_dir, "test.csv")
+
+    first = True
+    for agent_chunks, test_chunk in iter_agent_shards(data_path, num_agents, chunksize, test_size, random_state):
+        mode = 'w' if first else 'a'
+        for path, agent_chunk in zip(shard_paths, agent_chunks):
+            agent_chunk.to_csv(path, mode=mode, header=first, index=False)
+        test_chunk.to_csv(test_path, mode=mode, header=first, index=False)
+        first = False
+    return shard_paths, test_path
+
+def _as_frame(local_data):
+    """Accepts either a DataFrame or the path of a spilled shard file."""
+    if isinstance(local_data, str):
+        return read_table(local_data, dtype=CATEGORICAL_DTYPES)
+    return local_data
+
+def _frame_xy(df, encoder):
+    """Builds (X, y) from a DataFrame; rows with an unknown outcome are dropped, as in ShardRef.xy."""
+    labels = pd.Categorical(df['treatment_outcome'], categories=TREATMENT_OUTCOMES).codes
+    known = labels >= 0
+    if not known.all():
+        df = df[known]
+    with metrics.timer("encode"):
+        X = encoder.transform(df)
+    return X, np.asarray(TREATMENT_OUTCOMES, dtype=object)[labels[known]]
+
+def train_local_model(local_df, encoder=None):
+    """Trains a simple logistic regression model on local data (a DataFrame, shard path or ShardRef)."""
     # For simplicity, let's predict 'treatment_outcome' based on 'age_group' (one-hot encoded)
     # and 'diagnosis_code' (one-hot encoded).
     # In a real scenario, features would be more robust.
 
-    # One-hot encode categorical features
-    features = ['age_group', 'diagnosis_code']
-    X = pd.get_dummies(local_df[features])
-    y = local_df['treatment_outcome']
-
-    # Ensure consistent columns for all agents (important for aggregation)
-    # This is a simplification; in real FL, you'd need a shared feature space.
-    all_possible_age_groups = [f"{i}-{i+9}" for i in range(10, 80, 10)] # Example
-    all_possible_diagnosis_codes = ["C00", "C18", "J45", "I10", "E11", "F32"]
-    all_features = [f"age_group_{ag}" for ag in all_possible_age_groups] + \
-                   [f"diagnosis_code_{dc}" for dc in all_possible_diagnosis_codes]
-
-    # Reindex X to ensure all expected columns are present, filling missing with 0
-    X = X.reindex(columns=all_features, fill_value=0)
+    # The shared encoder guarantees consistent columns for all agents (important for aggregation)
+    if encoder is None:
+        encoder = FeatureEncoder()
+    if isinstance(local_df, ShardRef):
+        # Already encoded in shared memory; only the one-hot expansion happens here
+        with metrics.timer("encode"):
+            X, y = local_df.xy(encoder)
+    else:
+        X, y = _frame_xy(_as_frame(local_df), encoder)
+    if len(y) == 0:
+        return None, 0.0
 
-    # Filter out outcomes that are not in the current local_df if necessary
-    unique_outcomes = y.unique()
+    unique_outcomes = np.unique(y)
     if len(unique_outcomes) < 2: # Need at least two classes for classification
         print("Not enough unique outcomes in local data for classification. Skipping local training.")
         return None, 0.0
 
-    # Filter out rows where y is not in unique_outcomes (shouldn't happen with get_dummies but good practice)
-    valid_indices = y.isin(unique_outcomes)
-    X = X[valid_indices]
-    y = y[valid_indices]
-
-
-    model = LogisticRegression(max_iter=1000, solver='liblinear') # Use liblinear for small datasets
+    # Fixed random_state keeps local fits reproducible no matter which worker runs them
+    model = LogisticRegression(max_iter=1000, solver='liblinear', random_state=42) # Use liblinear for small datasets
     try:
         model.fit(X, y)
         # Calculate a simple accuracy for the local model
@@ -59,21 +131,52 @@ def train_local_model(local_df):
         print(f"Error training local model: {e}. Data might be insufficient or ill-formed.")
         return None, 0.0
 
+def train_local_models(local_data_splits, encoder=None, executor="process", max_workers=None):
+    """
+    Trains one local model per data split concurrently.
+
+    Args:
+        local_data_splits (list[pd.DataFrame | str | ShardRef]): One DataFrame, shard file path or
+                                                                 ShardRef per simulated agent.
+        encoder (FeatureEncoder | None): Shared encoder, built once if not given.
+        executor (str | Executor): 'process' (default), 'thread', 'serial' or an Executor.
+        max_workers (int | None): Pool size, defaults to the number of CPUs.
+
+    Returns:
+        list[tuple]: (model, accuracy, wall_time_seconds) per agent, in input order.
+    """
+    if encoder is None:
+        encoder = FeatureEncoder()
+    train = partial(train_local_model, encoder=encoder)
+    results = run_parallel(train, local_data_splits, executor=executor, max_workers=max_workers)
+    # Timed here rather than in train_local_model, which may run in a worker process
+    for _, wall_time in results:
+        metrics.record("local_train", wall_time)
+    return [(model, acc, wall_time) for (model, acc), wall_time in results]
+
+@metrics.timed("aggregate")
+def aggregate_models(local_models, sample_sizes=None):
+    """
+    Aggregates local model weights (Federated Averaging).
 
-def aggregate_models(local_models):
-    """Aggregates local model weights (Federated Averaging)."""
+    If sample_sizes is given, each model is weighted by the number of rows it was
+    trained on instead of taking a plain mean.
+    """
     if not local_models:
         return None
 
-    # Filter out None models
-    valid_models = [m for m in local_models if m is not None]
-    if not valid_models:
+    # Filter out None models (and their sample sizes)
+    if sample_sizes is None:
+        sample_sizes = [1] * len(local_models)
+    valid = [(m, n) for m, n in zip(local_models, sample_sizes) if m is not None and n > 0]
+    if not valid:
         return None
+    valid_models = [m for m, _ in valid]
+    weights = np.array([n for _, n in valid], dtype=np.float64)
 
     # Assuming all models have the same number of coefficients and intercept
-    num_models = len(valid_models)
-    avg_coef = np.mean([m.coef_ for m in valid_models], axis=0)
-    avg_intercept = np.mean([m.intercept_ for m in valid_models], axis=0)
+    avg_coef = np.average([m.coef_ for m in valid_models], axis=0, weights=weights)
+    avg_intercept = np.average([m.intercept_ for m in valid_models], axis=0, weights=weights)
 
     # Create a dummy model to hold the aggregated weights
     aggregated_model = LogisticRegression(max_iter=1000, solver='liblinear')
@@ -84,29 +187,253 @@ def aggregate_models(local_models):
 
     return aggregated_model
 
-def evaluate_global_model(global_model, test_df):
+def train_local_round(task):
+    """
+    Runs one round of local SGD logistic regression, warm-started from the global weights.
+
+    Args:
+        task (tuple): (data, encoder, classes, global_state, local_epochs, seed) where data is
+                      an (X, y) pair or a ShardRef encoded here with encoder, and global_state
+                      is None on the first round or a dict with 'coef', 'intercept' and 't'.
+
+    Returns:
+        SGDClassifier | None: The locally updated model, or None for an empty shard.
+    """
+    data, encoder, classes, global_state, local_epochs, seed = task
+    X, y = data.xy(encoder) if isinstance(data, ShardRef) else data
+    if len(y) == 0:
+        return None
+
+    # invscaling decays with the carried step counter t_, which keeps rounds from oscillating
+    model = SGDClassifier(loss='log_loss', learning_rate='invscaling', eta0=0.05, random_state=seed)
+    if global_state is not None:
+        # partial_fit keeps existing coef_/intercept_, so this is the warm start
+        model.coef_ = global_state['coef'].copy()
+        model.intercept_ = global_state['intercept'].copy()
+        # Carry the global step counter so the learning rate keeps decaying across rounds
+        model.t_ = global_state['t']
+
+    for _ in range(local_epochs):
+        model.partial_fit(X, y, classes=classes)
+    return model
+
+def run_federated_rounds(local_data_splits, encoder=None, rounds=10, tol=1e-3, local_epochs=1,
+                         executor="process", max_workers=None, random_state=42,
+                         initial_model=None, initial_t=1.0, checkpoints=None):
+    """
+    Multi-round Federated Averaging with warm-started incremental local learners.
+
+    Every round the current global weights are sent back to each agent, which runs
+    `local_epochs` passes of SGD logistic regression via partial_fit. Local models are
+    then averaged weighted by sample size. Training stops early once the relative change
+    of the global weights drops below tol.
+
+    Pass initial_model (e.g. ModelStore.load(...)) and its step counter initial_t to
+    continue from an earlier run instead of starting from zero weights. With a ModelStore
+    as checkpoints, every round's global model is saved under its content hash.
+
+    Returns:
+        tuple: (global_model, history) where history holds one dict per round with
+               'round', 'delta', 'wall_time' and, with checkpoints, 'checkpoint'.
+    """
+    if encoder is None:
+        encoder = FeatureEncoder()
+
+    # Encode every shard once up front, rounds only ship the arrays around.
+    # ShardRefs are shipped as-is: workers read them from shared memory instead.
+    shards = [] # (data sent to the worker, outcome labels)
+    for data in local_data_splits:
+        if isinstance(data, ShardRef):
+            shards.append((data, data.labels()))
+            continue
+        X, y = _frame_xy(_as_frame(data), encoder)
+        shards.append(((X, y), y))
+    sample_sizes = [len(y) for _, y in shards]
+    non_empty = [y for _, y in shards if len(y)]
+    if not non_empty:
+        return None, []
+    classes = np.unique(np.concatenate(non_empty))
+    if len(classes) < 2: # Need at least two classes for classification
+        print("Not enough unique outcomes across agents for classification. Skipping federated training.")
+        return None, []
+
+    global_model = None
+    global_state = None
+    if initial_model is not None:
+        if list(initial_model.classes_) != list(classes):
+            raise ValueError(f"Warm-start model classes {list(initial_model.classes_)} do not match {list(classes)}")
+        global_model = initial_model
+        global_state = {'coef': initial_model.coef_, 'intercept': initial_model.intercept_, 't': float(initial_t)}
+    history = []
+    for round_idx in range(rounds):
+        round_start = time.perf_counter()
+        tasks = [(data, encoder if isinstance(data, ShardRef) else None, classes, global_state, local_epochs,
+                  random_state + round_idx * len(shards) + i)
+                 for i, (data, _) in enumerate(shards)]
+        results = run_parallel(train_local_round, tasks, executor=executor, max_workers=max_workers)
+        local_models = [model for model, _ in results]
+        for _, wall_time in results:
+            metrics.record("local_train", wall_time)
+
+        new_model = aggregate_models(local_models, sample_sizes)
+        if new_model is None:
+            break
+
+        new_weights = np.hstack([new_model.coef_.ravel(), new_model.intercept_.ravel()])
+        if global_model is None:
+            delta = float('inf')
+        else:
+            old_weights = np.hstack([global_model.coef_.ravel(), global_model.intercept_.ravel()])
+            delta = np.linalg.norm(new_weights - old_weights) / max(np.linalg.norm(old_weights), 1e-12)
+
+        global_model = new_model
+        global_state = {
+            'coef': global_model.coef_,
+            'intercept': global_model.intercept_,
+            't': float(np.average([m.t_ for m in local_models if m is not None],
+                                  weights=[n for m, n in zip(local_models, sample_sizes) if m is not None])),
+        }
+        history.append({'round': round_idx + 1, 'delta': delta, 'wall_time': time.perf_counter() - round_start})
+        metrics.record("federated_round", history[-1]['wall_time'])
+        if checkpoints is not None:
+            history[-1]['checkpoint'] = checkpoints.save(global_model, {'round': round_idx + 1, 't': global_state['t'],
+                                                                        'delta': delta})
+
+        if delta < tol:
+            print(f"  Federated training converged after {round_idx + 1} rounds (delta={delta:.2e}).")
+            break
+
+    return global_model, history
+
+def _count_shape(encoder):
+    """(categories + 1 per feature..., outcomes); the extra slot counts unknown category values."""
+    return tuple(len(encoder.categories[col]) + 1 for col in encoder.features) + (len(TREATMENT_OUTCOMES),)
+
+def local_counts(local_data, encoder=None):
+    """
+    Reduces one agent's rows to a count tensor (sufficient statistics for the categorical model).
+
+    With only categorical features, every row falls into one (age_group, diagnosis_code,
+    outcome) cell, so the counts per cell carry everything the global fit needs. The
+    tensor has shape (7 + 1, 6 + 1, 3) for the default encoder, regardless of row count.
+
+    Args:
+        local_data (pd.DataFrame | str | ShardRef): The agent's rows.
+        encoder (FeatureEncoder | None): Shared encoder, built once if not given.
+
+    Returns:
+        np.ndarray: int64 counts of shape _count_shape(encoder).
+    """
+    if encoder is None:
+        encoder = FeatureEncoder()
+    if isinstance(local_data, ShardRef):
+        # Category and outcome codes are already in shared memory
+        codes, labels = local_data.arrays()
+    else:
+        df = _as_frame(local_data)
+        codes = encoder.codes(df)
+        labels = pd.Categorical(df['treatment_outcome'], categories=TREATMENT_OUTCOMES).codes
+
+    shape = _count_shape(encoder)
+    known = labels >= 0
+    # Unknown category codes (-1) go to each feature's last slot
+    cells = [np.where(codes[known, j] >= 0, codes[known, j], shape[j] - 1) for j in range(codes.shape[1])]
+    flat = np.ravel_multi_index((*cells, labels[known]), shape)
+    return np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+def fit_from_counts(counts, encoder=None):
+    """
+    Fits the global logistic regression once on merged count tensors.
+
+    Each non-empty (cell, outcome) pair becomes one training row weighted by its count,
+    which gives the same objective as fitting on every underlying row.
+
+    Returns:
+        LogisticRegression | None: The fitted model, or None with fewer than two outcomes.
+    """
+    if encoder is None:
+        encoder = FeatureEncoder()
+    shape = counts.shape
+    num_features = len(shape) - 1
+    # Category codes of every cell, with the unknown slot mapped back to -1
+    cell_codes = np.indices(shape[:-1]).reshape(num_features, -1).T
+    cell_codes = np.where(cell_codes == np.array(shape[:-1]) - 1, -1, cell_codes).astype(np.int16)
+    X_cells = encoder.transform_codes(cell_codes)
+
+    per_cell = counts.reshape(-1, shape[-1])
+    cell_idx, outcome_idx = np.nonzero(per_cell)
+    if len(np.unique(outcome_idx)) < 2: # Need at least two classes for classification
+        print("Not enough unique outcomes across agents for classification. Skipping global fit.")
+        return None
+
+    outcomes = np.asarray(TREATMENT_OUTCOMES, dtype=object)
+    model = LogisticRegression(max_iter=1000, solver='liblinear', random_state=42)
+    model.fit(X_cells[cell_idx], outcomes[outcome_idx], sample_weight=per_cell[cell_idx, outcome_idx])
+    return model
+
+def train_from_counts(local_data_splits, encoder=None, executor="process", max_workers=None):
+    """
+    Sufficient-statistics training: agents send count tensors, the global model is fitted once.
+
+    Work and communication per agent are O(cells) instead of O(rows), and the result
+    matches fitting one model on all agents' rows together.
+
+    Returns:
+        tuple: (global_model, agent_counts) with one count tensor per agent, in input order.
+    """
+    if encoder is None:
+        encoder = FeatureEncoder()
+    results = run_parallel(partial(local_counts, encoder=encoder), local_data_splits,
+                           executor=executor, max_workers=max_workers)
+    agent_counts = [counts for counts, _ in results]
+    for _, wall_time in results:
+        metrics.record("local_counts", wall_time)
+    with metrics.timer("fit_counts"):
+        global_model = fit_from_counts(np.sum(agent_counts, axis=0), encoder)
+    return global_model, agent_counts
+
+@metrics.timed("evaluate")
+def evaluate_global_model(global_model, test_df, encoder=None):
     """Evaluates the global model on a separate test set."""
     if global_model is None or test_df.empty:
         return 0.0
 
-    features = ['age_group', 'diagnosis_code']
-    X_test = pd.get_dummies(test_df[features])
+    # Filter out rows where the outcome is not in global_model.classes_
     y_test = test_df['treatment_outcome']
+    valid_indices = y_test.isin(global_model.classes_).to_numpy()
+    if not valid_indices.any():
+        return 0.0
 
-    # Ensure consistent columns for evaluation
-    all_possible_age_groups = [f"{i}-{i+9}" for i in range(10, 80, 10)]
-    all_possible_diagnosis_codes = ["C00", "C18", "J45", "I10", "E11", "F32"]
-    all_features = [f"age_group_{ag}" for ag in all_possible_age_groups] + \
-                   [f"diagnosis_code_{dc}" for dc in all_possible_diagnosis_codes]
-    X_test = X_test.reindex(columns=all_features, fill_value=0)
+    if encoder is None:
+        encoder = FeatureEncoder()
+    with metrics.timer("encode"):
+        test_codes = encoder.codes(test_df[valid_indices])
+    y_test = y_test.to_numpy()[valid_indices]
 
-    # Filter out rows where y_test is not in global_model.classes_
-    valid_indices = y_test.isin(global_model.classes_)
-    X_test = X_test[valid_indices]
-    y_test = y_test[valid_indices]
+    # Scored from the raw weights via lookup tables, no one-hot matrix is built
+    accuracy = BatchScorer.from_model(global_model, encoder).accuracy(test_codes, y_test) * 100
+    return accuracy
 
-    if X_test.empty or y_test.empty:
+@metrics.timed("evaluate")
+def evaluate_global_model_chunked(global_model, test_chunks, encoder=None):
+    """Evaluates the global model over an iterable of test chunks without materializing them."""
+    if global_model is None:
         return 0.0
+    if encoder is None:
+        encoder = FeatureEncoder()
+    scorer = BatchScorer.from_model(global_model, encoder)
+
+    correct = 0
+    total = 0
+    for chunk in test_chunks:
+        y = chunk['treatment_outcome']
+        valid_indices = y.isin(global_model.classes_).to_numpy()
+        if not valid_indices.any():
+            continue
+        predictions = scorer.predict(encoder.codes(chunk[valid_indices]))
+        correct += int((predictions == np.asarray(y)[valid_indices]).sum())
+        total += int(valid_indices.sum())
 
-    accuracy = global_model.score(X_test, y_test) * 100
-    return accuracy 
\ No newline at end of file
+    if total == 0:
+        return 0.0
+    return correct / total * 100
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+End-to-end orchestration benchmark.
+
+Times every pipeline stage (mint, grant, permission check, training, aggregation,
+evaluation, submit) on an offline chain backend for each combination of patient
+and agent counts, and writes the results as JSON.
+
+Usage:
+    python benchmark.py --patients 100 1000 --agents 3 10 --rpc-latency 0.05
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Run as a script: put the backend directory on the path before the imports below
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from ai_agent import train_local_models, aggregate_models, evaluate_global_model
+from chain import connect
+from checkpoints import model_hash
+from encoder import FeatureEncoder
+from orchestrator import (use_chain, mint_carv_ids, grant_access_many, has_access_many,
+                          submit_research_result)
+
+STAGES = ["mint", "grant", "permission_check", "training", "aggregation", "evaluation", "submit"]
+
+
+@contextmanager
+def _stage(timings, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def run_benchmark(num_patients, num_agents, num_records=10000, backend="mock", rpc_latency=0.0,
+                  executor="process", seed=42):
+    """
+    Runs the orchestration pipeline once and returns per-stage wall times.
+
+    Returns:
+        dict: Configuration, 'stages' (seconds per stage), 'total' and, for the
+              mock backend, the number of RPC calls per method.
+    """
+    # Imported here so the benchmark module itself stays cheap to import
+    from utils.data_provider import generate_medical_data
+
+    chain_kwargs = {"rpc_latency": rpc_latency} if backend == "mock" else {}
+    chain = use_chain(connect(backend, **chain_kwargs))
+    patient_address = chain.deployer_account.address
+    agent_address = chain.ai_agent_account.address
+    data_type_hash = chain.w3.keccak(text="drug_discovery_data")
+    token_ids = list(range(1, num_patients + 1))
+
+    df = generate_medical_data(num_records, seed=seed, verbose=False)
+    encoder = FeatureEncoder()
+    shards = np.array_split(df, num_agents)
+    test_df = df.sample(frac=0.1, random_state=seed)
+
+    timings = {}
+    with _stage(timings, "mint"):
+        mint_carv_ids([(patient_address, t, f"https://example.com/carv-id/{t}") for t in token_ids])
+    with _stage(timings, "grant"):
+        grant_access_many(token_ids, agent_address, data_type_hash)
+    with _stage(timings, "permission_check"):
+        allowed = has_access_many(token_ids, agent_address, data_type_hash)
+    with _stage(timings, "training"):
+        local_results = train_local_models(shards, encoder=encoder, executor=executor)
+    with _stage(timings, "aggregation"):
+        global_model = aggregate_models([model for model, _, _ in local_results])
+    with _stage(timings, "evaluation"):
+        accuracy = evaluate_global_model(global_model, test_df, encoder=encoder)
+    with _stage(timings, "submit"):
+        result_hash = model_hash(global_model)
+        submit_research_result("Benchmark", result_hash, int(accuracy), agent_address)
+
+    result = {
+        "backend": backend,
+        "patients": num_patients,
+        "agents": num_agents,
+        "records": num_records,
+        "rpc_latency": rpc_latency,
+        "executor": executor,
+        "patients_with_access": int(sum(allowed)),
+        "accuracy": accuracy,
+        "stages": timings,
+        "total": sum(timings.values()),
+    }
+    if hasattr(chain.w3, "rpc_calls"):
+        result["rpc_calls"] = dict(chain.w3.rpc_calls)
+    chain.tx_manager.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the orchestration pipeline stage by stage")
+    parser.add_argument('--patients', type=int, nargs='+', default=[10, 100], help='Patient counts to run')
+    parser.add_argument('--agents', type=int, nargs='+', default=[3], help='Agent counts to run')
+    parser.add_argument('--records', type=int, default=10000, help='Synthetic records per run')
+    parser.add_argument('--backend', default="mock", help='Chain backend (default: mock)')
+    parser.add_argument('--rpc-latency', type=float, default=0.0, help='Simulated seconds per RPC call (mock only)')
+    parser.add_argument('--executor', default="process", choices=["process", "thread", "serial"])
+    parser.add_argument('--output', default="benchmark_results.json", help='JSON results file')
+    args = parser.parse_args()
+
+    runs = []
+    for num_patients in args.patients:
+        for num_agents in args.agents:
+            print(f"\n=== {num_patients} patients, {num_agents} agents ===")
+            run = run_benchmark(num_patients, num_agents, args.records, args.backend, args.rpc_latency, args.executor)
+            runs.append(run)
+
+    print("\n" + "patients agents " + " ".join(f"{s:>16}" for s in STAGES) + "     total")
+    for run in runs:
+        print(f"{run['patients']:>8} {run['agents']:>6} "
+              + " ".join(f"{run['stages'][s]:>15.4f}s" for s in STAGES) + f" {run['total']:>8.3f}s")
+
+    with open(args.output, "w") as f:
+        json.dump({"python": platform.python_version(), "runs": runs}, f, indent=2)
+    print(f"\nBenchmark results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import os
+from functools import cached_property
+
+from utils import metrics
+
+# --- Contract ABIs and Addresses (Replace with your deployed values) ---
+CARV_ID_NFT_ADDRESS = "YOUR_CARV_ID_NFT_CONTRACT_ADDRESS"
+MEDICAL_RESEARCH_RESULTS_ADDRESS = "YOUR_MEDICAL_RESEARCH_RESULTS_CONTRACT_ADDRESS"
+
+
+def rpc_metrics_middleware(make_request, w3):
+    """web3 middleware that times every JSON-RPC request as the 'rpc_call' stage."""
+    def middleware(method, params):
+        with metrics.timer("rpc_call", method=method):
+            return make_request(method, params)
+    return middleware
+
+
+class Chain:
+    """
+    Everything the orchestrator needs from a chain backend: a web3-compatible client,
+    the two contracts, the two wallets, and the transaction / permission helpers
+    built on top of them.
+    """
+
+    def __init__(self, w3, carv_id_contract, research_results_contract, deployer_account, ai_agent_account, name=""):
+        self.name = name
+        self.w3 = w3
+        self.carv_id_contract = carv_id_contract
+        self.research_results_contract = research_results_contract
+        self.deployer_account = deployer_account
+        self.ai_agent_account = ai_agent_account
+
+    @cached_property
+    def tx_manager(self):
+        """Keeps nonces locally and caches chain id / fees so transactions can be pipelined."""
+        from tx_manager import TransactionManager
+        return TransactionManager(self.w3)
+
+    @cached_property
+    def permission_checker(self):
+        """Batches hasAccess/ownerOf reads through Multicall3 and memoizes them until invalidated."""
+        from permissions import PermissionChecker
+        return PermissionChecker(self.w3, self.carv_id_contract)
+
+
+def connect_sepolia():
+    """
+    Connects to Sepolia using SEPOLIA_RPC_URL, PRIVATE_KEY and AGENT_ADDRESS_PRIVATE_KEY
+    from the environment (.env) and the Hardhat ABI files in the working directory.
+
+    Raises:
+        RuntimeError: If configuration is missing or the RPC is unreachable.
+    """
+    from dotenv import load_dotenv
+    from web3 import Web3
+    load_dotenv()
+
+    sepolia_rpc_url = os.getenv("SEPOLIA_RPC_URL")
+    private_key = os.getenv("PRIVATE_KEY")
+    agent_private_key = os.getenv("AGENT_ADDRESS_PRIVATE_KEY") # Separate key for the AI agent wallet
+    if not sepolia_rpc_url or not private_key or not agent_private_key:
+        raise RuntimeError("Please set SEPOLIA_RPC_URL, PRIVATE_KEY, and AGENT_ADDRESS_PRIVATE_KEY in your .env file.")
+
+    w3 = Web3(Web3.HTTPProvider(sepolia_rpc_url))
+    w3.middleware_onion.add(rpc_metrics_middleware, name="metrics")
+    if not w3.is_connected():
+        raise RuntimeError("Not connected to Sepolia RPC. Check your SEPOLIA_RPC_URL.")
+
+    # Load ABIs (assuming you have them as JSON files from Hardhat artifacts)
+    # You'll need to copy these from your Hardhat project's artifacts folder
+    # e.g., artifacts/contracts/CarvIdNFT.sol/CarvIdNFT.json
+    try:
+        with open("CarvIdNFT.json", "r") as f:
+            carv_id_nft_abi = json.load(f)["abi"]
+        with open("MedicalResearchResults.json", "r") as f:
+            medical_research_results_abi = json.load(f)["abi"]
+    except FileNotFoundError as e:
+        raise RuntimeError(f"Contract ABI file not found: {e.filename}") from e
+
+    carv_id_nft_address = os.getenv("CARV_ID_NFT_ADDRESS", CARV_ID_NFT_ADDRESS)
+    research_results_address = os.getenv("MEDICAL_RESEARCH_RESULTS_ADDRESS", MEDICAL_RESEARCH_RESULTS_ADDRESS)
+    carv_id_contract = w3.eth.contract(address=carv_id_nft_address, abi=carv_id_nft_abi)
+    research_results_contract = w3.eth.contract(address=research_results_address, abi=medical_research_results_abi)
+
+    # --- Wallet Setup ---
+    # Wallet used for deploying and general interactions (e.g., patient actions)
+    deployer_account = w3.eth.account.from_key(private_key)
+    print(f"Deployer Account: {deployer_account.address}")
+
+    # Wallet representing an AI agent that will submit results
+    ai_agent_account = w3.eth.account.from_key(agent_private_key)
+    print(f"AI Agent Account: {ai_agent_account.address}")
+
+    return Chain(w3, carv_id_contract, research_results_contract, deployer_account, ai_agent_account, name="sepolia")
+
+
+def connect_mock(rpc_latency=0.0, block_time=0.0, multicall=True, max_logs=None):
+    """Builds an offline chain backed by MockWeb3 (see mock_chain.py)."""
+    from mock_chain import MockWeb3, MOCK_DEPLOYER_KEY, MOCK_AGENT_KEY, MOCK_MAX_LOGS
+
+    w3 = MockWeb3(rpc_latency=rpc_latency, block_time=block_time, multicall=multicall,
+                  max_logs=max_logs or MOCK_MAX_LOGS)
+    deployer_account = w3.eth.account.from_key(MOCK_DEPLOYER_KEY)
+    ai_agent_account = w3.eth.account.from_key(MOCK_AGENT_KEY)
+    return Chain(w3, w3.carv_id_nft, w3.research_results, deployer_account, ai_agent_account, name="mock")
+
+
+# Backend name (CHAIN_BACKEND env var) -> factory
+CHAIN_BACKENDS = {
+    "sepolia": connect_sepolia,
+    "mock": connect_mock,
+}
+
+
+def connect(backend=None, **kwargs):
+    """Connects to the named backend, defaulting to CHAIN_BACKEND or 'sepolia'."""
+    backend = backend or os.getenv("CHAIN_BACKEND", "sepolia")
+    if backend not in CHAIN_BACKENDS:
+        raise RuntimeError(f"Unknown chain backend '{backend}'. Expected one of {sorted(CHAIN_BACKENDS)}.")
+    return CHAIN_BACKENDS[backend](**kwargs)
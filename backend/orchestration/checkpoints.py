@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+# Canonical model format: MAGIC, header length (uint32 LE), JSON header, coef bytes, intercept bytes.
+# Weights are always little-endian float64 in C order, so the same weights give the same bytes
+# (and hash) on every machine, with no float-to-text formatting involved.
+MAGIC = b"AFMODEL\x01"
+WEIGHT_DTYPE = np.dtype("<f8")
+
+
+def _canonical_parts(coef, intercept, classes):
+    coef = np.ascontiguousarray(coef, dtype=WEIGHT_DTYPE)
+    intercept = np.ascontiguousarray(np.ravel(intercept), dtype=WEIGHT_DTYPE)
+    header = json.dumps({
+        "classes": np.asarray(classes).tolist(),
+        "coef_shape": list(coef.shape),
+        "intercept_shape": list(intercept.shape),
+        "dtype": WEIGHT_DTYPE.str,
+    }, sort_keys=True, separators=(",", ":")).encode()
+    return [MAGIC, struct.pack("<I", len(header)), header, memoryview(coef).cast("B"), memoryview(intercept).cast("B")]
+
+
+def _sha256(parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part)
+    return digest
+
+
+def weights_hash(coef, intercept, classes):
+    """SHA-256 of the canonical serialization of the weights (32 bytes, usable as a bytes32)."""
+    return _sha256(_canonical_parts(coef, intercept, classes)).digest()
+
+
+def model_hash(model):
+    """Content hash of a linear model's coef_, intercept_ and classes_ (the on-chain result hash)."""
+    return weights_hash(model.coef_, model.intercept_, model.classes_)
+
+
+def _parse(blob):
+    """Reads (coef, intercept, classes) back from canonical bytes; the arrays are read-only views."""
+    if blob[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a model checkpoint (bad magic).")
+    offset = len(MAGIC)
+    (header_len,) = struct.unpack_from("<I", blob, offset)
+    offset += 4
+    header = json.loads(bytes(blob[offset:offset + header_len]))
+    offset += header_len
+    dtype = np.dtype(header["dtype"])
+    coef_size = int(np.prod(header["coef_shape"]))
+    coef = np.frombuffer(blob, dtype=dtype, count=coef_size, offset=offset).reshape(header["coef_shape"])
+    offset += coef.nbytes
+    intercept = np.frombuffer(blob, dtype=dtype, count=int(np.prod(header["intercept_shape"])), offset=offset)
+    return coef, intercept, np.asarray(header["classes"], dtype=object)
+
+
+class ModelStore:
+    """
+    Content-addressed store of global model checkpoints.
+
+    Each model is written once to `objects/<hash>.model` in the canonical format above, with
+    an optional `objects/<hash>.json` holding metadata (round, step counter, accuracy, ...).
+    Saving weights that are already stored is free. Named refs (`refs/<name>`, e.g. "latest")
+    point at a hash, so a later run can warm-start from a ref or from a hash directly.
+    """
+
+    def __init__(self, root="checkpoints"):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_dir = os.path.join(root, "refs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    def _object_path(self, digest, ext=".model"):
+        return os.path.join(self.objects_dir, digest + ext)
+
+    def save(self, model, metadata=None):
+        """
+        Stores model (anything with coef_, intercept_ and classes_) and returns its hex hash.
+
+        Args:
+            model: The model whose weights are stored.
+            metadata (dict | None): JSON-serializable details saved next to the weights, merged
+                                    into any metadata already stored for the same weights.
+        """
+        parts = _canonical_parts(model.coef_, model.intercept_, model.classes_)
+        digest = _sha256(parts).hexdigest()
+
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for part in parts:
+                    f.write(part)
+            # Atomic rename, so readers never see a partial checkpoint
+            os.replace(tmp_path, path)
+        if metadata is not None:
+            merged = {**self.metadata(digest), **metadata}
+            meta_path = self._object_path(digest, ".json")
+            with open(f"{meta_path}.{os.getpid()}.tmp", "w") as f:
+                json.dump(merged, f, default=str)
+            os.replace(f.name, meta_path)
+        return digest
+
+    def tag(self, name, digest):
+        """Points the ref `name` at digest."""
+        tmp_path = os.path.join(self.refs_dir, f".{name}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(digest)
+        os.replace(tmp_path, os.path.join(self.refs_dir, name))
+
+    def resolve(self, ref):
+        """Returns the hash a ref name (or a hash, with or without 0x) refers to."""
+        ref_path = os.path.join(self.refs_dir, ref)
+        if os.path.isfile(ref_path):
+            with open(ref_path) as f:
+                return f.read().strip()
+        digest = ref[2:] if ref.startswith("0x") else ref
+        if not os.path.exists(self._object_path(digest)):
+            raise KeyError(f"No checkpoint or ref named '{ref}' in {self.root}")
+        return digest
+
+    def __contains__(self, ref):
+        try:
+            self.resolve(ref)
+            return True
+        except KeyError:
+            return False
+
+    def load_weights(self, ref):
+        """Returns (coef, intercept, classes) of a stored model."""
+        with open(self._object_path(self.resolve(ref)), "rb") as f:
+            return _parse(f.read())
+
+    def load(self, ref):
+        """Rebuilds a stored model as a LogisticRegression ready for predict/score or warm starts."""
+        from sklearn.linear_model import LogisticRegression
+        coef, intercept, classes = self.load_weights(ref)
+        # Same shell aggregate_models builds; copies make the weights writable again
+        model = LogisticRegression(max_iter=1000, solver='liblinear')
+        model.coef_ = coef.copy()
+        model.intercept_ = intercept.copy()
+        model.classes_ = classes
+        return model
+
+    def metadata(self, ref):
+        """Metadata saved with a model ({} if none)."""
+        path = self._object_path(self.resolve(ref), ".json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
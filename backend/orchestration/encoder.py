@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Shared feature space used by every agent and by evaluation
+FEATURES = ['age_group', 'diagnosis_code']
+AGE_GROUPS = [f"{i}-{i+9}" for i in range(10, 80, 10)]
+DIAGNOSIS_CODES = ["C00", "C18", "J45", "I10", "E11", "F32"]
+TREATMENT_OUTCOMES = ["Improved", "Stable", "Worsened"]
+
+# Explicit dtypes for the categorical columns so every chunk shares the same categories
+CATEGORICAL_DTYPES = {
+    'age_group': pd.CategoricalDtype(AGE_GROUPS),
+    'diagnosis_code': pd.CategoricalDtype(DIAGNOSIS_CODES),
+    'treatment_outcome': pd.CategoricalDtype(TREATMENT_OUTCOMES),
+}
+
+
+class FeatureEncoder:
+    """
+    One-hot encodes categorical columns into a preallocated matrix via a code lookup.
+
+    The encoder is built once per run and shared by every agent and by evaluation,
+    so all local models see exactly the same column layout. Column order matches the
+    old `pd.get_dummies(...).reindex(columns=all_features)` output.
+    """
+
+    def __init__(self, categories=None, dtype=np.float64):
+        if categories is None:
+            categories = {'age_group': AGE_GROUPS, 'diagnosis_code': DIAGNOSIS_CODES}
+        self.dtype = dtype
+        self._set_categories(categories)
+
+    def _set_categories(self, categories):
+        self.categories = {col: list(values) for col, values in categories.items()}
+        self.features = list(self.categories)
+        self.feature_names = [f"{col}_{value}" for col in self.features for value in self.categories[col]]
+
+        # Column offset of each feature block inside the encoded matrix
+        self.offsets = {}
+        offset = 0
+        for col in self.features:
+            self.offsets[col] = offset
+            offset += len(self.categories[col])
+        self.n_features = offset
+
+    def fit(self, df, features=None):
+        """Learns the category vocabulary from df (sorted unique values per column)."""
+        features = features or self.features
+        self._set_categories({col: sorted(df[col].dropna().unique()) for col in features})
+        return self
+
+    def codes(self, df):
+        """Returns an (n_rows, n_features_in) int array of category codes, -1 for unknown values."""
+        codes = np.empty((len(df), len(self.features)), dtype=np.int16)
+        for j, col in enumerate(self.features):
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype) and list(column.cat.categories) == self.categories[col]:
+                # Already coded with our vocabulary, no lookup needed
+                codes[:, j] = column.cat.codes.to_numpy()
+            else:
+                codes[:, j] = pd.Categorical(column, categories=self.categories[col]).codes
+        return codes
+
+    def transform_codes(self, codes, sparse=False):
+        """Builds the one-hot matrix from category codes produced by `codes`."""
+        n_rows = codes.shape[0]
+        rows = np.arange(n_rows)
+        if sparse:
+            from scipy import sparse as sp
+            row_idx, col_idx = [], []
+            for j, col in enumerate(self.features):
+                known = codes[:, j] >= 0
+                row_idx.append(rows[known])
+                col_idx.append(codes[known, j].astype(np.int64) + self.offsets[col])
+            row_idx = np.concatenate(row_idx)
+            col_idx = np.concatenate(col_idx)
+            data = np.ones(len(row_idx), dtype=self.dtype)
+            return sp.csr_matrix((data, (row_idx, col_idx)), shape=(n_rows, self.n_features))
+
+        X = np.zeros((n_rows, self.n_features), dtype=self.dtype)
+        for j, col in enumerate(self.features):
+            known = codes[:, j] >= 0
+            X[rows[known], codes[known, j] + self.offsets[col]] = 1
+        return X
+
+    def transform(self, df, sparse=False):
+        """
+        Encodes df into a one-hot design matrix.
+
+        Args:
+            df (pd.DataFrame): Frame containing the encoder's feature columns.
+            sparse (bool): Return a scipy CSR matrix instead of a dense NumPy array.
+
+        Returns:
+            np.ndarray | scipy.sparse.csr_matrix: Shape (len(df), n_features).
+        """
+        return self.transform_codes(self.codes(df), sparse=sparse)
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+# Supported executor kinds for parallel federated training
+EXECUTOR_KINDS = ("process", "thread", "serial")
+
+
+class SerialExecutor(Executor):
+    """Executor that runs every task inline. Useful for debugging and tiny runs."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def make_executor(kind="process", max_workers=None):
+    """Creates an executor of the given kind ('process', 'thread' or 'serial')."""
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Unknown executor '{kind}'. Expected one of {EXECUTOR_KINDS}.")
+    if kind == "serial":
+        return SerialExecutor()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def _timed_call(fn, item):
+    """Runs fn(item) and returns (result, wall_time_seconds)."""
+    start = time.perf_counter()
+    result = fn(item)
+    return result, time.perf_counter() - start
+
+
+def run_parallel(fn, items, executor="process", max_workers=None):
+    """
+    Applies fn to every item concurrently and returns a list of (result, wall_time)
+    tuples in the same order as items, so results are deterministic regardless of
+    which worker finishes first.
+
+    Args:
+        fn: A module-level callable (it must be picklable for the process executor).
+        items: The inputs to map over.
+        executor (str | Executor): An executor kind or an existing Executor instance.
+        max_workers (int | None): Pool size, defaults to the number of CPUs.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    if isinstance(executor, Executor):
+        futures = [executor.submit(_timed_call, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+    # Never start more workers than there are tasks
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(items))
+    with make_executor(executor, max_workers) as pool:
+        futures = [pool.submit(_timed_call, fn, item) for item in items]
+        return [f.result() for f in futures]
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Local event indexer for the CARV ID and research results contracts.
+
+Pulls AccessGranted / AccessRevoked and ResultSubmitted logs with eth_getLogs in
+adaptive block ranges, decodes them and writes them to SQLite. Every batch is committed
+together with the last indexed block, so an interrupted sync resumes where it stopped.
+Permission checks and result history can then be answered from the local database.
+
+Usage:
+    python indexer.py --db events.db --from-block 5000000
+    python indexer.py --db events.db --poll 12
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from eth_abi import decode
+from hexbytes import HexBytes
+from web3 import Web3
+
+
+# Checksumming costs tens of microseconds, more than the SQLite lookup itself
+_checksum = lru_cache(maxsize=4096)(Web3.to_checksum_address)
+
+# Provider rejections of an eth_getLogs call that matched too many logs or spanned too many blocks
+# (Infura/Alchemy -32005, "query returned more than 10000 results", "block range is too wide", ...)
+_RANGE_ERROR = re.compile(r"-32005|more than \d+ results|too many results|\brange\b", re.IGNORECASE)
+
+
+def _is_range_error(error):
+    return bool(_RANGE_ERROR.search(str(error)))
+
+
+class EventSpec:
+    """An event to index: name, emitting contract attribute of Chain, and (name, type, indexed) inputs."""
+
+    def __init__(self, name, contract, inputs):
+        self.name = name
+        self.contract = contract
+        self.inputs = inputs
+        self.signature = f"{name}({','.join(abi_type for _, abi_type, _ in inputs)})"
+        self.topic = HexBytes(Web3.keccak(text=self.signature))
+
+    def decode(self, log):
+        """Returns the event arguments of a raw log as a dict."""
+        topics = log['topics'][1:]
+        data_inputs = [(name, abi_type) for name, abi_type, indexed in self.inputs if not indexed]
+        data_values = decode([abi_type for _, abi_type in data_inputs], bytes(HexBytes(log['data'])))
+        args = dict(zip((name for name, _ in data_inputs), data_values))
+        indexed_inputs = [(name, abi_type) for name, abi_type, indexed in self.inputs if indexed]
+        for (name, abi_type), topic in zip(indexed_inputs, topics):
+            args[name] = decode([abi_type], bytes(HexBytes(topic)))[0]
+        return args
+
+
+# CarvID.sol events, and the result event of MedicalResearchResults (mirrors submitAggregatedResult)
+EVENT_SPECS = [
+    EventSpec("AccessGranted", "carv_id_contract",
+              [("carvId", "uint256", True), ("agentAddress", "address", True), ("dataTypeHash", "bytes32", True)]),
+    EventSpec("AccessRevoked", "carv_id_contract",
+              [("carvId", "uint256", True), ("agentAddress", "address", True), ("dataTypeHash", "bytes32", True)]),
+    EventSpec("ResultSubmitted", "research_results_contract",
+              [("resultId", "uint256", True), ("agentAddress", "address", True), ("researchTopic", "string", False),
+               ("resultHash", "bytes32", False), ("accuracy", "uint256", False)]),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value INTEGER);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER, log_index INTEGER, tx_hash TEXT, address TEXT, event TEXT, args TEXT,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE TABLE IF NOT EXISTS access (
+    carv_id TEXT, agent TEXT, data_type_hash BLOB, granted INTEGER, block_number INTEGER,
+    PRIMARY KEY (carv_id, agent, data_type_hash)
+);
+CREATE TABLE IF NOT EXISTS results (
+    block_number INTEGER, log_index INTEGER, tx_hash TEXT, result_id TEXT, agent TEXT,
+    research_topic TEXT, result_hash BLOB, accuracy INTEGER,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS results_agent ON results (agent);
+CREATE INDEX IF NOT EXISTS results_topic ON results (research_topic);
+"""
+
+
+class EventIndexer:
+    """
+    Mirrors contract events into SQLite.
+
+    The block range per eth_getLogs call adapts: it doubles after a call that returned
+    few logs and halves when the provider rejects the call for its size (too many results,
+    range too large). Other failures (timeouts, dropped connections, rate limits) are
+    retried on the same range with exponential backoff. `access` holds the latest grant/revoke state per
+    (carv_id, agent, data_type_hash), and `results` holds every submitted result.
+    """
+
+    def __init__(self, chain, path="events.db", start_block=0, batch_size=1000, max_batch_size=100_000,
+                 target_logs=2000, confirmations=0, specs=None, max_retries=5, retry_delay=0.5):
+        """
+        Args:
+            chain (Chain): Chain backend (see chain.connect).
+            path (str): SQLite file, or ":memory:".
+            start_block (int): First block to index on a fresh database (the contracts' deploy block).
+            batch_size (int): Initial blocks per eth_getLogs call.
+            max_batch_size (int): Upper bound for the adaptive block range.
+            target_logs (int): Grow the range while calls return fewer logs than this.
+            confirmations (int): Blocks behind the head to stay, so reorged blocks are not indexed.
+            specs (list[EventSpec] | None): Events to index, default EVENT_SPECS.
+            max_retries (int): Retries of a call that failed for another reason than its size.
+            retry_delay (float): Seconds before the first retry; doubled after each one.
+        """
+        self.chain = chain
+        self.start_block = start_block
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.target_logs = target_logs
+        self.confirmations = confirmations
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.specs = {spec.topic: spec for spec in (specs or EVENT_SPECS)}
+        self.addresses = sorted({Web3.to_checksum_address(getattr(chain, spec.contract).address)
+                                 for spec in self.specs.values()})
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    @property
+    def last_block(self):
+        """Last block fully indexed, or start_block - 1 before the first sync."""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM sync_state WHERE key = 'last_block'").fetchone()
+        return row[0] if row else self.start_block - 1
+
+    def _get_logs(self, from_block, to_block):
+        return self.chain.w3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': self.addresses,
+            'topics': [list(self.specs)],
+        })
+
+    def sync(self, to_block=None):
+        """
+        Indexes every block after last_block up to to_block (default: head - confirmations).
+
+        Returns:
+            int: Number of events indexed.
+        """
+        if to_block is None:
+            to_block = self.chain.w3.eth.block_number - self.confirmations
+        from_block = self.last_block + 1
+        indexed = 0
+        failures = 0
+        while from_block <= to_block:
+            batch_end = min(from_block + self.batch_size - 1, to_block)
+            try:
+                logs = self._get_logs(from_block, batch_end)
+            except Exception as e:
+                if _is_range_error(e):
+                    if batch_end == from_block:
+                        raise RuntimeError(f"eth_getLogs failed for single block {from_block}: {e}") from e
+                    # Too many results or range too large: retry with half the range
+                    self.batch_size = max(1, (batch_end - from_block + 1) // 2)
+                    continue
+                if failures >= self.max_retries:
+                    raise
+                # Transient failure: same range again after a growing pause
+                time.sleep(self.retry_delay * 2 ** failures)
+                failures += 1
+                continue
+            failures = 0
+
+            self._store(logs, batch_end)
+            indexed += len(logs)
+            from_block = batch_end + 1
+            if len(logs) < self.target_logs // 2:
+                self.batch_size = min(self.batch_size * 2, self.max_batch_size)
+        return indexed
+
+    def _store(self, logs, last_block):
+        """Writes one batch of logs and the new last_block in a single transaction."""
+        logs = sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+        with self._lock, self._db:
+            for log in logs:
+                spec = self.specs.get(HexBytes(log['topics'][0]))
+                if spec is None:
+                    continue
+                args = spec.decode(log)
+                block_number, log_index = log['blockNumber'], log['logIndex']
+                tx_hash = HexBytes(log['transactionHash']).hex()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)",
+                    (block_number, log_index, tx_hash, Web3.to_checksum_address(log['address']), spec.name,
+                     json.dumps(args, default=lambda v: HexBytes(v).hex() if isinstance(v, bytes) else str(v))),
+                )
+                if spec.name in ("AccessGranted", "AccessRevoked"):
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO access VALUES (?, ?, ?, ?, ?)",
+                        (str(args['carvId']), _checksum(args['agentAddress']), args['dataTypeHash'],
+                         int(spec.name == "AccessGranted"), block_number),
+                    )
+                elif spec.name == "ResultSubmitted":
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (block_number, log_index, tx_hash, str(args['resultId']),
+                         _checksum(args['agentAddress']), args['researchTopic'], args['resultHash'],
+                         int(args['accuracy'])),
+                    )
+            self._db.execute("INSERT OR REPLACE INTO sync_state VALUES ('last_block', ?)", (last_block,))
+
+    def has_access(self, carv_id, agent_address, data_type_hash):
+        """hasAccess answered from the indexed grant/revoke events (as of last_block)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT granted FROM access WHERE carv_id = ? AND agent = ? AND data_type_hash = ?",
+                (str(carv_id), _checksum(agent_address), bytes(HexBytes(data_type_hash))),
+            ).fetchone()
+        return bool(row and row[0])
+
+    def has_access_many(self, carv_ids, agent_address, data_type_hash):
+        """has_access for many CARV IDs of one agent and data type, in input order."""
+        agent_address = _checksum(agent_address)
+        data_type_hash = bytes(HexBytes(data_type_hash))
+        with self._lock:
+            granted = {carv_id for carv_id, in self._db.execute(
+                "SELECT carv_id FROM access WHERE agent = ? AND data_type_hash = ? AND granted = 1",
+                (agent_address, data_type_hash),
+            )}
+        return [str(carv_id) in granted for carv_id in carv_ids]
+
+    def results(self, agent_address=None, research_topic=None, limit=None):
+        """Submitted results, newest first, optionally filtered by agent and/or topic."""
+        where, params = [], []
+        if agent_address is not None:
+            where.append("agent = ?")
+            params.append(_checksum(agent_address))
+        if research_topic is not None:
+            where.append("research_topic = ?")
+            params.append(research_topic)
+        sql = "SELECT block_number, tx_hash, result_id, agent, research_topic, result_hash, accuracy FROM results"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY block_number DESC, log_index DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        keys = ('block_number', 'tx_hash', 'result_id', 'agent', 'research_topic', 'result_hash', 'accuracy')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from chain import connect
+
+    parser = argparse.ArgumentParser(description="Index CARV ID and research result events into SQLite")
+    parser.add_argument('--db', default=os.getenv("EVENT_INDEX_PATH", "events.db"), help='SQLite file')
+    parser.add_argument('--from-block', type=int, default=int(os.getenv("EVENT_INDEX_START_BLOCK", "0")),
+                        help='First block on a fresh database (contract deploy block)')
+    parser.add_argument('--confirmations', type=int, default=0, help='Blocks to stay behind the head')
+    parser.add_argument('--poll', type=float, help='Keep following the chain, syncing every POLL seconds')
+    args = parser.parse_args()
+
+    with EventIndexer(connect(), args.db, start_block=args.from_block, confirmations=args.confirmations) as indexer:
+        while True:
+            start = time.perf_counter()
+            count = indexer.sync()
+            print(f"Indexed {count} events up to block {indexer.last_block} in {time.perf_counter() - start:.2f}s")
+            if not args.poll:
+                break
+            time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+
+# Rows scored per chunk; bounds the temporary index/logit arrays regardless of input size
+DEFAULT_CHUNK_SIZE = 1_000_000
+# Largest joint cell grid precomputed into a single probability table
+MAX_TABLE_CELLS = 1 << 20
+
+
+class BatchScorer:
+    """
+    Scores category-coded rows with a linear model from its raw weights.
+
+    Inputs are one-hot blocks with a single active column per feature, so a row's logits
+    are the intercept plus one coefficient column per feature. The scorer gathers those
+    from per-feature lookup tables instead of building the one-hot matrix. When the joint
+    grid of cells is small (it is 8x7 for the default features) probabilities and labels
+    are precomputed per cell and scoring becomes one integer index per row.
+
+    Only NumPy is used: weights are plain arrays and codes are the (n_rows, n_features)
+    ints produced by `FeatureEncoder.codes`, with -1 for unknown values (which contribute
+    nothing, like an all-zero one-hot block).
+    """
+
+    def __init__(self, coef, intercept, classes, category_sizes, multi_class="ovr",
+                 chunk_size=DEFAULT_CHUNK_SIZE, dtype=np.float64):
+        """
+        Args:
+            coef (np.ndarray): (n_classes, n_columns) weights, or (1, n_columns) for two classes.
+            intercept (np.ndarray): (n_classes,) or (1,) intercepts.
+            classes (array-like): Class labels in weight order.
+            category_sizes (list[int]): Number of one-hot columns of each feature block, in column order.
+            multi_class (str): "ovr" (normalized per-class sigmoids, as liblinear does) or "multinomial" (softmax).
+            chunk_size (int): Rows scored at a time.
+            dtype: Float type of the returned probabilities.
+        """
+        if multi_class not in ("ovr", "multinomial"):
+            raise ValueError(f"Unknown multi_class '{multi_class}'. Expected 'ovr' or 'multinomial'.")
+        coef = np.atleast_2d(np.asarray(coef, dtype=np.float64))
+        intercept = np.ravel(np.asarray(intercept, dtype=np.float64))
+        self.classes = np.asarray(classes)
+        self.category_sizes = [int(size) for size in category_sizes]
+        if coef.shape[1] != sum(self.category_sizes):
+            raise ValueError(f"coef has {coef.shape[1]} columns, category sizes add up to {sum(self.category_sizes)}.")
+        if coef.shape[0] != len(intercept):
+            raise ValueError(f"coef has {coef.shape[0]} rows but there are {len(intercept)} intercepts.")
+        self.binary = coef.shape[0] == 1
+        expected_classes = 2 if self.binary else coef.shape[0]
+        if len(self.classes) != expected_classes:
+            raise ValueError(f"Weights describe {expected_classes} classes, got {len(self.classes)} labels.")
+        self.multi_class = multi_class
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+        self.intercept = intercept
+
+        # Per-feature logit tables, (categories + 1, n_outputs); the last row (index -1) is for unknown codes
+        self.tables = []
+        offset = 0
+        for size in self.category_sizes:
+            table = np.zeros((size + 1, coef.shape[0]))
+            table[:size] = coef[:, offset:offset + size].T
+            self.tables.append(table)
+            offset += size
+
+        # Strides of the joint (categories + 1, ...) cell grid, for the precomputed path
+        dims = [size + 1 for size in self.category_sizes]
+        self.cells = int(np.prod(dims))
+        self.strides = np.array([int(np.prod(dims[j + 1:])) for j in range(len(dims))], dtype=np.int64)
+        self.cell_proba = None
+        self.cell_labels = None
+        if self.cells <= MAX_TABLE_CELLS:
+            grid = np.indices(dims).reshape(len(dims), -1).T
+            # Map the last slot of each feature back to -1 so it picks the zero row
+            grid = np.where(grid == np.array(self.category_sizes), -1, grid)
+            logits = self._logits(grid)
+            self.cell_proba = self._proba(logits).astype(dtype)
+            self.cell_labels = self._label_codes(logits)
+
+    @classmethod
+    def from_model(cls, model, encoder, **kwargs):
+        """Builds a scorer from a fitted/aggregated model's coef_, intercept_ and classes_."""
+        sizes = [len(encoder.categories[col]) for col in encoder.features]
+        return cls(model.coef_, model.intercept_, model.classes_, sizes, **kwargs)
+
+    def _logits(self, codes):
+        logits = np.broadcast_to(self.intercept, (len(codes), len(self.intercept))).copy()
+        for j, table in enumerate(self.tables):
+            logits += table[codes[:, j]]
+        return logits
+
+    def _proba(self, logits):
+        if self.binary:
+            positive = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        if self.multi_class == "multinomial":
+            shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+            return shifted / shifted.sum(axis=1, keepdims=True)
+        proba = 1.0 / (1.0 + np.exp(-logits))
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def _label_codes(self, logits):
+        if self.binary:
+            return (logits[:, 0] > 0).astype(np.intp)
+        return logits.argmax(axis=1)
+
+    def _check_codes(self, codes):
+        codes = np.asarray(codes)
+        if codes.ndim != 2 or codes.shape[1] != len(self.category_sizes):
+            raise ValueError(f"Expected codes of shape (n_rows, {len(self.category_sizes)}), got {codes.shape}.")
+        if len(codes) and ((codes < -1).any() or (codes.max(axis=0) >= np.array(self.category_sizes)).any()):
+            raise ValueError("Category code out of range for this model.")
+        return codes
+
+    def _cell_index(self, codes):
+        """Flat index of every row's cell in the joint grid (-1 wraps to the unknown slot)."""
+        index = np.zeros(len(codes), dtype=np.int64)
+        for j, size in enumerate(self.category_sizes):
+            column = codes[:, j].astype(np.int64)
+            column[column < 0] = size
+            index += column * self.strides[j]
+        return index
+
+    def score(self, codes, labels=True, proba=True):
+        """
+        Scores every row, chunk by chunk.
+
+        Args:
+            codes (np.ndarray): (n_rows, n_features) category codes.
+            labels (bool): Return predicted labels.
+            proba (bool): Return class probabilities.
+
+        Returns:
+            tuple: (proba, label_codes) where proba is (n_rows, n_classes) in `classes` order and
+                   label_codes index into `classes`; either is None if not requested.
+        """
+        codes = self._check_codes(codes)
+        n_rows = len(codes)
+        proba_out = np.empty((n_rows, len(self.classes)), dtype=self.dtype) if proba else None
+        labels_out = np.empty(n_rows, dtype=np.intp) if labels else None
+
+        for start in range(0, n_rows, self.chunk_size):
+            chunk = codes[start:start + self.chunk_size]
+            stop = start + len(chunk)
+            if self.cell_proba is not None:
+                cells = self._cell_index(chunk)
+                if proba:
+                    np.take(self.cell_proba, cells, axis=0, out=proba_out[start:stop])
+                if labels:
+                    np.take(self.cell_labels, cells, out=labels_out[start:stop])
+                continue
+            logits = self._logits(chunk)
+            if proba:
+                proba_out[start:stop] = self._proba(logits)
+            if labels:
+                labels_out[start:stop] = self._label_codes(logits)
+        return proba_out, labels_out
+
+    def predict_proba(self, codes):
+        return self.score(codes, labels=False)[0]
+
+    def predict(self, codes):
+        """Returns predicted class labels."""
+        return self.classes[self.score(codes, proba=False)[1]]
+
+    def accuracy(self, codes, y):
+        """Share of rows whose predicted label equals y (labels, not codes)."""
+        if len(codes) == 0:
+            return 0.0
+        return float((self.predict(codes) == np.asarray(y)).mean())
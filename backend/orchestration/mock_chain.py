@@ -0,0 +1,409 @@
+"""
+In-process stand-in for the Sepolia chain and the CarvIdNFT / MedicalResearchResults contracts.
+
+MockWeb3 implements the subset of the web3.py API the orchestrator uses (contract
+calls, transaction building, signing, sending, receipts and event logs) on plain Python
+state, so the full pipeline can run and be benchmarked offline. Transactions are really
+signed, nonces are validated like a node would, and an optional per-call latency
+simulates RPC round trips. Every RPC method is counted in `rpc_calls`.
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+
+from eth_abi import encode
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from permissions import MULTICALL3_ADDRESS
+
+from utils import metrics
+
+MOCK_CHAIN_ID = 11155111 # Same chain id as Sepolia
+MOCK_GAS_PRICE = Web3.to_wei(2, 'gwei')
+MOCK_CARV_ID_NFT_ADDRESS = Web3.to_checksum_address("0x" + "c1" * 20)
+MOCK_RESEARCH_RESULTS_ADDRESS = Web3.to_checksum_address("0x" + "c2" * 20)
+# Like hosted RPC providers, eth_getLogs fails when a query matches more logs than this
+MOCK_MAX_LOGS = 10000
+# Deterministic demo keys so repeated runs use the same accounts
+MOCK_DEPLOYER_KEY = "0x" + "11" * 32
+MOCK_AGENT_KEY = "0x" + "22" * 32
+
+
+class ContractRevert(Exception):
+    """Raised when a mock contract call reverts."""
+
+
+class MockCallData(bytes):
+    """Encoded call data that also remembers the function and arguments it encodes."""
+
+    def __new__(cls, fn_name, args):
+        selector = Web3.keccak(text=fn_name)[:4]
+        obj = super().__new__(cls, selector)
+        obj.fn_name = fn_name
+        obj.args = tuple(args)
+        return obj
+
+
+class MockRawTransaction(bytes):
+    """Signed transaction bytes carrying the decoded transaction and its sender."""
+
+    def __new__(cls, raw, transaction, sender):
+        obj = super().__new__(cls, raw)
+        obj.transaction = transaction
+        obj.sender = sender
+        return obj
+
+
+class MockContractFunction:
+    def __init__(self, contract, fn_name, args):
+        self.contract = contract
+        self.fn_name = fn_name
+        self.args = args
+
+    def call(self):
+        self.contract.chain.rpc('eth_call')
+        return self.contract.view(self.fn_name, self.args)
+
+    def build_transaction(self, transaction):
+        # Like web3.py, no RPC is needed when gas, fees, nonce and chain id are all given
+        tx = dict(transaction)
+        tx.update({'to': self.contract.address, 'value': 0, 'data': MockCallData(self.fn_name, self.args)})
+        return tx
+
+
+class _MockFunctions:
+    def __init__(self, contract):
+        self._contract = contract
+
+    def __getattr__(self, fn_name):
+        if not hasattr(self._contract, f"_fn_{fn_name}"):
+            raise AttributeError(f"{type(self._contract).__name__} has no function '{fn_name}'")
+        return lambda *args: MockContractFunction(self._contract, fn_name, args)
+
+
+class MockContract:
+    """Base class: `_fn_<name>(sender, *args)` implements a contract function."""
+
+    # Output ABI types of view functions, used when answering Multicall batches
+    VIEW_OUTPUTS = {}
+
+    def __init__(self, chain, address):
+        self.chain = chain
+        self.address = address
+        self.functions = _MockFunctions(self)
+
+    def encodeABI(self, fn_name, args=None):
+        return MockCallData(fn_name, args or [])
+
+    def view(self, fn_name, args):
+        with self.chain.lock:
+            return getattr(self, f"_fn_{fn_name}")(None, *args)
+
+    def execute(self, sender, fn_name, args):
+        return getattr(self, f"_fn_{fn_name}")(sender, *args)
+
+    def emit(self, signature, indexed=(), data=()):
+        """
+        Emits an event log from the running transaction.
+
+        Args:
+            signature (str): Canonical event signature, e.g. "AccessGranted(uint256,address,bytes32)".
+            indexed (list[tuple]): (abi_type, value) of the indexed parameters, stored as topics.
+            data (list[tuple]): (abi_type, value) of the other parameters, ABI-encoded as data.
+        """
+        topics = [HexBytes(Web3.keccak(text=signature))]
+        topics += [HexBytes(encode([abi_type], [value])) for abi_type, value in indexed]
+        encoded = encode([abi_type for abi_type, _ in data], [value for _, value in data]) if data else b""
+        self.chain.pending_logs.append({'address': self.address, 'topics': topics, 'data': HexBytes(encoded)})
+
+
+class MockCarvIdNFT(MockContract):
+    VIEW_OUTPUTS = {'hasAccess': 'bool', 'ownerOf': 'address'}
+
+    def __init__(self, chain, address=MOCK_CARV_ID_NFT_ADDRESS):
+        super().__init__(chain, address)
+        self.owners = {}
+        self.token_uris = {}
+        self.access = set()
+
+    def _fn_mint(self, sender, to_address, token_id, uri):
+        if token_id in self.owners:
+            raise ContractRevert("ERC721: token already minted")
+        self.owners[token_id] = Web3.to_checksum_address(to_address)
+        self.token_uris[token_id] = uri
+
+    def _fn_grantAccess(self, sender, token_id, agent_address, data_type_hash):
+        if self.owners.get(token_id) != sender:
+            raise ContractRevert("Only the CARV ID owner can grant access")
+        self.access.add((token_id, Web3.to_checksum_address(agent_address), bytes(data_type_hash)))
+        self.emit("AccessGranted(uint256,address,bytes32)",
+                  indexed=[('uint256', token_id), ('address', agent_address), ('bytes32', bytes(data_type_hash))])
+
+    def _fn_revokeAccess(self, sender, token_id, agent_address, data_type_hash):
+        if self.owners.get(token_id) != sender:
+            raise ContractRevert("Only the CARV ID owner can revoke access")
+        self.access.discard((token_id, Web3.to_checksum_address(agent_address), bytes(data_type_hash)))
+        self.emit("AccessRevoked(uint256,address,bytes32)",
+                  indexed=[('uint256', token_id), ('address', agent_address), ('bytes32', bytes(data_type_hash))])
+
+    def _fn_hasAccess(self, sender, token_id, agent_address, data_type_hash):
+        return (token_id, Web3.to_checksum_address(agent_address), bytes(data_type_hash)) in self.access
+
+    def _fn_ownerOf(self, sender, token_id):
+        if token_id not in self.owners:
+            raise ContractRevert("ERC721: invalid token ID")
+        return self.owners[token_id]
+
+
+class MockMedicalResearchResults(MockContract):
+    VIEW_OUTPUTS = {'getResultCount': 'uint256'}
+
+    def __init__(self, chain, address=MOCK_RESEARCH_RESULTS_ADDRESS):
+        super().__init__(chain, address)
+        self.results = []
+
+    def _fn_submitAggregatedResult(self, sender, research_topic, result_hash, accuracy, agent_address):
+        self.results.append({
+            'research_topic': research_topic,
+            'result_hash': bytes(result_hash),
+            'accuracy': accuracy,
+            'agent': Web3.to_checksum_address(agent_address),
+            'submitter': sender,
+        })
+        self.emit("ResultSubmitted(uint256,address,string,bytes32,uint256)",
+                  indexed=[('uint256', len(self.results) - 1), ('address', agent_address)],
+                  data=[('string', research_topic), ('bytes32', bytes(result_hash)), ('uint256', accuracy)])
+
+    def _fn_getResultCount(self, sender):
+        return len(self.results)
+
+
+class MockMulticall3:
+    """Answers Multicall3.aggregate3 in a single (simulated) eth_call."""
+
+    def __init__(self, chain):
+        self.chain = chain
+        self.address = Web3.to_checksum_address(MULTICALL3_ADDRESS)
+        self.functions = self
+
+    def aggregate3(self, calls):
+        return _MockAggregate(self.chain, calls)
+
+
+class _MockAggregate:
+    def __init__(self, chain, calls):
+        self.chain = chain
+        self.calls = calls
+
+    def call(self):
+        self.chain.rpc('eth_call')
+        results = []
+        with self.chain.lock:
+            for target, allow_failure, call_data in self.calls:
+                contract = self.chain.contracts[Web3.to_checksum_address(target)]
+                try:
+                    value = getattr(contract, f"_fn_{call_data.fn_name}")(None, *call_data.args)
+                    results.append((True, encode([contract.VIEW_OUTPUTS[call_data.fn_name]], [value])))
+                except ContractRevert:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+        return results
+
+
+class MockAccounts:
+    """eth.account stand-in: real key handling and signing, mock-aware raw bytes."""
+
+    def __init__(self):
+        self._senders = {}
+
+    def from_key(self, private_key):
+        return Account.from_key(private_key)
+
+    def create(self):
+        return Account.create()
+
+    def sign_transaction(self, transaction, private_key):
+        key = bytes(HexBytes(private_key))
+        if key not in self._senders:
+            self._senders[key] = Account.from_key(key).address
+        signable = dict(transaction)
+        signable['data'] = bytes(transaction.get('data', b""))
+        signed = Account.sign_transaction(signable, key)
+        raw = MockRawTransaction(signed.rawTransaction, transaction, self._senders[key])
+        return AttributeDict({'rawTransaction': raw, 'hash': signed.hash})
+
+
+class MockEth:
+    def __init__(self, chain):
+        self.chain = chain
+        self.account = MockAccounts()
+
+    @property
+    def chain_id(self):
+        self.chain.rpc('eth_chainId')
+        return MOCK_CHAIN_ID
+
+    @property
+    def gas_price(self):
+        self.chain.rpc('eth_gasPrice')
+        return MOCK_GAS_PRICE
+
+    @property
+    def block_number(self):
+        self.chain.rpc('eth_blockNumber')
+        return self.chain.block_number
+
+    def get_transaction_count(self, address, block_identifier='latest'):
+        self.chain.rpc('eth_getTransactionCount')
+        with self.chain.lock:
+            return self.chain.nonces.get(Web3.to_checksum_address(address), 0)
+
+    def get_code(self, address):
+        self.chain.rpc('eth_getCode')
+        address = Web3.to_checksum_address(address)
+        if address in self.chain.contracts or (self.chain.multicall and address == self.chain.multicall.address):
+            return HexBytes(b"\x60\x80")
+        return HexBytes(b"")
+
+    def contract(self, address=None, abi=None):
+        address = Web3.to_checksum_address(address)
+        if self.chain.multicall and address == self.chain.multicall.address:
+            return self.chain.multicall
+        if address in self.chain.contracts:
+            return self.chain.contracts[address]
+        raise ValueError(f"No mock contract deployed at {address}")
+
+    def get_logs(self, filter_params):
+        """eth_getLogs over the mock's logs: block range, address(es) and topic0 alternatives."""
+        self.chain.rpc('eth_getLogs')
+        from_block = filter_params.get('fromBlock', 0)
+        to_block = filter_params.get('toBlock', 'latest')
+        with self.chain.lock:
+            if to_block == 'latest':
+                to_block = self.chain.block_number
+            addresses = filter_params.get('address')
+            if addresses is not None:
+                addresses = {Web3.to_checksum_address(a) for a in ([addresses] if isinstance(addresses, str) else addresses)}
+            topics = filter_params.get('topics') or []
+            topic0 = topics[0] if topics else None
+            if topic0 is not None:
+                topic0 = {HexBytes(t) for t in ([topic0] if isinstance(topic0, (str, bytes)) else topic0)}
+            matches = [log for log in self.chain.logs
+                       if from_block <= log['blockNumber'] <= to_block
+                       and (addresses is None or log['address'] in addresses)
+                       and (topic0 is None or log['topics'][0] in topic0)]
+        if len(matches) > self.chain.max_logs:
+            raise ValueError({'code': -32005, 'message': f"query returned more than {self.chain.max_logs} results"})
+        return matches
+
+    def send_raw_transaction(self, raw_transaction):
+        self.chain.rpc('eth_sendRawTransaction')
+        return self.chain.apply_transaction(raw_transaction)
+
+    def wait_for_transaction_receipt(self, tx_hash, timeout=120, poll_latency=0.1):
+        self.chain.rpc('eth_getTransactionReceipt')
+        receipt = self.chain.receipts.get(HexBytes(tx_hash))
+        if receipt is None:
+            raise TimeoutError(f"Transaction {HexBytes(tx_hash).hex()} is not in the chain")
+        if self.chain.block_time:
+            time.sleep(self.chain.block_time)
+        return receipt
+
+
+class MockWeb3:
+    """
+    Minimal offline web3 replacement.
+
+    Args:
+        rpc_latency (float): Seconds slept per simulated RPC call.
+        block_time (float): Extra seconds before a receipt is returned.
+        multicall (bool): Deploy a Multicall3 stand-in at the canonical address.
+        max_logs (int): Most logs one eth_getLogs call may return before it errors.
+    """
+
+    def __init__(self, rpc_latency=0.0, block_time=0.0, multicall=True, max_logs=MOCK_MAX_LOGS):
+        self.rpc_latency = rpc_latency
+        self.block_time = block_time
+        self.rpc_calls = Counter()
+        self.lock = threading.RLock()
+        self.nonces = {}
+        self.receipts = {}
+        self.block_number = 0
+        self._tx_index = itertools.count()
+        self.logs = []
+        self.pending_logs = []
+        self.max_logs = max_logs
+
+        self.eth = MockEth(self)
+        self.codec = Web3().codec
+        self.contracts = {}
+        self.carv_id_nft = self._deploy(MockCarvIdNFT(self))
+        self.research_results = self._deploy(MockMedicalResearchResults(self))
+        self.multicall = MockMulticall3(self) if multicall else None
+
+    def _deploy(self, contract):
+        self.contracts[contract.address] = contract
+        return contract
+
+    keccak = staticmethod(Web3.keccak)
+    to_wei = staticmethod(Web3.to_wei)
+    to_checksum_address = staticmethod(Web3.to_checksum_address)
+
+    def is_connected(self):
+        return True
+
+    def rpc(self, method):
+        """Counts one RPC round trip and sleeps for the configured latency."""
+        with self.lock:
+            self.rpc_calls[method] += 1
+        with metrics.timer("rpc_call", method=method):
+            if self.rpc_latency:
+                time.sleep(self.rpc_latency)
+
+    def apply_transaction(self, raw_transaction):
+        """Validates the nonce, executes the call and records a receipt (one tx per block)."""
+        if not isinstance(raw_transaction, MockRawTransaction):
+            raise ValueError("MockWeb3 only accepts transactions signed through MockWeb3.eth.account")
+        tx = raw_transaction.transaction
+        sender = raw_transaction.sender
+        tx_hash = HexBytes(Web3.keccak(bytes(raw_transaction)))
+
+        with self.lock:
+            expected_nonce = self.nonces.get(sender, 0)
+            if tx['nonce'] != expected_nonce:
+                raise ValueError(f"nonce mismatch for {sender}: got {tx['nonce']}, expected {expected_nonce}")
+            self.nonces[sender] = expected_nonce + 1
+
+            status = 1
+            contract = self.contracts.get(Web3.to_checksum_address(tx['to']))
+            call_data = tx.get('data')
+            self.pending_logs = []
+            try:
+                if contract is None or not isinstance(call_data, MockCallData):
+                    raise ContractRevert("call to non-contract address")
+                contract.execute(sender, call_data.fn_name, call_data.args)
+            except ContractRevert:
+                status = 0
+
+            self.block_number += 1
+            if status:
+                # Reverted transactions emit nothing
+                for log_index, log in enumerate(self.pending_logs):
+                    self.logs.append(AttributeDict(dict(log, blockNumber=self.block_number, logIndex=log_index,
+                                                        transactionHash=tx_hash)))
+            self.pending_logs = []
+            self.receipts[tx_hash] = AttributeDict({
+                'transactionHash': tx_hash,
+                'transactionIndex': next(self._tx_index),
+                'blockNumber': self.block_number,
+                'from': sender,
+                'to': tx['to'],
+                'status': status,
+                'gasUsed': 21000,
+            })
+        return tx_hash
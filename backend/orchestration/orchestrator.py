@@ -1,119 +1,151 @@
-import pandas as pd
-from web3 import Web3
-import json
 import os
+import sys
 import time
-import hashlib
-from ai_agent import load_anonymized_data, train_local_model, aggregate_models, evaluate_global_model
+from pathlib import Path
 
-# --- Web3 Configuration ---
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
-
-SEPOLIA_RPC_URL = os.getenv("SEPOLIA_RPC_URL")
-PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-AGENT_ADDRESS_PRIVATE_KEY = os.getenv("AGENT_ADDRESS_PRIVATE_KEY") # Separate key for the AI agent wallet
-
-if not SEPOLIA_RPC_URL or not PRIVATE_KEY or not AGENT_ADDRESS_PRIVATE_KEY:
-    print("Error: Please set SEPOLIA_RPC_URL, PRIVATE_KEY, and AGENT_ADDRESS_PRIVATE_KEY in your .env file.")
-    exit()
-
-w3 = Web3(Web3.HTTPProvider(SEPOLIA_RPC_URL))
-if not w3.is_connected():
-    print("Error: Not connected to Sepolia RPC. Check your SEPOLIA_RPC_URL.")
-    exit()
-
-# --- Contract ABIs and Addresses (Replace with your deployed values) ---
-CARV_ID_NFT_ADDRESS = "YOUR_CARV_ID_NFT_CONTRACT_ADDRESS"
-MEDICAL_RESEARCH_RESULTS_ADDRESS = "YOUR_MEDICAL_RESEARCH_RESULTS_CONTRACT_ADDRESS"
-
-# Load ABIs (assuming you have them as JSON files from Hardhat artifacts)
-# You'll need to copy these from your Hardhat project's artifacts folder
-# e.g., artifacts/contracts/CarvIdNFT.sol/CarvIdNFT.json
-with open("CarvIdNFT.json", "r") as f:
-    CARV_ID_NFT_ABI = json.load(f)["abi"]
-
-with open("MedicalResearchResults.json", "r") as f:
-    MEDICAL_RESEARCH_RESULTS_ABI = json.load(f)["abi"]
-
-carv_id_contract = w3.eth.contract(address=CARV_ID_NFT_ADDRESS, abi=CARV_ID_NFT_ABI)
-research_results_contract = w3.eth.contract(address=MEDICAL_RESEARCH_RESULTS_ADDRESS, abi=MEDICAL_RESEARCH_RESULTS_ABI)
+if __name__ == "__main__":
+    # Run as a script: put the backend directory on the path before the imports below
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from chain import connect
 
-# --- Wallet Setup ---
-# Wallet used for deploying and general interactions (e.g., patient actions)
-deployer_account = w3.eth.account.from_key(PRIVATE_KEY)
-print(f"Deployer Account: {deployer_account.address}")
+# --- Chain Backend ---
+# Connected lazily on first use so importing this module needs no network or ABI files.
+# Set CHAIN_BACKEND=mock (or call use_chain) to run fully offline.
+_chain = None
 
-# Wallet representing an AI agent that will submit results
-ai_agent_account = w3.eth.account.from_key(AGENT_ADDRESS_PRIVATE_KEY)
-print(f"AI Agent Account: {ai_agent_account.address}")
+def get_chain():
+    """Returns the active chain backend, connecting to the configured one on first use."""
+    global _chain
+    if _chain is None:
+        _chain = connect()
+    return _chain
 
+def use_chain(chain):
+    """Switches the orchestrator to another chain backend (e.g. connect_mock())."""
+    global _chain
+    _chain = chain
+    return chain
 
 # --- Blockchain Interaction Functions ---
 def send_transaction(contract_function, sender_account, *args):
     """Helper to send a transaction and wait for receipt."""
+    future = submit_transaction(contract_function, sender_account, *args)
+    return wait_for_receipts([future])[0] if future is not None else None
+
+def submit_transaction(contract_function, sender_account, *args):
+    """Sends a transaction without waiting. Returns a receipt Future, or None if sending failed."""
     try:
-        nonce = w3.eth.get_transaction_count(sender_account.address)
-        transaction = contract_function(*args).build_transaction({
-            'chainId': w3.eth.chain_id,
-            'gas': 2000000, # Adjust gas limit as needed
-            'maxFeePerGas': w3.eth.gas_price * 2, # Example, adjust based on network conditions
-            'maxPriorityFeePerGas': w3.to_wei('1', 'gwei'), # Example
-            'nonce': nonce,
-        })
-        signed_txn = w3.eth.account.sign_transaction(transaction, private_key=sender_account.key)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        print(f"Transaction sent: {tx_hash.hex()}")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-        print(f"Transaction confirmed in block {receipt.blockNumber}")
-        if receipt.status == 0:
-            raise Exception("Transaction failed!")
-        return receipt
+        return get_chain().tx_manager.submit(contract_function, sender_account, *args)
     except Exception as e:
         print(f"Transaction failed: {e}")
         return None
 
-def mint_carv_id(to_address, token_id, uri):
+def wait_for_receipts(futures):
+    """Waits for receipt futures; failed or unsent transactions yield None."""
+    receipts = []
+    for future in futures:
+        if future is None:
+            receipts.append(None)
+            continue
+        try:
+            receipts.append(future.result())
+        except Exception as e:
+            print(f"Transaction failed: {e}")
+            receipts.append(None)
+    return receipts
+
+def mint_carv_id(to_address, token_id, uri, wait=True):
     print(f"Minting CARV ID {token_id} for {to_address}...")
-    return send_transaction(carv_id_contract.functions.mint, deployer_account, to_address, token_id, uri)
+    chain = get_chain()
+    if not wait:
+        # Callers waiting on the future must invalidate chain.permission_checker themselves
+        return submit_transaction(chain.carv_id_contract.functions.mint, chain.deployer_account, to_address, token_id, uri)
+    receipt = send_transaction(chain.carv_id_contract.functions.mint, chain.deployer_account, to_address, token_id, uri)
+    chain.permission_checker.invalidate(token_id)
+    return receipt
 
-def grant_access(token_id, agent_address, data_type_hash):
+def grant_access(token_id, agent_address, data_type_hash, wait=True):
     print(f"Granting access for CARV ID {token_id} to agent {agent_address} for data type hash {data_type_hash.hex()}...")
     # The owner of the NFT (the patient) grants access.
     # For demo, we use deployer_account as the patient's wallet.
-    return send_transaction(carv_id_contract.functions.grantAccess, deployer_account, token_id, agent_address, data_type_hash)
+    chain = get_chain()
+    if not wait:
+        # Callers waiting on the future must invalidate chain.permission_checker themselves
+        return submit_transaction(chain.carv_id_contract.functions.grantAccess, chain.deployer_account, token_id, agent_address, data_type_hash)
+    receipt = send_transaction(chain.carv_id_contract.functions.grantAccess, chain.deployer_account, token_id, agent_address, data_type_hash)
+    chain.permission_checker.invalidate(token_id)
+    return receipt
+
+def mint_carv_ids(patients):
+    """
+    Mints many CARV IDs back-to-back and then waits for all receipts.
+
+    Args:
+        patients (list[tuple]): (to_address, token_id, uri) per patient.
+    """
+    futures = [mint_carv_id(to_address, token_id, uri, wait=False) for to_address, token_id, uri in patients]
+    receipts = wait_for_receipts(futures)
+    for _, token_id, _ in patients:
+        get_chain().permission_checker.invalidate(token_id)
+    return receipts
+
+def grant_access_many(token_ids, agent_address, data_type_hash):
+    """Grants agent_address access to every token in token_ids, pipelined."""
+    futures = [grant_access(token_id, agent_address, data_type_hash, wait=False) for token_id in token_ids]
+    receipts = wait_for_receipts(futures)
+    for token_id in token_ids:
+        get_chain().permission_checker.invalidate(token_id)
+    return receipts
 
 def has_access(token_id, agent_address, data_type_hash):
     print(f"Checking access for CARV ID {token_id} to agent {agent_address} for data type hash {data_type_hash.hex()}...")
-    return carv_id_contract.functions.hasAccess(token_id, agent_address, data_type_hash).call()
+    return get_chain().permission_checker.has_access(token_id, agent_address, data_type_hash)
+
+def has_access_many(token_ids, agent_address, data_type_hash):
+    """Checks access for many CARV IDs in Multicall batches. Returns one bool per token."""
+    print(f"Checking access for {len(token_ids)} CARV IDs to agent {agent_address}...")
+    return get_chain().permission_checker.has_access_many([(token_id, agent_address, data_type_hash) for token_id in token_ids])
+
+def owners_of(token_ids):
+    """Returns the owner of each CARV ID (None if not minted) in Multicall batches."""
+    return get_chain().permission_checker.owners_of(token_ids)
 
 def submit_research_result(research_topic, result_hash, accuracy, agent_address):
     print(f"Submitting research result for topic '{research_topic}' with accuracy {accuracy}% from agent {agent_address}...")
-    return send_transaction(research_results_contract.functions.submitAggregatedResult, ai_agent_account, research_topic, result_hash, accuracy, agent_address)
+    chain = get_chain()
+    return send_transaction(chain.research_results_contract.functions.submitAggregatedResult, chain.ai_agent_account, research_topic, result_hash, accuracy, agent_address)
 
 # --- Main Orchestration Logic ---
-def run_decentralized_research():
+def run_decentralized_research(num_agents=3, executor="process", max_workers=None, federated_rounds=None, tol=1e-3,
+                               data_path="anonymized_medical_data.csv", chunksize=None, shard_dir="shards",
+                               sharding="contiguous", sufficient_stats=False, checkpoint_dir=None, warm_start=None):
+    if warm_start and (not federated_rounds or sufficient_stats):
+        # One-shot and count-based fits solve from scratch; only FedAvg starts from existing weights
+        raise ValueError("warm_start is only supported with federated_rounds (FedAvg)")
     print("\n--- Starting Decentralized AI Medical Research Orchestration ---")
+    try:
+        chain = get_chain()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return
 
     # 1. Simulate Patient Registration and Access Granting
     patient_id_token = 101 # Example patient CARV ID
-    patient_address = deployer_account.address # Patient wallet
-    agent_address = ai_agent_account.address # AI Agent wallet
+    patient_address = chain.deployer_account.address # Patient wallet
+    agent_address = chain.ai_agent_account.address # AI Agent wallet
     data_type_str = "drug_discovery_data"
-    data_type_hash = w3.keccak(text=data_type_str)
+    data_type_hash = chain.w3.keccak(text=data_type_str)
 
     # Mint CARV ID for the patient
-    if not carv_id_contract.functions.ownerOf(patient_id_token).call() == patient_address:
+    if not chain.permission_checker.owner_of(patient_id_token) == patient_address:
+        # mint_carv_id waits for the receipt, no fixed sleep needed
         mint_carv_id(patient_address, patient_id_token, f"https://example.com/carv-id/{patient_id_token}")
-        time.sleep(5) # Wait for tx to confirm
     else:
         print(f"CARV ID {patient_id_token} already owned by {patient_address}")
 
     # Patient grants access to the AI agent
     if not has_access(patient_id_token, agent_address, data_type_hash):
         grant_access(patient_id_token, agent_address, data_type_hash)
-        time.sleep(5) # Wait for tx to confirm
     else:
         print(f"Access already granted for CARV ID {patient_id_token} to agent {agent_address} for {data_type_str}")
 
@@ -127,36 +159,110 @@ def run_decentralized_research():
         # In a real system, the agent would query D.A.T.A. Framework API here.
         # For this demo, we'll assume the data is locally available from data_provider.py
         print("AI Agent conceptually fetching anonymized medical data...")
-        anonymized_df = load_anonymized_data()
-        if anonymized_df is None:
-            print("Failed to load anonymized data. Exiting.")
-            return
+        # The ML stack (pandas, scikit-learn) is only imported once an agent actually trains
+        from sklearn.model_selection import train_test_split
+        from ai_agent import (load_anonymized_data, iter_anonymized_data, spill_agent_shards, train_local_models,
+                              aggregate_models, evaluate_global_model, evaluate_global_model_chunked,
+                              run_federated_rounds, train_from_counts)
+        from encoder import FeatureEncoder
+        from sharding import ShardedDataset
+        from checkpoints import ModelStore, model_hash
+
+        # Global models are kept under their content hash; warm_start names a ref or hash to resume from
+        store = ModelStore(checkpoint_dir) if checkpoint_dir else None
+        initial_model, initial_t = None, 1.0
+        if warm_start:
+            if store is None:
+                raise ValueError("warm_start needs a checkpoint_dir to load the model from")
+            initial_model = store.load(warm_start)
+            initial_t = store.metadata(warm_start).get('t', 1.0)
+            print(f"Warm-starting from checkpoint {store.resolve(warm_start)}")
+        if chunksize:
+            # Streaming mode: route rows to per-agent shard files chunk by chunk so memory stays bounded
+            if not os.path.exists(data_path):
+                print(f"Error: Data file not found at {data_path}. Please run data_provider.py first.")
+                print("Failed to load anonymized data. Exiting.")
+                return
+            print(f"  Streaming {data_path} in chunks of {chunksize} rows into {num_agents} agent shards...")
+            shard_paths, test_path = spill_agent_shards(data_path, shard_dir, num_agents, chunksize=chunksize)
+        else:
+            anonymized_df = load_anonymized_data(data_path)
+            if anonymized_df is None:
+                print("Failed to load anonymized data. Exiting.")
+                return
 
         # 3. Perform Privacy-Preserving AI (Federated Learning Simulation)
         print("\nPerforming Federated Learning simulation...")
-        num_agents = 3 # Simulate 3 collaborating AI agents/data sources
-        local_data_splits = np.array_split(anonymized_df, num_agents)
-
-        local_models = []
-        local_accuracies = []
-        for i, local_df in enumerate(local_data_splits):
-            print(f"  - Agent {i+1} training on local data (size: {len(local_df)})...")
-            model, acc = train_local_model(local_df)
-            local_models.append(model)
-            local_accuracies.append(acc)
-            print(f"    Local accuracy: {acc:.2f}%")
-
-        global_model = aggregate_models(local_models)
+        # Build the feature encoder once and share it with every agent and with evaluation
+        encoder = FeatureEncoder()
+
+        # num_agents simulates that many collaborating AI agents/data sources
+        sharded = None
+        if chunksize:
+            # Each agent loads only its own shard file
+            local_data_splits = shard_paths
+        else:
+            # Encoded once into shared memory; agents get zero-copy slices instead of DataFrame copies
+            print(f"  Sharding {len(anonymized_df)} records across {num_agents} agents (strategy: {sharding})...")
+            sharded = ShardedDataset(anonymized_df, num_agents, strategy=sharding, encoder=encoder)
+            local_data_splits = sharded.shards
+
+        try:
+            if sufficient_stats:
+                # Agents send per-cell outcome counts; the global model is fitted once on the merged counts
+                print(f"  Collecting count tensors from {num_agents} agents (executor: {executor})...")
+                global_model, agent_counts = train_from_counts(local_data_splits, encoder=encoder, executor=executor,
+                                                               max_workers=max_workers)
+                for i, counts in enumerate(agent_counts):
+                    print(f"  - Agent {i+1} sent {counts.size} cell counts ({counts.nbytes} bytes) for {counts.sum()} records")
+            elif federated_rounds:
+                # Round-based FedAvg: global weights are sent back to agents as a warm start
+                print(f"  Running up to {federated_rounds} FedAvg rounds across {num_agents} agents (executor: {executor})...")
+                global_model, history = run_federated_rounds(local_data_splits, encoder=encoder, rounds=federated_rounds, tol=tol,
+                                                             executor=executor, max_workers=max_workers,
+                                                             initial_model=initial_model, initial_t=initial_t,
+                                                             checkpoints=store)
+                for record in history:
+                    print(f"  - Round {record['round']}: weight change {record['delta']:.2e} in {record['wall_time']:.3f}s")
+            else:
+                print(f"  Training {num_agents} local models in parallel (executor: {executor})...")
+                training_start = time.perf_counter()
+                local_results = train_local_models(local_data_splits, encoder=encoder, executor=executor, max_workers=max_workers)
+                training_time = time.perf_counter() - training_start
+
+                local_models = []
+                local_accuracies = []
+                for i, (local_df, (model, acc, wall_time)) in enumerate(zip(local_data_splits, local_results)):
+                    local_models.append(model)
+                    local_accuracies.append(acc)
+                    local_size = local_df if isinstance(local_df, str) else f"size: {len(local_df)}"
+                    print(f"  - Agent {i+1} trained on local data ({local_size}) in {wall_time:.3f}s")
+                    print(f"    Local accuracy: {acc:.2f}%")
+                print(f"  Local training wall time: {training_time:.3f}s "
+                      f"(sum of per-agent times: {sum(r[2] for r in local_results):.3f}s)")
+
+                global_model = aggregate_models(local_models)
+        finally:
+            if sharded is not None:
+                sharded.close()
         if global_model:
-            # Evaluate global model on a small test set (e.g., first 10% of original data)
-            train_df, test_df = train_test_split(anonymized_df, test_size=0.1, random_state=42)
-            global_accuracy = evaluate_global_model(global_model, test_df)
+            if chunksize:
+                # Evaluate on the held-out rows routed to the test file, one chunk at a time
+                test_chunks = iter_anonymized_data(test_path, chunksize)
+                global_accuracy = evaluate_global_model_chunked(global_model, test_chunks, encoder=encoder)
+            else:
+                # Evaluate global model on a small test set (e.g., first 10% of original data)
+                train_df, test_df = train_test_split(anonymized_df, test_size=0.1, random_state=42)
+                global_accuracy = evaluate_global_model(global_model, test_df, encoder=encoder)
             print(f"\nFederated Learning complete. Global Model Accuracy: {global_accuracy:.2f}%")
 
             # 4. AI Agent Submits Aggregated Result On-Chain
             research_topic = "Drug Discovery - Disease X Prediction"
-            # Hash of the aggregated model weights (conceptual)
-            model_weights_hash = w3.keccak(text=json.dumps({"coef": global_model.coef_.tolist(), "intercept": global_model.intercept_.tolist()}))
+            # Content hash of the canonical binary weights, the same hash the checkpoint is stored under
+            model_weights_hash = model_hash(global_model)
+            if store is not None:
+                store.tag("latest", store.save(global_model, {'accuracy': global_accuracy, 'topic': research_topic}))
+                print(f"Global model checkpointed as {model_weights_hash.hex()} in {checkpoint_dir}")
 
             submit_research_result(research_topic, model_weights_hash, int(global_accuracy), agent_address)
             print("\nOrchestration complete. Check Sepolia Etherscan for transactions and contract states.")
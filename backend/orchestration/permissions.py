@@ -0,0 +1,110 @@
+from web3 import Web3
+
+# Multicall3 is deployed at the same address on Sepolia, mainnet and most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ABI = [{
+    "inputs": [{
+        "components": [
+            {"internalType": "address", "name": "target", "type": "address"},
+            {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+            {"internalType": "bytes", "name": "callData", "type": "bytes"},
+        ],
+        "internalType": "struct Multicall3.Call3[]", "name": "calls", "type": "tuple[]",
+    }],
+    "name": "aggregate3",
+    "outputs": [{
+        "components": [
+            {"internalType": "bool", "name": "success", "type": "bool"},
+            {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+        ],
+        "internalType": "struct Multicall3.Result[]", "name": "returnData", "type": "tuple[]",
+    }],
+    "stateMutability": "payable",
+    "type": "function",
+}]
+
+
+class PermissionChecker:
+    """
+    Bulk, memoized `hasAccess` / `ownerOf` lookups against the CARV ID contract.
+
+    Calls are packed into Multicall3 `aggregate3` batches, so checking thousands of
+    (token_id, agent, data_type_hash) tuples costs one eth_call per batch_size tuples
+    instead of one per tuple. Results are memoized until `invalidate` is called: after a
+    transaction that changes them, and by long-lived callers (the service) at the start of
+    each job, so revoked grants are seen. Failed lookups (reverted or erroring calls) are
+    reported as no access / no owner but never memoized. Chains without Multicall3
+    (e.g. local test chains) fall back to individual calls.
+    """
+
+    def __init__(self, w3, carv_id_contract, multicall_address=MULTICALL3_ADDRESS, batch_size=500):
+        self.w3 = w3
+        self.contract = carv_id_contract
+        self.batch_size = batch_size
+        self._access = {}  # token_id -> {(agent_address, data_type_hash): bool}
+        self._owners = {}
+        self._multicall = None
+        if multicall_address and w3.eth.get_code(Web3.to_checksum_address(multicall_address)):
+            self._multicall = w3.eth.contract(address=Web3.to_checksum_address(multicall_address), abi=MULTICALL3_ABI)
+
+    def _call_many(self, fn_name, args_list, output_type):
+        """Runs contract.fn_name(*args) for every args tuple; reverted calls yield None."""
+        results = []
+        if self._multicall is None:
+            for args in args_list:
+                try:
+                    results.append(getattr(self.contract.functions, fn_name)(*args).call())
+                except Exception:
+                    results.append(None)
+            return results
+
+        for start in range(0, len(args_list), self.batch_size):
+            batch = args_list[start:start + self.batch_size]
+            calls = [(self.contract.address, True, self.contract.encodeABI(fn_name=fn_name, args=list(args)))
+                     for args in batch]
+            for success, data in self._multicall.functions.aggregate3(calls).call():
+                results.append(self.w3.codec.decode([output_type], data)[0] if success and data else None)
+        return results
+
+    def has_access_many(self, checks):
+        """
+        Checks many (token_id, agent_address, data_type_hash) tuples.
+
+        Returns:
+            list[bool]: One result per tuple, in input order.
+        """
+        keys = [(token_id, agent_address, bytes(data_type_hash)) for token_id, agent_address, data_type_hash in checks]
+        missing = list(dict.fromkeys(key for key in keys if key[1:] not in self._access.get(key[0], ())))
+        failed = set()
+        if missing:
+            for key, allowed in zip(missing, self._call_many("hasAccess", missing, 'bool')):
+                if allowed is None:
+                    failed.add(key)
+                else:
+                    self._access.setdefault(key[0], {})[key[1:]] = bool(allowed)
+        return [False if key in failed else self._access[key[0]][key[1:]] for key in keys]
+
+    def has_access(self, token_id, agent_address, data_type_hash):
+        return self.has_access_many([(token_id, agent_address, data_type_hash)])[0]
+
+    def owners_of(self, token_ids):
+        """Returns the owner address of each token, or None if it has not been minted."""
+        missing = list(dict.fromkeys(t for t in token_ids if t not in self._owners))
+        if missing:
+            for token_id, owner in zip(missing, self._call_many("ownerOf", [(t,) for t in missing], 'address')):
+                # Unminted tokens revert; they are looked up again next time
+                if owner:
+                    self._owners[token_id] = Web3.to_checksum_address(owner)
+        return [self._owners.get(t) for t in token_ids]
+
+    def owner_of(self, token_id):
+        return self.owners_of([token_id])[0]
+
+    def invalidate(self, token_id=None):
+        """Drops memoized results for token_id (or everything) after a state-changing transaction."""
+        if token_id is None:
+            self._access.clear()
+            self._owners.clear()
+            return
+        self._owners.pop(token_id, None)
+        self._access.pop(token_id, None)
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+from encoder import FeatureEncoder, TREATMENT_OUTCOMES
+
+# How rows are assigned to agents
+SHARDING_STRATEGIES = ("contiguous", "hash", "stratified", "non_iid")
+
+# Shared memory blocks mapped in this process, by name -> (SharedMemory, codes, labels)
+_attached = {}
+# Blocks created by this process; they stay mapped until ShardedDataset.close()
+_owned = set()
+# Blocks attached from other processes kept mapped at once; older ones are released
+# so long-lived worker pools do not pin the memory of finished runs
+MAX_ATTACHED = 4
+
+
+def row_hashes(df, random_state=42):
+    """Deterministic per-row uint64 hashes keyed on patient_id (independent of chunking)."""
+    key = f"{random_state:016d}"[-16:]
+    return pd.util.hash_array(df['patient_id'].to_numpy(), hash_key=key)
+
+
+def assign_agents(df, num_agents, strategy="contiguous", random_state=42, alpha=0.5):
+    """
+    Returns the agent id (0..num_agents-1) of every row of df.
+
+    Strategies:
+        contiguous: consecutive row ranges, same rows as np.array_split.
+        hash: by patient_id hash, so a patient always lands on the same agent.
+        stratified: every agent gets the same treatment_outcome mix (within one row).
+        non_iid: each diagnosis_code is spread over agents with Dirichlet(alpha)
+                 proportions, so agents see skewed case mixes; smaller alpha means more skew.
+    """
+    if strategy not in SHARDING_STRATEGIES:
+        raise ValueError(f"Unknown sharding strategy '{strategy}'. Expected one of {SHARDING_STRATEGIES}.")
+    n = len(df)
+    if strategy == "contiguous":
+        # np.array_split puts the remainder on the first shards
+        sizes = np.full(num_agents, n // num_agents)
+        sizes[:n % num_agents] += 1
+        return np.repeat(np.arange(num_agents), sizes)
+    if strategy == "hash":
+        return (row_hashes(df, random_state) % np.uint64(num_agents)).astype(np.int64)
+
+    rng = np.random.default_rng(random_state)
+    agents = np.empty(n, dtype=np.int64)
+    if strategy == "stratified":
+        # Shuffle, group by outcome, then deal rows round-robin
+        labels = pd.Categorical(df['treatment_outcome']).codes
+        perm = rng.permutation(n)
+        order = perm[np.argsort(labels[perm], kind='stable')]
+        agents[order] = np.arange(n) % num_agents
+        return agents
+
+    groups = pd.Categorical(df['diagnosis_code']).codes
+    for group in np.unique(groups):
+        rows = rng.permutation(np.flatnonzero(groups == group))
+        proportions = rng.dirichlet(np.full(num_agents, alpha))
+        cuts = (np.cumsum(proportions)[:-1] * len(rows)).astype(np.int64)
+        for agent, part in enumerate(np.split(rows, cuts)):
+            agents[part] = agent
+    return agents
+
+
+class ShardRef:
+    """
+    Picklable handle to one agent's rows inside a ShardedDataset's shared memory block.
+
+    Sending a ShardRef to a worker process ships a few integers instead of the rows;
+    the worker maps the block once and reads its slice without copying.
+    """
+
+    def __init__(self, shm_name, num_rows, num_features, start, stop, classes):
+        self.shm_name = shm_name
+        self.num_rows = num_rows
+        self.num_features = num_features
+        self.start = start
+        self.stop = stop
+        self.classes = classes
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def arrays(self):
+        """Returns (codes, labels) views of this shard: category codes and outcome codes."""
+        if self.shm_name not in _attached:
+            _release_stale()
+            try:
+                # Python 3.13+: the creating process owns the block, don't track it here
+                shm = shared_memory.SharedMemory(name=self.shm_name, track=False)
+            except TypeError:
+                shm = shared_memory.SharedMemory(name=self.shm_name)
+            _attached[self.shm_name] = (shm, *_layout(shm.buf, self.num_rows, self.num_features))
+        _, codes, labels = _attached[self.shm_name]
+        return codes[self.start:self.stop], labels[self.start:self.stop]
+
+    def labels(self):
+        """Outcome names of the shard's rows with a known outcome."""
+        labels = self.arrays()[1]
+        return np.asarray(self.classes, dtype=object)[labels[labels >= 0]]
+
+    def xy(self, encoder):
+        """Builds (X, y) for training; rows with an unknown outcome are dropped."""
+        codes, labels = self.arrays()
+        known = labels >= 0
+        if not known.all():
+            codes, labels = codes[known], labels[known]
+        return encoder.transform_codes(codes), np.asarray(self.classes, dtype=object)[labels]
+
+
+def _release_stale():
+    """Unmaps the oldest attached (not owned) blocks once MAX_ATTACHED is reached."""
+    foreign = [name for name in _attached if name not in _owned]
+    for name in foreign[:max(len(foreign) - MAX_ATTACHED + 1, 0)]:
+        shm = _attached.pop(name)[0]
+        try:
+            shm.close()
+        except BufferError:
+            pass # A caller still holds a view; the mapping goes away with it
+
+
+def _layout(buffer, num_rows, num_features):
+    """Maps the (codes, labels) arrays onto a shared memory buffer."""
+    codes = np.ndarray((num_rows, num_features), dtype=np.int16, buffer=buffer)
+    labels = np.ndarray((num_rows,), dtype=np.int8, buffer=buffer, offset=codes.nbytes)
+    return codes, labels
+
+
+class ShardedDataset:
+    """
+    Encodes a DataFrame once and splits it into per-agent shards.
+
+    Row assignments are stored as one index array (`order`) grouped by agent, and
+    `indices[i]` is a view into it. Category codes and outcome codes are written to a
+    single shared memory block in the same order, so each shard is a contiguous slice
+    and `shards[i]` (a ShardRef) can be handed to process workers without pickling rows.
+
+    Use as a context manager, or call close() to free the shared memory.
+    """
+
+    def __init__(self, df, num_agents, strategy="contiguous", encoder=None, random_state=42, alpha=0.5,
+                 agents=None):
+        """agents, if given, is an explicit shard id (0..num_agents-1) per row and overrides strategy."""
+        self.encoder = encoder or FeatureEncoder()
+        self.strategy = strategy
+        self.num_agents = num_agents
+
+        if agents is None:
+            agents = assign_agents(df, num_agents, strategy, random_state, alpha)
+        agents = np.asarray(agents, dtype=np.int64)
+        self.order = np.argsort(agents, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(agents, minlength=num_agents))])
+        self.indices = [self.order[bounds[i]:bounds[i + 1]] for i in range(num_agents)]
+
+        codes = self.encoder.codes(df)
+        outcome = pd.Categorical(df['treatment_outcome'], categories=TREATMENT_OUTCOMES)
+        num_rows, num_features = codes.shape
+        size = max(codes.nbytes + num_rows, 1)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        shared_codes, shared_labels = _layout(self._shm.buf, num_rows, num_features)
+        np.take(codes, self.order, axis=0, out=shared_codes)
+        np.take(outcome.codes.astype(np.int8), self.order, out=shared_labels)
+        # The creating process reads its own block directly
+        _attached[self._shm.name] = (self._shm, shared_codes, shared_labels)
+        _owned.add(self._shm.name)
+
+        self.shards = [ShardRef(self._shm.name, num_rows, num_features, int(bounds[i]), int(bounds[i + 1]),
+                                tuple(TREATMENT_OUTCOMES))
+                       for i in range(num_agents)]
+
+    def frames(self, df):
+        """Returns the shards as DataFrames (copies), for code that needs the original columns."""
+        return [df.iloc[idx] for idx in self.indices]
+
+    def close(self):
+        if self._shm is None:
+            return
+        _attached.pop(self._shm.name, None)
+        _owned.discard(self._shm.name)
+        try:
+            self._shm.close()
+        except BufferError:
+            pass # A caller still holds a view; the mapping goes away with it
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
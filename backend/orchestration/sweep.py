@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Model/hyperparameter sweep over one shared encoded dataset.
+
+The data is category-coded once into shared memory (see sharding.ShardedDataset), split
+into train and held-out test rows the same way as split_chunk. A grid of linear models is
+then fitted across a process pool. Workers map the shared block instead of receiving
+pickled rows. Each configuration is scored on the test rows as evaluate_global_model
+does, and the report ranks configurations by accuracy and fit time, so the cheapest
+model that meets an accuracy target can be picked.
+
+Only linear models are swept, because their coef_/intercept_ can be scored by
+BatchScorer, averaged by aggregate_models and stored by ModelStore.
+
+Usage:
+    python sweep.py --records 200000 --target 40
+    python sweep.py --data anonymized_medical_data.csv --grid grid.json --workers 4 --output sweep.json
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+from encoder import FeatureEncoder
+from executor import run_parallel
+from inference import BatchScorer
+from sharding import ShardedDataset, row_hashes
+
+# Estimators a configuration may name; all are linear
+MODELS = {
+    "logistic_regression": ("sklearn.linear_model", "LogisticRegression"),
+    "sgd": ("sklearn.linear_model", "SGDClassifier"),
+    "ridge": ("sklearn.linear_model", "RidgeClassifier"),
+    "linear_svc": ("sklearn.svm", "LinearSVC"),
+}
+
+# {model: {param: [values]}}; every combination of values is one configuration
+DEFAULT_GRID = {
+    "logistic_regression": {"solver": ["liblinear", "lbfgs"], "C": [0.01, 0.1, 1.0, 10.0], "max_iter": [1000]},
+    "sgd": {"loss": ["log_loss", "hinge"], "alpha": [1e-4, 1e-3]},
+    "ridge": {"alpha": [0.1, 1.0, 10.0]},
+    "linear_svc": {"C": [0.1, 1.0], "dual": [False]},
+}
+
+# Design matrices built in this (worker) process, by shard; reused across configurations
+_designs = {}
+
+
+def expand_grid(grid):
+    """Returns one {'name', 'model', 'params'} dict per combination of a grid's values."""
+    configs = []
+    for model, params in grid.items():
+        if model not in MODELS:
+            raise ValueError(f"Unknown model '{model}'. Expected one of {tuple(MODELS)}.")
+        keys = sorted(params)
+        for values in itertools.product(*(params[key] for key in keys)):
+            config_params = dict(zip(keys, values))
+            name = f"{model}(" + ", ".join(f"{key}={value}" for key, value in config_params.items()) + ")"
+            configs.append({'name': name, 'model': model, 'params': config_params})
+    return configs
+
+
+def make_model(config, random_state=42):
+    """Instantiates the estimator of a configuration, seeded when it takes a random_state."""
+    import importlib
+    module, cls_name = MODELS[config['model']]
+    cls = getattr(importlib.import_module(module), cls_name)
+    params = dict(config['params'])
+    if "random_state" in cls().get_params():
+        params.setdefault("random_state", random_state)
+    return cls(**params)
+
+
+def _design(ref, encoder):
+    """(X, y) of a shard, expanded from the shared codes once per process."""
+    key = (ref.shm_name, ref.start, ref.stop)
+    if key not in _designs:
+        # Only the current sweep's block is kept
+        if any(name != ref.shm_name for name, _, _ in _designs):
+            _designs.clear()
+        _designs[key] = ref.xy(encoder)
+    return _designs[key]
+
+
+def score_model(model, test_ref, encoder):
+    """Test accuracy in percent, computed like evaluate_global_model from the shared test codes."""
+    codes, labels = test_ref.arrays()
+    known = labels >= 0
+    y = np.asarray(test_ref.classes, dtype=object)[labels[known]]
+    codes = codes[known]
+    valid = np.isin(y, model.classes_)
+    if not valid.any():
+        return 0.0
+    return BatchScorer.from_model(model, encoder).accuracy(codes[valid], y[valid]) * 100
+
+
+def fit_config(task):
+    """Worker: fits one configuration on the shared train rows and scores it on the test rows."""
+    config, train_ref, test_ref, encoder = task
+    result = {'name': config['name'], 'model': config['model'], 'params': config['params']}
+    X, y = _design(train_ref, encoder)
+    model = make_model(config)
+    start = time.perf_counter()
+    try:
+        model.fit(X, y)
+    except ValueError as e:
+        return {**result, 'error': str(e)}
+    result['fit_time'] = time.perf_counter() - start
+    result['accuracy'] = score_model(model, test_ref, encoder)
+    n_iter = getattr(model, "n_iter_", None)
+    result['n_iter'] = int(np.max(n_iter)) if n_iter is not None else None
+    result['estimator'] = model
+    return result
+
+
+def run_sweep(df, grid=None, encoder=None, test_size=0.1, executor="process", max_workers=None, random_state=42):
+    """
+    Fits every configuration of grid on df and returns the results (see rank_results).
+
+    Args:
+        df (pd.DataFrame): Anonymized medical data.
+        grid (dict | None): {model: {param: [values]}}, default DEFAULT_GRID.
+        encoder (FeatureEncoder | None): Shared encoder, built once if not given.
+        test_size (float): Fraction of rows held out, chosen by patient_id hash like split_chunk.
+        executor (str | Executor): 'process' (default), 'thread', 'serial' or an Executor.
+        max_workers (int | None): Pool size, defaults to the number of CPUs.
+
+    Returns:
+        list[dict]: Per configuration: name, model, params, fit_time, accuracy, n_iter,
+                    wall_time and the fitted estimator, or error if the fit failed.
+    """
+    from utils import metrics
+    encoder = encoder or FeatureEncoder()
+    configs = expand_grid(grid or DEFAULT_GRID)
+    hashes = row_hashes(df, random_state)
+    # Same held-out rows as split_chunk
+    is_test = (hashes >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+    with metrics.timer("sweep"), ShardedDataset(df, 2, encoder=encoder, agents=is_test.astype(np.int64)) as data:
+        train_ref, test_ref = data.shards
+        tasks = [(config, train_ref, test_ref, encoder) for config in configs]
+        results = run_parallel(fit_config, tasks, executor=executor, max_workers=max_workers)
+    # Serial and thread runs built the design matrix in this process
+    _designs.clear()
+    for result, wall_time in results:
+        result['wall_time'] = wall_time
+        if 'fit_time' in result:
+            metrics.record("sweep_fit", result['fit_time'], model=result['model'])
+    return [result for result, _ in results]
+
+
+def rank_results(results, target=None):
+    """
+    Orders results best first. Without a target: by accuracy, then fit time. With a target
+    (accuracy in percent), configurations meeting it come first, cheapest fit first.
+    """
+    fitted = [r for r in results if 'error' not in r]
+    failed = [r for r in results if 'error' in r]
+    by_accuracy = sorted(fitted, key=lambda r: (-r['accuracy'], r['fit_time']))
+    if target is None:
+        return by_accuracy + failed
+    for r in fitted:
+        r['meets_target'] = r['accuracy'] >= target
+    meeting = sorted((r for r in fitted if r['meets_target']), key=lambda r: r['fit_time'])
+    return meeting + [r for r in by_accuracy if not r['meets_target']] + failed
+
+
+def format_report(ranked, target=None):
+    """Ranked configurations with accuracy and fit time, as printable text."""
+    width = max([len(r['name']) for r in ranked] + [13])
+    lines = [f"{'rank':>4}  {'configuration':<{width}}  {'accuracy':>9}  {'fit time':>9}  {'n_iter':>6}"]
+    for i, r in enumerate(ranked, 1):
+        if 'error' in r:
+            lines.append(f"{i:>4}  {r['name']:<{width}}  failed: {r['error']}")
+            continue
+        n_iter = "" if r['n_iter'] is None else r['n_iter']
+        mark = "  *" if r.get('meets_target') else ""
+        lines.append(f"{i:>4}  {r['name']:<{width}}  {r['accuracy']:>8.2f}%  {r['fit_time']:>8.3f}s  {n_iter:>6}{mark}")
+    if target is not None:
+        best = next((r for r in ranked if r.get('meets_target')), None)
+        if best is None:
+            lines.append(f"No configuration reached {target:.2f}% accuracy.")
+        else:
+            lines.append(f"* meets {target:.2f}%. Cheapest: {best['name']} ({best['accuracy']:.2f}% in {best['fit_time']:.3f}s)")
+    return "\n".join(lines)
+
+
+def main():
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+    parser = argparse.ArgumentParser(description="Fit a grid of models on one shared dataset and rank them")
+    parser.add_argument('--data', help='Anonymized data file (CSV, Parquet or Arrow); synthetic data if omitted')
+    parser.add_argument('--records', type=int, default=100_000, help='Synthetic records when --data is omitted')
+    parser.add_argument('--grid', help='JSON file {model: {param: [values]}} (default: built-in grid)')
+    parser.add_argument('--target', type=float, help='Accuracy target in percent; ranks the cheapest passing model first')
+    parser.add_argument('--executor', default="process", choices=["process", "thread", "serial"])
+    parser.add_argument('--workers', type=int, help='Pool size (default: CPU count); use 1 for uncontended fit times')
+    parser.add_argument('--output', help='Write the ranked results as JSON')
+    parser.add_argument('--checkpoint-dir', help='Save the top-ranked model to this ModelStore, tagged "sweep-best"')
+    args = parser.parse_args()
+
+    if args.data:
+        from ai_agent import load_anonymized_data
+        df = load_anonymized_data(args.data)
+        if df is None:
+            return
+    else:
+        from utils.data_provider import generate_medical_data
+        df = generate_medical_data(args.records, verbose=False)
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    start = time.perf_counter()
+    ranked = rank_results(run_sweep(df, grid, executor=args.executor, max_workers=args.workers), args.target)
+    print(format_report(ranked, args.target))
+    print(f"Swept {len(ranked)} configurations on {len(df)} rows in {time.perf_counter() - start:.2f}s")
+
+    if args.checkpoint_dir and ranked and 'error' not in ranked[0]:
+        from checkpoints import ModelStore
+        store = ModelStore(args.checkpoint_dir)
+        best = ranked[0]
+        digest = store.save(best['estimator'], metadata={'sweep_config': best['name'], 'accuracy': best['accuracy'],
+                                                         'fit_time': best['fit_time']})
+        store.tag("sweep-best", digest)
+        print(f"Saved {best['name']} as {digest}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([{k: v for k, v in r.items() if k != 'estimator'} for r in ranked], f, indent=2)
+        print(f"Sweep results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+
+
+class TransactionManager:
+    """
+    Sends transactions back-to-back without a per-transaction RPC round trip for
+    nonce, chain id and fees.
+
+    - Nonces are fetched once per sender (from the pending block) and then
+      assigned locally, so many transactions can be in flight at the same time.
+    - The chain id is read once; fee estimates are cached for fee_ttl seconds.
+    - `submit` returns a Future that resolves to the receipt once it is mined,
+      so callers can send a whole batch first and wait afterwards.
+    """
+
+    def __init__(self, w3, gas_limit=2000000, priority_fee_gwei=1, fee_ttl=30, receipt_timeout=120, max_pending=32):
+        self.w3 = w3
+        self.gas_limit = gas_limit
+        self.priority_fee = w3.to_wei(priority_fee_gwei, 'gwei')
+        self.fee_ttl = fee_ttl
+        self.receipt_timeout = receipt_timeout
+
+        self._lock = threading.Lock()
+        self._nonces = {}
+        self._chain_id = None
+        self._max_fee = None
+        self._fee_updated = 0.0
+        # Threads that wait for receipts while the caller keeps sending
+        self._receipt_pool = ThreadPoolExecutor(max_workers=max_pending, thread_name_prefix="tx-receipt")
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def max_fee_per_gas(self):
+        """Cached fee estimate, refreshed at most every fee_ttl seconds."""
+        now = time.monotonic()
+        if self._max_fee is None or now - self._fee_updated > self.fee_ttl:
+            self._max_fee = self.w3.eth.gas_price * 2 # Example, adjust based on network conditions
+            self._fee_updated = now
+        return self._max_fee
+
+    def _next_nonce(self, address):
+        """Hands out the next local nonce for address; must be called with the lock held."""
+        if address not in self._nonces:
+            self._nonces[address] = self.w3.eth.get_transaction_count(address, 'pending')
+        nonce = self._nonces[address]
+        self._nonces[address] += 1
+        return nonce
+
+    def reset_nonce(self, address):
+        """Forgets the local nonce so the next transaction re-reads it from the node."""
+        with self._lock:
+            self._nonces.pop(address, None)
+
+    def send(self, contract_function, sender_account, *args):
+        """
+        Builds, signs and broadcasts a contract transaction without waiting for it.
+
+        Returns:
+            HexBytes: The transaction hash.
+        """
+        with self._lock:
+            # Holding the lock from nonce assignment to broadcast keeps nonces gap-free
+            nonce = self._next_nonce(sender_account.address)
+            try:
+                transaction = contract_function(*args).build_transaction({
+                    'chainId': self.chain_id,
+                    'gas': self.gas_limit, # Adjust gas limit as needed
+                    'maxFeePerGas': self.max_fee_per_gas(),
+                    'maxPriorityFeePerGas': self.priority_fee,
+                    'nonce': nonce,
+                })
+                signed_txn = self.w3.eth.account.sign_transaction(transaction, private_key=sender_account.key)
+                tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            except Exception:
+                # The nonce was not consumed on-chain; resync before the next send
+                self._nonces.pop(sender_account.address, None)
+                metrics.count("transactions_failed", reason="send")
+                raise
+        metrics.count("transactions_sent")
+        print(f"Transaction sent: {tx_hash.hex()}")
+        return tx_hash
+
+    def _wait_for_receipt(self, tx_hash):
+        with metrics.timer("tx_confirm"):
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.receipt_timeout)
+        print(f"Transaction confirmed in block {receipt.blockNumber}")
+        if receipt.status == 0:
+            metrics.count("transactions_failed", reason="reverted")
+            raise Exception(f"Transaction {tx_hash.hex()} failed!")
+        return receipt
+
+    def submit(self, contract_function, sender_account, *args):
+        """
+        Sends a transaction and returns a Future that resolves to its receipt.
+
+        The Future raises if the transaction could not be sent or reverted.
+        """
+        tx_hash = self.send(contract_function, sender_account, *args)
+        return self._receipt_pool.submit(self._wait_for_receipt, tx_hash)
+
+    def submit_many(self, calls):
+        """
+        Pipelines a batch of (contract_function, sender_account, args) calls.
+
+        All transactions are broadcast back-to-back before any receipt is awaited.
+
+        Returns:
+            list[Future]: One receipt future per call, in input order.
+        """
+        return [self.submit(contract_function, sender_account, *args)
+                for contract_function, sender_account, args in calls]
+
+    def close(self):
+        self._receipt_pool.shutdown(wait=True)
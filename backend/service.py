@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+AgentForge Backend - Service Mode
+
+Runs agents as a long-lived service instead of one process per request. Execution
+requests (shaped like demo_agents/*_execution.json: agent_id + request) go into a
+local job queue and are picked up by a pool of worker threads. Loaded datasets, the
+feature encoder, pooled HTTP clients, the web3 connection and the training pool stay
+warm between requests, so only the first request pays for them.
+
+Every finished job produces an execution record with an `execution_flow` of
+numbered steps (action, status, duration) like the demo execution records.
+
+Usage:
+    python service.py --inbox jobs/inbox --outbox jobs/outbox --workers 4
+    python main.py --serve
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add the backend directory (and the orchestration modules, which import each other by name) to the path
+backend_dir = Path(__file__).resolve().parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(backend_dir / "orchestration"))
+from utils import metrics
+
+
+class WarmState:
+    """
+    Objects shared by every job and built on first use: datasets (reloaded only when
+    the file changes), the feature encoder, CARV clients, the chain connection and
+    the executor used for local training.
+    """
+
+    def __init__(self, training_executor="thread", training_workers=None):
+        self.training_executor = training_executor
+        self.training_workers = training_workers
+        self._lock = threading.Lock()
+        self._datasets = {}
+        self._encoder = None
+        self._training_pool = None
+
+    def dataset(self, data_path):
+        """Returns the DataFrame for data_path, loading it only if it is new or was modified."""
+        from ai_agent import load_anonymized_data
+
+        path = os.path.abspath(data_path)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._datasets.get(path)
+            if cached is None or cached[0] != mtime:
+                df = load_anonymized_data(path)
+                if df is None:
+                    raise FileNotFoundError(f"Data file not found at {data_path}")
+                self._datasets[path] = (mtime, df)
+            return self._datasets[path][1]
+
+    def encoder(self):
+        from encoder import FeatureEncoder
+
+        with self._lock:
+            if self._encoder is None:
+                self._encoder = FeatureEncoder()
+            return self._encoder
+
+    def training_pool(self):
+        """Executor reused for every job's local training."""
+        from executor import make_executor
+
+        with self._lock:
+            if self._training_pool is None:
+                self._training_pool = make_executor(self.training_executor, self.training_workers)
+            return self._training_pool
+
+    def chain(self):
+        from orchestrator import get_chain
+        with self._lock:
+            return get_chain()
+
+    def carv_client(self, api_key=None):
+        from autonomous_research.defi_agent import get_carv_client, CARV_DATA_API_KEY
+        return get_carv_client(api_key or CARV_DATA_API_KEY)
+
+    def close(self):
+        if self._training_pool is not None:
+            self._training_pool.shutdown(wait=True)
+            self._training_pool = None
+
+
+class StepFailed(Exception):
+    """Raised by a handler to stop the execution with a failed step."""
+
+
+class ExecutionContext:
+    """Collects the numbered steps of one execution."""
+
+    def __init__(self):
+        self.execution_flow = {}
+
+    @contextmanager
+    def step(self, action):
+        """
+        Times one step. The yielded dict is the step record; handlers add their own
+        fields to it (records_processed, patterns_found, ...).
+        """
+        record = {'action': action, 'status': 'running'}
+        self.execution_flow[f"step_{len(self.execution_flow) + 1}"] = record
+        start = time.perf_counter()
+        try:
+            yield record
+            record['status'] = 'completed'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            record['duration'] = _format_duration(elapsed)
+            metrics.record("execution_step", elapsed, action=action)
+
+
+def _format_duration(seconds):
+    return f"{seconds:.3f}s"
+
+
+def _timeframe_hours(timeframe):
+    """Parses '24h', '7d' or '30m' into hours."""
+    match = re.fullmatch(r"\s*(\d+)\s*([mhd])\s*", str(timeframe))
+    if not match:
+        raise ValueError(f"Unsupported timeframe '{timeframe}'. Use e.g. '30m', '24h' or '7d'.")
+    value, unit = int(match.group(1)), match.group(2)
+    return value / 60 if unit == 'm' else value * 24 if unit == 'd' else value
+
+
+# --- Request Handlers ---
+def handle_federated_research(ctx, request, state):
+    """Federated learning over the warm dataset, gated by the patient's CARV ID permission."""
+    from ai_agent import (train_local_models, aggregate_models, evaluate_global_model, run_federated_rounds,
+                          train_from_counts)
+    from checkpoints import ModelStore, model_hash
+    from orchestrator import has_access, submit_research_result
+    from sharding import ShardedDataset
+    from sklearn.model_selection import train_test_split
+
+    params = request.get('parameters', {})
+    num_agents = int(params.get('num_agents', 3))
+    federated_rounds = params.get('federated_rounds')
+    sharding = params.get('sharding', "contiguous")
+    sufficient_stats = bool(params.get('sufficient_stats', False))
+    data_type = params.get('data_type', "drug_discovery_data")
+    research_topic = params.get('research_topic', "Drug Discovery - Disease X Prediction")
+
+    with ctx.step("permission_check") as step:
+        chain = state.chain()
+        token_id = int(request.get('user_carv_id', 101))
+        agent_address = chain.ai_agent_account.address
+        # The checker outlives jobs; drop its memo so grants revoked since the last job are seen
+        chain.permission_checker.invalidate(token_id)
+        allowed = has_access(token_id, agent_address, chain.w3.keccak(text=data_type))
+        step.update({'carv_id': token_id, 'data_type': data_type, 'access_granted': bool(allowed)})
+        if not allowed:
+            raise StepFailed(f"Agent {agent_address} has no '{data_type}' access for CARV ID {token_id}")
+
+    with ctx.step("data_loading") as step:
+        df = state.dataset(params.get('data_path', "anonymized_medical_data.csv"))
+        encoder = state.encoder()
+        train_df, test_df = train_test_split(df, test_size=0.1, random_state=42)
+        step['records_processed'] = len(df)
+
+    with ctx.step("federated_training") as step, \
+            ShardedDataset(train_df, num_agents, strategy=sharding, encoder=encoder) as sharded:
+        if sufficient_stats:
+            global_model, agent_counts = train_from_counts(sharded.shards, encoder=encoder, executor=state.training_pool())
+            step['cells_per_agent'] = int(agent_counts[0].size)
+        elif federated_rounds:
+            global_model, history = run_federated_rounds(sharded.shards, encoder=encoder, rounds=int(federated_rounds),
+                                                         executor=state.training_pool())
+            step['rounds'] = len(history)
+        else:
+            local_results = train_local_models(sharded.shards, encoder=encoder, executor=state.training_pool())
+            global_model = aggregate_models([model for model, _, _ in local_results])
+            step['local_accuracies'] = [round(acc, 2) for _, acc, _ in local_results]
+        step['agents'] = num_agents
+        step['sharding'] = sharding
+        if global_model is None:
+            raise StepFailed("Global model could not be aggregated")
+
+    with ctx.step("evaluation") as step:
+        accuracy = evaluate_global_model(global_model, test_df, encoder=encoder)
+        step['test_records'] = len(test_df)
+
+    with ctx.step("result_submission") as step:
+        weights_hash = model_hash(global_model)
+        if params.get('checkpoint_dir'):
+            ModelStore(params['checkpoint_dir']).save(global_model, {'accuracy': accuracy, 'topic': research_topic})
+        receipt = submit_research_result(research_topic, weights_hash, int(accuracy), agent_address)
+        if receipt is None:
+            raise StepFailed("Result transaction failed")
+        step['transaction_hash'] = receipt.transactionHash.hex()
+
+    return {
+        'analysis_summary': {'research_topic': research_topic, 'global_accuracy': round(accuracy, 2)},
+        'model_hash': weights_hash.hex(),
+    }
+
+
+def handle_whale_movement_analysis(ctx, request, state):
+    """
+    Large token transfers to or from a wallet within a timeframe, via the CARV D.A.T.A. API.
+    The transfers are run through the same WhaleDetector as the streaming whale watch.
+    """
+    from autonomous_research.streaming import WhaleDetector
+
+    params = request.get('parameters', {})
+    wallet = str(params['wallet_address']).lower()
+    if not re.fullmatch(r"0x[0-9a-f]{40}", wallet):
+        raise ValueError(f"Invalid wallet address '{params['wallet_address']}'")
+    hours = _timeframe_hours(params.get('timeframe', "24h"))
+    threshold = float(params.get('threshold_amount', 1000000))
+
+    with ctx.step("data_collection") as step:
+        sql_query = f"""
+        SELECT token_address, from_address, to_address, value, block_timestamp, transaction_hash
+        FROM eth.token_transfers
+        WHERE (from_address = '{wallet}' OR to_address = '{wallet}')
+            AND block_timestamp >= date_add('minute', -{int(hours * 60)}, current_timestamp)
+        """
+        transfers = state.carv_client(params.get('api_key')).query(sql_query, result_format="dataframe")
+        if transfers is None:
+            raise StepFailed("CARV D.A.T.A. query failed")
+        step['data_sources'] = ["ethereum_blockchain"]
+        step['records_processed'] = len(transfers)
+
+    with ctx.step("whale_analysis") as step:
+        # The result set is already in memory, so every whale alert is kept for the findings
+        detector = WhaleDetector(threshold=threshold, max_alerts=None).consume([transfers])
+        summary = detector.summary()
+        step['large_transactions'] = summary['whale_transaction_count']
+        step['total_volume'] = str(int(summary['whale_transaction_value']))
+
+    with ctx.step("pattern_detection") as step:
+        whales = [alert for alert in detector.alerts if alert['type'] == "whale_movement"]
+        inflow_volume = sum(alert['value'] for alert in whales if alert['to_address'] == wallet)
+        outflow_volume = sum(alert['value'] for alert in whales if alert['to_address'] != wallet)
+        patterns = []
+        if inflow_volume > outflow_volume:
+            patterns.append("accumulation_phase")
+        if outflow_volume > 0:
+            patterns.append("distribution_activity")
+        step['patterns_found'] = patterns
+
+    # Ten largest transfers above the threshold
+    detailed_findings = [{key: str(value) for key, value in alert.items() if key != 'type'}
+                         for alert in sorted(whales, key=lambda alert: -alert['value'])[:10]]
+    movement_type = "accumulation" if inflow_volume > outflow_volume else "distribution" if outflow_volume else "none"
+    alerts = []
+    if whales:
+        alerts.append({
+            'type': 'whale_movement',
+            'severity': 'high' if len(whales) >= 10 else 'medium',
+            'message': f"{len(whales)} transfers above {threshold:,.0f} in the last {params.get('timeframe', '24h')}",
+        })
+    return {
+        'analysis_summary': {'wallet_activity': "high" if whales else "low", 'movement_type': movement_type,
+                             'transfer_summary': summary},
+        # Most active addresses besides the wallet itself, which is on every transfer
+        'top_counterparties': [{'address': address, 'transfers': count, 'error': error}
+                               for address, count, error in detector.top_addresses(6) if address != wallet][:5],
+        'detailed_findings': detailed_findings,
+        'alerts': alerts,
+    }
+
+
+# request_type -> handler(ctx, request, state) returning the 'results' section
+REQUEST_HANDLERS = {
+    'federated_research': handle_federated_research,
+    'whale_movement_analysis': handle_whale_movement_analysis,
+}
+
+
+class AgentService:
+    """
+    Local job queue served by a pool of worker threads that share one WarmState.
+
+    Use `submit` for a Future of the execution record, or `serve_directory` to
+    process request files dropped into an inbox directory.
+    """
+
+    def __init__(self, workers=4, state=None, handlers=None):
+        self.state = state or WarmState()
+        self.handlers = dict(REQUEST_HANDLERS if handlers is None else handlers)
+        self._jobs = queue.Queue()
+        self._sequence = itertools.count(1)
+        self._workers = [threading.Thread(target=self._work, name=f"agent-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, execution_request):
+        """Queues an execution request and returns a Future resolving to its execution record."""
+        future = Future()
+        self._jobs.put((execution_request, time.perf_counter(), future))
+        return future
+
+    def execute(self, execution_request, queued_at=None):
+        """Runs one execution request in the calling thread and returns its execution record."""
+        start = time.perf_counter()
+        agent_id = str(execution_request.get('agent_id', "unknown"))
+        request = execution_request.get('request', {})
+        now = datetime.now(timezone.utc)
+        record = {
+            'execution_id': execution_request.get('execution_id')
+                            or f"exec_{agent_id}_{now:%Y%m%d_%H%M%S}_{next(self._sequence)}",
+            'agent_id': agent_id,
+            'timestamp': now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'request': request,
+        }
+
+        ctx = ExecutionContext()
+        record['execution_flow'] = ctx.execution_flow
+        handler = self.handlers.get(request.get('request_type'))
+        try:
+            if handler is None:
+                raise StepFailed(f"Unsupported request type '{request.get('request_type')}'. "
+                                 f"Expected one of {sorted(self.handlers)}.")
+            with metrics.timer("execution", request_type=request.get('request_type')):
+                record['results'] = handler(ctx, request, self.state)
+            record['status'] = 'completed'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+
+        record['performance_metrics'] = {
+            'total_execution_time': _format_duration(time.perf_counter() - start),
+            'queue_wait_time': _format_duration(start - queued_at) if queued_at is not None else "0.000s",
+        }
+        metrics.count("executions", request_type=request.get('request_type'), status=record['status'])
+        # Keeps the JSON lines log and Prometheus file current while the service runs
+        metrics.flush()
+        return record
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            execution_request, queued_at, future = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.execute(execution_request, queued_at))
+                except BaseException as e:
+                    future.set_exception(e)
+            self._jobs.task_done()
+
+    def serve_directory(self, inbox, outbox, poll_interval=0.5, stop_event=None):
+        """
+        Queues every *.json request file that appears in inbox (the file is removed once
+        read; writers should create it under another name and rename it in) and writes each
+        finished record to outbox/<execution_id>_execution.json.
+        Runs until stop_event is set or the process is interrupted.
+        """
+        inbox, outbox = Path(inbox), Path(outbox)
+        inbox.mkdir(parents=True, exist_ok=True)
+        outbox.mkdir(parents=True, exist_ok=True)
+        stop_event = stop_event or threading.Event()
+
+        def write_record(future):
+            record = future.result()
+            path = outbox / f"{record['execution_id']}_execution.json"
+            with open(path, "w") as f:
+                json.dump(record, f, indent=2)
+            print(f"[{record['status']}] {record['execution_id']} "
+                  f"({record['performance_metrics']['total_execution_time']}) -> {path}")
+
+        print(f"Serving execution requests from {inbox} with {len(self._workers)} workers (Ctrl+C to stop)")
+        while not stop_event.is_set():
+            for path in sorted(inbox.glob("*.json")):
+                try:
+                    with open(path) as f:
+                        execution_request = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Skipping unreadable request {path.name}: {e}")
+                    path.rename(path.with_suffix(".invalid"))
+                    continue
+                path.unlink()
+                self.submit(execution_request).add_done_callback(write_record)
+            stop_event.wait(poll_interval)
+
+    def close(self):
+        """Finishes queued jobs, stops the workers and releases warm resources."""
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join()
+        self.state.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def serve(inbox="jobs/inbox", outbox="jobs/outbox", workers=4, training_executor="thread"):
+    with AgentService(workers=workers, state=WarmState(training_executor=training_executor)) as service:
+        try:
+            service.serve_directory(inbox, outbox)
+        except KeyboardInterrupt:
+            print("\nStopping service...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve agent execution requests from a local job queue")
+    parser.add_argument('--inbox', default="jobs/inbox", help='Directory watched for *.json execution requests')
+    parser.add_argument('--outbox', default="jobs/outbox", help='Directory execution records are written to')
+    parser.add_argument('--workers', type=int, default=4, help='Number of worker threads')
+    parser.add_argument('--training-executor', default="thread", choices=["process", "thread", "serial"],
+                        help='Executor kept warm for local model training')
+    args = parser.parse_args()
+    serve(args.inbox, args.outbox, args.workers, args.training_executor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Tests import backend modules the same way the scripts do: the shared packages from the
+# backend directory, and the orchestration modules by their sibling names
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "orchestration"))
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from ai_agent import run_federated_rounds, train_local_model
+from encoder import FeatureEncoder
+
+
+def test_rows_with_unknown_outcome_are_dropped():
+    df = pd.DataFrame({
+        'age_group': ["20-29", "30-39", "40-49", "50-59"] * 25,
+        'diagnosis_code': ["C00", "J45"] * 50,
+        'treatment_outcome': ["Improved", "Stable", None, "Worsened", "unknown"] * 20,
+    })
+    model, accuracy = train_local_model(df, encoder=FeatureEncoder())
+    assert model is not None and accuracy > 0
+    assert list(model.classes_) == ["Improved", "Stable", "Worsened"]
+
+    global_model, history = run_federated_rounds([df.iloc[:50], df.iloc[50:]], encoder=FeatureEncoder(), rounds=2,
+                                                 executor="serial")
+    assert global_model is not None and len(history) == 2
+    assert np.isfinite(global_model.coef_).all()
+
+
+def test_count_fit_matches_row_fit():
+    from sklearn.linear_model import LogisticRegression
+
+    from ai_agent import fit_from_counts, local_counts, train_from_counts
+    from sharding import ShardedDataset
+    from utils.data_provider import generate_medical_data
+
+    df = generate_medical_data(20_000, seed=3, verbose=False)
+    encoder = FeatureEncoder()
+    counts = local_counts(df, encoder)
+    assert counts.sum() == len(df)
+
+    # Per-agent tensors add up to the tensor of all rows, whether agents hold frames or shared-memory shards
+    with ShardedDataset(df, 3, strategy="hash", encoder=encoder) as sharded:
+        model, agent_counts = train_from_counts(sharded.shards, encoder=encoder, executor="serial")
+    np.testing.assert_array_equal(np.sum(agent_counts, axis=0), counts)
+    frame_counts = [local_counts(df.iloc[i::3], encoder) for i in range(3)]
+    np.testing.assert_array_equal(np.sum(frame_counts, axis=0), counts)
+
+    rows = LogisticRegression(max_iter=1000, solver='liblinear', random_state=42)
+    rows.fit(encoder.transform(df), df['treatment_outcome'].to_numpy())
+    cells = fit_from_counts(counts, encoder)
+    assert list(cells.classes_) == list(rows.classes_)
+    np.testing.assert_allclose(cells.coef_, rows.coef_, atol=1e-3)
+    np.testing.assert_allclose(cells.intercept_, rows.intercept_, atol=1e-3)
+    np.testing.assert_allclose(model.coef_, cells.coef_)
+    X = encoder.transform(df)
+    assert (cells.predict(X) == rows.predict(X)).mean() > 0.999
+
+
+def test_agent_and_test_split_does_not_depend_on_chunking(tmp_path):
+    from ai_agent import iter_agent_shards
+    from utils.data_provider import generate_medical_data_to_file
+
+    def split_ids(path, chunksize):
+        agents, test = [set() for _ in range(3)], set()
+        for agent_chunks, test_chunk in iter_agent_shards(path, 3, chunksize=chunksize):
+            for ids, chunk in zip(agents, agent_chunks):
+                ids.update(chunk['patient_id'])
+            test.update(test_chunk['patient_id'])
+        return agents, test
+
+    splits = []
+    for workers in (1, 4):
+        path = str(tmp_path / f"workers_{workers}.csv")
+        generate_medical_data_to_file(10_000, path, seed=5, chunk_size=2_500, workers=workers)
+        splits += [split_ids(path, chunksize) for chunksize in (1_000, 3_333, 10_000)]
+    agents, test = splits[0]
+    assert all(split == splits[0] for split in splits)
+    assert 0 < len(test) < 10_000 and sum(map(len, agents)) + len(test) == 10_000
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from checkpoints import ModelStore, model_hash, weights_hash
+
+CLASSES = np.array(["Improved", "Stable", "Worsened"], dtype=object)
+# weights_hash of the weights in test_digest_is_pinned
+PINNED_DIGEST = "ab66c3efacaa1d6368e2bf8c39ff40f816a858daef1c489f2ae521d9201e72a8"
+
+
+def _model(coef, intercept, classes=CLASSES):
+    model = LogisticRegression()
+    model.coef_, model.intercept_, model.classes_ = coef, intercept, classes
+    return model
+
+
+@pytest.fixture
+def weights():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(3, 13)), rng.normal(size=3)
+
+
+def test_digest_depends_on_values_only(weights):
+    coef, intercept = weights
+    digest = weights_hash(coef, intercept, CLASSES)
+    # Memory layout, byte order and container types do not change the digest
+    assert weights_hash(np.asfortranarray(coef), intercept.astype(">f8"), list(CLASSES)) == digest
+    assert weights_hash(coef.tolist(), intercept.reshape(1, -1), CLASSES) == digest
+    assert len(digest) == 32
+
+    changed = coef.copy()
+    changed[1, 4] = np.nextafter(changed[1, 4], np.inf)
+    assert weights_hash(changed, intercept, CLASSES) != digest
+    assert weights_hash(coef, intercept, CLASSES[::-1]) != digest
+    assert weights_hash(coef.reshape(13, 3), intercept, CLASSES) != digest
+
+
+def test_digest_is_pinned():
+    # Changing the canonical format changes every stored hash and on-chain result hash
+    coef, intercept = np.arange(6, dtype=np.float64).reshape(2, 3) / 4, np.array([0.5, -0.5])
+    assert weights_hash(coef, intercept, ["a", "b"]).hex() == PINNED_DIGEST
+
+
+def test_save_load_round_trip(tmp_path, weights):
+    store = ModelStore(str(tmp_path / "checkpoints"))
+    model = _model(*weights)
+    digest = store.save(model, metadata={'round': 1})
+    assert digest == model_hash(model).hex()
+    assert store.save(_model(weights[0].copy(), weights[1].copy()), metadata={'accuracy': 90.0}) == digest
+
+    store.tag("latest", digest)
+    assert store.resolve("latest") == store.resolve("0x" + digest) == digest
+    assert "latest" in store and "missing" not in store
+    with pytest.raises(KeyError):
+        store.resolve("missing")
+
+    loaded = store.load("latest")
+    np.testing.assert_array_equal(loaded.coef_, model.coef_)
+    np.testing.assert_array_equal(loaded.intercept_, model.intercept_)
+    assert list(loaded.classes_) == list(CLASSES)
+    assert model_hash(loaded).hex() == digest
+    assert store.metadata("latest") == {'round': 1, 'accuracy': 90.0}
+
+    loaded.coef_[0, 0] += 1.0
+    store.tag("latest", store.save(loaded))
+    assert store.resolve("latest") != digest
+    np.testing.assert_array_equal(store.load(digest).coef_, model.coef_)
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from utils.data_provider import generate_medical_data, generate_medical_data_to_file
+from utils.storage import read_table
+
+pytest.importorskip("pyarrow")
+
+RECORDS = 20_000
+CHUNK_SIZE = 3_000
+
+
+def test_output_does_not_depend_on_worker_count(tmp_path):
+    frames = {}
+    for workers in (1, 4):
+        path = tmp_path / f"workers_{workers}.arrow"
+        assert generate_medical_data_to_file(RECORDS, str(path), seed=11, chunk_size=CHUNK_SIZE,
+                                             workers=workers) == RECORDS
+        frames[workers] = read_table(str(path))
+    pd.testing.assert_frame_equal(frames[1], frames[4])
+    # The in-memory generator uses the same chunk streams
+    pd.testing.assert_frame_equal(frames[1], generate_medical_data(RECORDS, seed=11, chunk_size=CHUNK_SIZE,
+                                                                   verbose=False))
+    assert frames[1]['patient_id'].tolist() == list(range(1, RECORDS + 1))
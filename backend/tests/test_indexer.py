@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("web3")
+
+from chain import connect_mock
+from indexer import EventIndexer
+from web3 import Web3
+
+GRANTS = 700
+DATA_TYPE = Web3.keccak(text="drug_discovery_data")
+
+
+@pytest.fixture(scope="module")
+def chain():
+    chain = connect_mock(max_logs=300)
+    owner = chain.deployer_account
+    tx = chain.tx_manager
+    tx.submit(chain.carv_id_contract.functions.mint, owner, owner.address, 101, "ipfs://101").result()
+    agents = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(GRANTS)]
+    futures = tx.submit_many([(chain.carv_id_contract.functions.grantAccess, owner, (101, agent, DATA_TYPE))
+                              for agent in agents])
+    for future in futures:
+        future.result()
+    tx.submit(chain.carv_id_contract.functions.revokeAccess, owner, 101, agents[0], DATA_TYPE).result()
+    chain.agents = agents
+    return chain
+
+
+def test_adaptive_ranges_and_resume(chain):
+    indexer = EventIndexer(chain, ":memory:", start_block=1, batch_size=1000)
+    head = chain.w3.eth.block_number
+    calls = []
+    get_logs = indexer._get_logs
+
+    def recording_get_logs(from_block, to_block):
+        try:
+            logs = get_logs(from_block, to_block)
+        except ValueError:
+            calls.append((from_block, to_block, None))
+            raise
+        calls.append((from_block, to_block, len(logs)))
+        return logs
+
+    indexer._get_logs = recording_get_logs
+    # A partial sync, then a resume from the block after it
+    assert indexer.sync(to_block=150) == 149
+    assert indexer.last_block == 150
+    assert indexer.sync() == GRANTS + 1 - 149
+    assert indexer.last_block == head
+    assert indexer.sync() == 0
+
+    # Ranges with more than max_logs matches were rejected and halved; accepted ranges tile the blocks
+    rejected = [call for call in calls if call[2] is None]
+    accepted = [call for call in calls if call[2] is not None]
+    assert rejected and all(count <= 300 for _, _, count in accepted)
+    assert [from_block for from_block, _, _ in accepted] == [1] + [to_block + 1 for _, to_block, _ in accepted[:-1]]
+
+    assert indexer.has_access(101, chain.agents[0], DATA_TYPE) is False # Revoked after the grant
+    assert indexer.has_access_many([101, 102], chain.agents[-1], DATA_TYPE) == [True, False]
+    assert all(indexer.has_access_many([101], agent, DATA_TYPE) == [True] for agent in chain.agents[1:])
+    indexer.close()
+
+
+class _Flaky:
+    """Raises transient errors for the first `failures` calls, then delegates."""
+
+    def __init__(self, get_logs, failures):
+        self.get_logs = get_logs
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, from_block, to_block):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Connection reset by peer")
+        return self.get_logs(from_block, to_block)
+
+
+def test_transient_errors_are_retried_without_shrinking_the_range(chain):
+    indexer = EventIndexer(chain, ":memory:", start_block=1, batch_size=200, retry_delay=0)
+    indexer._get_logs = _Flaky(indexer._get_logs, failures=3)
+    assert indexer.sync(to_block=200) == 199
+    assert indexer.batch_size >= 200
+    indexer.close()
+
+
+def test_persistent_errors_raise_and_keep_the_watermark(chain):
+    indexer = EventIndexer(chain, ":memory:", start_block=1, batch_size=200, max_retries=2, retry_delay=0)
+    indexer._get_logs = _Flaky(indexer._get_logs, failures=10)
+    with pytest.raises(ConnectionError):
+        indexer.sync(to_block=200)
+    assert indexer._get_logs.calls == 3
+    assert indexer.last_block == 0 and indexer.batch_size == 200
+    indexer.close()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from encoder import FeatureEncoder
+from inference import BatchScorer
+from utils.data_provider import generate_medical_data
+
+
+@pytest.fixture(scope="module")
+def data():
+    df = generate_medical_data(5_000, seed=7, verbose=False)
+    # Unknown categories score like an all-zero one-hot block
+    df.loc[:9, 'diagnosis_code'] = np.nan
+    encoder = FeatureEncoder()
+    return df, encoder, encoder.transform(df), encoder.codes(df), df['treatment_outcome'].to_numpy()
+
+
+@pytest.mark.parametrize("solver, multi_class", [("liblinear", "ovr"), ("lbfgs", "multinomial")])
+def test_matches_sklearn(data, solver, multi_class):
+    df, encoder, X, codes, y = data
+    model = LogisticRegression(solver=solver, max_iter=1000).fit(X, y)
+    scorer = BatchScorer.from_model(model, encoder, multi_class=multi_class, chunk_size=1_000)
+
+    np.testing.assert_allclose(scorer.predict_proba(codes), model.predict_proba(X), rtol=1e-10, atol=1e-12)
+    np.testing.assert_array_equal(scorer.predict(codes), model.predict(X))
+    assert scorer.accuracy(codes, y) == pytest.approx(model.score(X, y))
+
+
+def test_binary_model_matches_sklearn(data):
+    df, encoder, X, codes, y = data
+    binary = y != "Stable"
+    model = LogisticRegression(solver="liblinear").fit(X[binary], y[binary])
+    scorer = BatchScorer.from_model(model, encoder)
+    np.testing.assert_allclose(scorer.predict_proba(codes), model.predict_proba(X), rtol=1e-10, atol=1e-12)
+    assert scorer.accuracy(codes[binary], y[binary]) == pytest.approx(model.score(X[binary], y[binary]))
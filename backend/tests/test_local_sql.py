@@ -0,0 +1,59 @@
+from datetime import date, datetime, timezone
+
+import pandas as pd
+import pytest
+
+from autonomous_research.local_sql import LocalMirror
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+TODAY = date(2024, 12, 2)
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = LocalMirror(str(tmp_path))
+    for day in ("2024-11-30", "2024-12-01"):
+        mirror.write_partition("eth.transactions", day, pd.DataFrame({'date': [day], 'value': [1.0]}))
+    mirror.write_partition("eth.token_transfers", "2024-12-01", pd.DataFrame({'date': ["2024-12-01"], 'value': [2.0]}))
+    return mirror
+
+
+def test_every_referenced_table_is_checked(mirror):
+    sql = ("SELECT * FROM eth.transactions t JOIN eth.token_transfers x ON t.date = x.date "
+           "WHERE t.date >= '2024-11-30'")
+    assert not mirror.can_answer(sql, TODAY)
+    assert mirror.can_answer(sql.replace("2024-11-30", "2024-12-01"), TODAY)
+
+    unbounded = "SELECT COUNT(*) FROM eth.transactions JOIN eth.token_transfers USING (date)"
+    assert not mirror.can_answer(unbounded, TODAY)
+    mirror.offline = True
+    assert mirror.can_answer(unbounded, TODAY)
+
+
+def test_unbounded_query_needs_every_table_mirrored(tmp_path):
+    mirror = LocalMirror(str(tmp_path), offline=True)
+    mirror.write_partition("eth.transactions", "2024-12-01", pd.DataFrame({'date': ["2024-12-01"], 'value': [1.0]}))
+    assert mirror.can_answer("SELECT COUNT(*) FROM eth.transactions", TODAY)
+    assert not mirror.can_answer("SELECT COUNT(*) FROM eth.transactions JOIN eth.token_transfers USING (date)", TODAY)
+
+
+def test_current_date_is_utc(mirror):
+    # required_days resolves current_date in UTC; DuckDB must agree whatever the local time zone
+    assert mirror.query_raw("SELECT current_setting('TimeZone')")['rows'][0]['items'] == ["UTC"]
+    today = mirror.query_raw("SELECT current_date")['rows'][0]['items'][0]
+    assert today == datetime.now(timezone.utc).date().isoformat()
+
+
+def test_empty_partitions_answer_with_zero_rows(tmp_path):
+    mirror = LocalMirror(str(tmp_path), offline=True)
+    mirror.write_partition("eth.token_transfers", "2024-11-01", pd.DataFrame())
+    sql = "SELECT COUNT(*) AS n, SUM(value) AS total FROM eth.token_transfers WHERE date = '2024-11-01'"
+    assert mirror.can_answer(sql, TODAY)
+    assert mirror.query_raw(sql)['rows'] == [{'items': [0, None]}]
+
+    # A later partition with rows replaces the empty view
+    mirror.write_partition("eth.token_transfers", "2024-11-02",
+                           pd.DataFrame({'date': ["2024-11-02"], 'value': [3.0]}))
+    assert mirror.query_raw("SELECT SUM(value) FROM eth.token_transfers")['rows'] == [{'items': [3.0]}]
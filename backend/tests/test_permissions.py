@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("web3")
+
+from mock_chain import MockWeb3
+from permissions import PermissionChecker
+
+AGENT = "0x" + "ab" * 20
+OWNER = "0x" + "cd" * 20
+
+
+@pytest.fixture(params=[True, False], ids=["multicall", "individual"])
+def chain(request):
+    w3 = MockWeb3(multicall=request.param)
+    nft = w3.carv_id_nft
+    nft._fn_mint(OWNER, OWNER, 101, "ipfs://101")
+    return w3, nft, PermissionChecker(w3, nft)
+
+
+def test_revoked_access_is_seen_after_invalidate(chain):
+    w3, nft, checker = chain
+    data_type = w3.keccak(text="drug_discovery_data")
+    nft._fn_grantAccess(w3.to_checksum_address(OWNER), 101, AGENT, data_type)
+    assert checker.has_access(101, AGENT, data_type)
+
+    nft._fn_revokeAccess(w3.to_checksum_address(OWNER), 101, AGENT, data_type)
+    assert checker.has_access(101, AGENT, data_type) # Memoized until invalidated
+    checker.invalidate(101)
+    assert not checker.has_access(101, AGENT, data_type)
+
+
+def test_failed_lookups_are_not_memoized(chain):
+    w3, nft, checker = chain
+    assert checker.owners_of([101, 102]) == [w3.to_checksum_address(OWNER), None]
+    nft._fn_mint(OWNER, OWNER, 102, "ipfs://102")
+    assert checker.owner_of(102) == w3.to_checksum_address(OWNER)
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from autonomous_research.query_cache import VOLATILE_TTL, QueryCache, default_ttl, normalize_sql
+
+TODAY = datetime.now(timezone.utc).date()
+PAST = (TODAY - timedelta(days=30)).isoformat()
+YESTERDAY = (TODAY - timedelta(days=1)).isoformat()
+
+
+@pytest.mark.parametrize("where", [
+    f"date >= '{PAST}' AND date < '{YESTERDAY}'",
+    f"date >= '{PAST}' AND date <= '{YESTERDAY}'",
+    f"date_parse(date, '%Y-%m-%d') BETWEEN date_parse('{PAST}', '%Y-%m-%d') AND date_parse('{YESTERDAY}', '%Y-%m-%d')",
+    f"date = '{YESTERDAY}'",
+    f"block_timestamp < timestamp '{YESTERDAY} 12:00:00'",
+])
+def test_closed_historical_windows_are_cached_forever(where):
+    assert default_ttl(f"SELECT COUNT(*) FROM eth.transactions WHERE {where}") is None
+
+
+@pytest.mark.parametrize("where", [
+    f"date >= '{PAST}'",
+    f"date_parse(date, '%Y-%m-%d') >= date_parse('{PAST}', '%Y-%m-%d')",
+    "date >= date_add('day', -7, current_date)",
+    f"date >= '{PAST}' AND date <= '{TODAY.isoformat()}'",
+    f"date BETWEEN '{PAST}' AND '{(TODAY + timedelta(days=3)).isoformat()}'",
+    "value > 5",
+])
+def test_open_or_current_windows_expire(where):
+    assert default_ttl(f"SELECT COUNT(*) FROM eth.transactions WHERE {where}") == VOLATILE_TTL
+
+
+def test_whitespace_inside_literals_is_part_of_the_key():
+    assert normalize_sql("SELECT  *\n FROM t WHERE memo = 'a  b' ;") == "SELECT * FROM t WHERE memo = 'a  b'"
+    assert QueryCache.key("SELECT * FROM t WHERE memo = 'a  b'") != QueryCache.key("SELECT * FROM t WHERE memo = 'a b'")
+    assert QueryCache.key("SELECT 'a' 'b'") != QueryCache.key("SELECT 'a''b'")
+    assert QueryCache.key("SELECT 'it''s  x'\n") == QueryCache.key("SELECT   'it''s  x'")
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_results_are_returned_as_copies(tmp_path, on_disk):
+    cache = QueryCache(str(tmp_path / "cache.db") if on_disk else None)
+    sql = f"SELECT 1 WHERE date = '{YESTERDAY}'"
+    cache.set(sql, {'rows': [{'items': [1]}]})
+    if on_disk:
+        cache._memory.clear()
+    first = cache.get(sql)
+    first['rows'].append("changed")
+    assert cache.get(sql) == {'rows': [{'items': [1]}]}
+    cache.close()
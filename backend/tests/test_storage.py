@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.storage import iter_table, read_table, write_table
+
+pa = pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def numeric_frame():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'value': rng.random(50_000),
+        'count': rng.integers(0, 1000, 50_000),
+    })
+
+
+def test_arrow_read_is_memory_mapped(tmp_path, numeric_frame):
+    path = tmp_path / "data.arrow"
+    write_table(numeric_frame, str(path))
+
+    before = pa.total_allocated_bytes()
+    df = read_table(str(path))
+    # Numeric columns are views of the mapped file: nothing is allocated by Arrow or copied into blocks
+    assert pa.total_allocated_bytes() - before == 0
+    for col in numeric_frame.columns:
+        assert not df[col].to_numpy().flags.writeable
+    pd.testing.assert_frame_equal(df, numeric_frame)
+
+
+def test_arrow_chunks_match_full_read(tmp_path, numeric_frame):
+    path = tmp_path / "data.arrow"
+    write_table(numeric_frame, str(path))
+    chunks = list(iter_table(str(path), chunksize=7_000))
+    assert [len(chunk) for chunk in chunks] == [7_000] * 7 + [1_000]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), numeric_frame)
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from autonomous_research.streaming import CountMinSketch, WhaleDetector
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_null_values_are_left_out_of_value_statistics():
+    df = pd.DataFrame({
+        'from_address': ["0xa", "0xb", "0xa", "0xc"],
+        'to_address': ["0xb", "0xc", "0xc", "0xa"],
+        'value': [5.0, None, 2_000_000.0, 1.0],
+    })
+    detector = WhaleDetector(threshold=1_000_000).consume([df.iloc[:2], df.iloc[2:]])
+    summary = detector.summary()
+
+    assert summary['transaction_count'] == 4
+    assert summary['total_transaction_value'] == df['value'].sum()
+    assert summary['max_transaction_value'] == df['value'].max()
+    assert summary['min_transaction_value'] == df['value'].min()
+    assert (summary['max_value_from_address'], summary['max_value_to_address']) == ("0xa", "0xc")
+    assert summary['whale_transaction_count'] == 1
+    assert not np.isnan(detector.sketch.estimate("0xb"))
+    assert dict((address, count) for address, count, _ in detector.top_addresses(3)) == {"0xa": 3, "0xc": 3, "0xb": 2}
+
+
+def test_count_min_columns_are_stable_across_processes():
+    keys = ["0xa", "0xb", "0xc"]
+    script = f"from autonomous_research.streaming import CountMinSketch; print(CountMinSketch(seed=1)._columns({keys!r}).tolist())"
+    # Fresh interpreters with different str hash salts
+    outputs = {subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                              cwd=BACKEND_DIR, env={**os.environ, "PYTHONHASHSEED": str(seed)}).stdout
+               for seed in (1, 2)}
+    assert outputs == {f"{CountMinSketch(seed=1)._columns(keys).tolist()}\n"}
+
+
+def test_count_min_merge_equals_single_sketch():
+    keys, weights = ["0xa", "0xb", "0xa", "0xc"], [1.0, 2.0, 3.0, 4.0]
+    whole = CountMinSketch(width=64, depth=3)
+    whole.add_many(keys, weights)
+    left, right = CountMinSketch(width=64, depth=3), CountMinSketch(width=64, depth=3)
+    left.add_many(keys[:2], weights[:2])
+    right.add_many(keys[2:], weights[2:])
+    np.testing.assert_array_equal(left.merge(right).table, whole.table)
+    assert whole.estimate("0xa") >= 4.0
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.taskgraph import TaskGraph
+
+
+def _sleep(seconds, value=None):
+    def stage(*args):
+        time.sleep(seconds)
+        return value if value is not None else args
+    return stage
+
+
+def test_order_respects_dependencies():
+    graph = TaskGraph(cpu_executor="thread")
+    graph.add("report", _sleep(0), deps=["train", "fetch"]).add("train", _sleep(0), deps=["load"])
+    graph.add("load", _sleep(0)).add("fetch", _sleep(0))
+    order = graph.order()
+    assert sorted(order) == ["fetch", "load", "report", "train"]
+    assert order.index("load") < order.index("train") < order.index("report")
+    assert order.index("fetch") < order.index("report")
+
+
+def test_unknown_dependencies_and_cycles_are_rejected():
+    graph = TaskGraph(cpu_executor="thread").add("a", _sleep(0), deps=["missing"])
+    with pytest.raises(ValueError, match="unknown task"):
+        graph.order()
+
+    graph = TaskGraph(cpu_executor="thread")
+    graph.add("a", _sleep(0), deps=["c"]).add("b", _sleep(0), deps=["a"]).add("c", _sleep(0), deps=["b"])
+    with pytest.raises(ValueError, match="Dependency cycle: a -> c -> b -> a"):
+        graph.run()
+    with pytest.raises(ValueError, match="already defined"):
+        graph.add("a", _sleep(0))
+
+
+def test_results_flow_to_dependents():
+    async def fetch():
+        await asyncio.sleep(0)
+        return 2
+
+    graph = TaskGraph(cpu_executor="thread")
+    graph.add("load", lambda: 3, kind="cpu").add("fetch", fetch)
+    graph.add("combine", lambda load, fetch: (load, fetch), deps=["load", "fetch"], kind="cpu")
+    assert graph.run() == {'load': 3, 'fetch': 2, 'combine': (3, 2)}
+    assert all(record['status'] == "done" for record in graph.records.values())
+
+
+def test_failure_skips_dependents_only():
+    def broken():
+        raise RuntimeError("boom")
+
+    graph = TaskGraph(cpu_executor="thread")
+    graph.add("load", broken, kind="cpu").add("train", _sleep(0), deps=["load"], kind="cpu")
+    graph.add("report", _sleep(0), deps=["train"]).add("fetch", _sleep(0, "fetched"))
+    assert graph.run() == {'fetch': "fetched"}
+    statuses = {name: record['status'] for name, record in graph.records.items()}
+    assert statuses == {'load': "failed", 'train': "skipped", 'report': "skipped", 'fetch': "done"}
+    assert str(graph.records['load']['error']) == "boom"
+
+
+def test_critical_path_follows_the_last_finishing_dependency():
+    graph = TaskGraph(cpu_executor="thread", max_workers=4)
+    graph.add("fast", _sleep(0.02), kind="cpu").add("slow", _sleep(0.2))
+    graph.add("merge", _sleep(0.05), deps=["fast", "slow"], kind="cpu").add("side", _sleep(0.01))
+    graph.run()
+    path, seconds = graph.critical_path()
+    assert path == ["slow", "merge"]
+    assert 0.25 <= seconds <= graph.wall_time
+    # Independent stages overlapped instead of running back to back
+    assert graph.wall_time < 0.2 + 0.05 + 0.02 + 0.01 + 0.05
+    assert "Critical path" in graph.format_report()
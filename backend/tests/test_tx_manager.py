@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("web3")
+
+from mock_chain import MOCK_AGENT_KEY, MOCK_DEPLOYER_KEY, MockWeb3
+from tx_manager import TransactionManager
+
+
+@pytest.fixture
+def w3():
+    return MockWeb3()
+
+
+@pytest.fixture
+def owner(w3):
+    return w3.eth.account.from_key(MOCK_DEPLOYER_KEY)
+
+
+def _mint(tx, w3, owner, token_id):
+    return tx.submit(w3.carv_id_nft.functions.mint, owner, owner.address, token_id, f"ipfs://{token_id}")
+
+
+def test_sequential_nonces_read_once(w3, owner):
+    tx = TransactionManager(w3)
+    receipts = [future.result() for future in tx.submit_many(
+        [(w3.carv_id_nft.functions.mint, owner, (owner.address, token_id, "ipfs://")) for token_id in range(20)])]
+    assert [receipt.status for receipt in receipts] == [1] * 20
+    assert w3.nonces[owner.address] == 20
+    assert w3.rpc_calls['eth_getTransactionCount'] == 1
+    assert w3.rpc_calls['eth_chainId'] == 1
+    assert w3.rpc_calls['eth_gasPrice'] == 1 # Within fee_ttl
+    tx.close()
+
+
+def test_fees_are_refreshed_after_ttl(w3, owner):
+    tx = TransactionManager(w3, fee_ttl=-1)
+    for token_id in range(3):
+        _mint(tx, w3, owner, token_id).result()
+    assert w3.rpc_calls['eth_gasPrice'] == 3
+    tx.close()
+
+
+def test_failed_broadcast_resyncs_the_nonce(w3, owner, monkeypatch):
+    tx = TransactionManager(w3)
+    _mint(tx, w3, owner, 1).result()
+
+    def dropped(raw_transaction):
+        raise ConnectionError("Connection reset by peer")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(w3.eth, "send_raw_transaction", dropped)
+        with pytest.raises(ConnectionError):
+            _mint(tx, w3, owner, 2)
+
+    # The nonce handed to the failed send was not used on-chain, so the next one reuses it
+    assert _mint(tx, w3, owner, 2).result().status == 1
+    assert w3.nonces[owner.address] == 2
+    assert w3.rpc_calls['eth_getTransactionCount'] == 2
+    tx.close()
+
+
+def test_reverted_transaction_fails_its_future_only(w3, owner):
+    tx = TransactionManager(w3)
+    stranger = w3.eth.account.from_key(MOCK_AGENT_KEY)
+    _mint(tx, w3, owner, 1).result()
+    reverted = tx.submit(w3.carv_id_nft.functions.grantAccess, stranger, 1, stranger.address, b"\x00" * 32)
+    with pytest.raises(Exception, match="failed"):
+        reverted.result()
+    # A reverted transaction still used its nonce
+    assert _mint(tx, w3, stranger, 2).result().status == 1
+    assert w3.nonces[stranger.address] == 2
+    tx.close()
+
+
+def test_concurrent_submits_get_distinct_gap_free_nonces(w3, owner):
+    tx = TransactionManager(w3)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = list(pool.map(lambda token_id: _mint(tx, w3, owner, token_id), range(100)))
+    receipts = [future.result() for future in futures]
+    assert all(receipt.status == 1 for receipt in receipts)
+    assert w3.nonces[owner.address] == 100
+    assert sorted(w3.carv_id_nft.owners) == list(range(100))
+    tx.close()
@@ -1,71 +1,159 @@
 import pandas as pd
 import numpy as np
-import random
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-def generate_medical_data(num_records=1000):
+if __name__ == "__main__":
+    # Run as a script: put the backend directory on the path before the imports below
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.storage import write_table, TableWriter
+
+# Define possible values for categorical variables
+AGE_GROUPS = [f"{i}-{i+9}" for i in range(10, 80, 10)]
+DIAGNOSIS_CODES = ["C00", "C18", "J45", "I10", "E11", "F32"]  # Example ICD-10 codes
+TREATMENT_OUTCOMES = ["Improved", "Stable", "Worsened"]
+TREATMENT_OUTCOME_P = [0.6, 0.3, 0.1]  # Bias towards improvement
+
+# Columns stored as categorical (dictionary encoded) in Parquet/Arrow files
+CATEGORICAL_COLUMNS = ['age_group', 'diagnosis_code', 'treatment_outcome']
+
+# Rows per generated chunk; part of the seed layout, so changing it changes the data
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+def generate_medical_chunk(seed_seq, start_id, num_records):
+    """
+    Generates one chunk of synthetic records from an independent random stream.
+
+    Args:
+        seed_seq (np.random.SeedSequence): Seed for this chunk, spawned from the run seed.
+        start_id (int): patient_id of the first record in the chunk.
+        num_records (int): Number of records to generate.
+
+    Returns:
+        pd.DataFrame: The chunk, with categorical age_group/diagnosis_code/treatment_outcome.
+    """
+    rng = np.random.default_rng(seed_seq)
+
+    # Work on category codes directly, strings are only attached as categories at the end
+    age_codes = rng.integers(0, len(AGE_GROUPS), num_records, dtype=np.int8)
+    diagnosis_codes = rng.integers(0, len(DIAGNOSIS_CODES), num_records, dtype=np.int8)
+    outcome_codes = rng.choice(len(TREATMENT_OUTCOMES), num_records, p=TREATMENT_OUTCOME_P).astype(np.int8)
+    symptoms = rng.poisson(3, num_records)  # Poisson distribution for symptom count
+    duration = rng.exponential(30, num_records).astype(np.int64) + 1  # Exponential distribution
+    medications = rng.binomial(5, 0.3, num_records) + 1  # Binomial distribution
+    lab_results_normal = rng.random(num_records) < 0.7
+
+    # Add some correlations to make the data more realistic
+    # Older patients tend to have more symptoms and longer treatment
+    symptoms = np.clip(symptoms + age_codes * 0.5, 0, 10).astype(np.int64)
+    duration = np.clip(duration + symptoms * 5, 1, 365).astype(np.int64)
+
+    return pd.DataFrame({
+        'patient_id': np.arange(start_id, start_id + num_records, dtype=np.int64),
+        'age_group': pd.Categorical.from_codes(age_codes, categories=AGE_GROUPS),
+        'diagnosis_code': pd.Categorical.from_codes(diagnosis_codes, categories=DIAGNOSIS_CODES),
+        'treatment_outcome': pd.Categorical.from_codes(outcome_codes, categories=TREATMENT_OUTCOMES),
+        'symptoms_count': symptoms,
+        'treatment_duration_days': duration,
+        'medication_count': medications,
+        'lab_results_normal': lab_results_normal,
+    })
+
+def _chunk_plan(num_records, chunk_size, seed):
+    """Splits a run into (seed_seq, start_id, size) tasks, one independent stream per chunk."""
+    num_chunks = max(1, -(-num_records // chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(num_chunks)
+    plan = []
+    for i, seed_seq in enumerate(seeds):
+        start = i * chunk_size
+        plan.append((seed_seq, start + 1, min(chunk_size, num_records - start)))
+    return plan
+
+def _generate_task(task):
+    return generate_medical_chunk(*task)
+
+def generate_medical_data(num_records=1000, seed=42, chunk_size=DEFAULT_CHUNK_SIZE, verbose=True):
     """
     Generates synthetic anonymized medical data for demonstration purposes.
     In a real scenario, this would be replaced with actual medical data from secure sources.
     """
     print(f"Generating {num_records} synthetic medical records...")
-    
-    # Set random seed for reproducibility
-    np.random.seed(42)
-    random.seed(42)
-    
-    # Define possible values for categorical variables
-    age_groups = [f"{i}-{i+9}" for i in range(10, 80, 10)]
-    diagnosis_codes = ["C00", "C18", "J45", "I10", "E11", "F32"]  # Example ICD-10 codes
-    treatment_outcomes = ["Improved", "Stable", "Worsened"]
-    
-    # Generate synthetic data
-    data = {
-        'patient_id': range(1, num_records + 1),
-        'age_group': np.random.choice(age_groups, num_records),
-        'diagnosis_code': np.random.choice(diagnosis_codes, num_records),
-        'treatment_outcome': np.random.choice(treatment_outcomes, num_records, p=[0.6, 0.3, 0.1]),  # Bias towards improvement
-        'symptoms_count': np.random.poisson(3, num_records),  # Poisson distribution for symptom count
-        'treatment_duration_days': np.random.exponential(30, num_records).astype(int) + 1,  # Exponential distribution
-        'medication_count': np.random.binomial(5, 0.3, num_records) + 1,  # Binomial distribution
-        'lab_results_normal': np.random.choice([True, False], num_records, p=[0.7, 0.3])
-    }
-    
-    df = pd.DataFrame(data)
-    
-    # Add some correlations to make the data more realistic
-    # Older patients tend to have more symptoms and longer treatment
-    age_group_mapping = {group: i for i, group in enumerate(age_groups)}
-    df['age_numeric'] = df['age_group'].map(age_group_mapping)
-    
-    # Adjust symptoms count based on age
-    df['symptoms_count'] = np.clip(
-        df['symptoms_count'] + df['age_numeric'] * 0.5, 
-        0, 10
-    ).astype(int)
-    
-    # Adjust treatment duration based on symptoms
-    df['treatment_duration_days'] = np.clip(
-        df['treatment_duration_days'] + df['symptoms_count'] * 5,
-        1, 365
-    ).astype(int)
-    
-    # Remove the temporary age_numeric column
-    df = df.drop('age_numeric', axis=1)
-    
+
+    chunks = [generate_medical_chunk(*task) for task in _chunk_plan(num_records, chunk_size, seed)]
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
     print("Medical data generation complete!")
     print(f"Data shape: {df.shape}")
-    print(f"Age groups: {df['age_group'].value_counts().to_dict()}")
-    print(f"Diagnosis codes: {df['diagnosis_code'].value_counts().to_dict()}")
-    print(f"Treatment outcomes: {df['treatment_outcome'].value_counts().to_dict()}")
-    
+    if verbose:
+        print(f"Age groups: {df['age_group'].value_counts().to_dict()}")
+        print(f"Diagnosis codes: {df['diagnosis_code'].value_counts().to_dict()}")
+        print(f"Treatment outcomes: {df['treatment_outcome'].value_counts().to_dict()}")
+
     return df
 
+def generate_medical_data_to_file(num_records, filename="anonymized_medical_data.parquet", seed=42,
+                                  chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Generates a large synthetic dataset in parallel and streams it straight to disk.
+
+    Chunks are built in worker processes from SeedSequence-spawned streams, so the
+    output only depends on (num_records, seed, chunk_size), not on the worker count.
+    At most 2 * workers chunks are in flight, which keeps memory bounded.
+
+    Returns:
+        int: Number of rows written.
+    """
+    workers = workers or os.cpu_count() or 1
+    plan = _chunk_plan(num_records, chunk_size, seed)
+    print(f"Generating {num_records} synthetic medical records in {len(plan)} chunks with {workers} workers...")
+    start = time.perf_counter()
+
+    with TableWriter(filename, categorical=CATEGORICAL_COLUMNS) as writer:
+        if workers == 1:
+            for task in plan:
+                writer.write(generate_medical_chunk(*task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = []
+                tasks = iter(plan)
+                for task in tasks:
+                    pending.append(pool.submit(_generate_task, task))
+                    if len(pending) >= 2 * workers:
+                        # Write in submission order so the file is reproducible
+                        writer.write(pending.pop(0).result())
+                for future in pending:
+                    writer.write(future.result())
+        rows_written = writer.rows_written
+
+    print(f"Wrote {rows_written} records to {filename} in {time.perf_counter() - start:.1f}s")
+    return rows_written
+
 def save_anonymized_data(df, filename="anonymized_medical_data.csv"):
-    """Saves the anonymized data to a CSV file."""
-    df.to_csv(filename, index=False)
+    """
+    Saves the anonymized data. The format follows the file extension: .csv for
+    compatibility, .parquet or .arrow/.feather for fast columnar reloads.
+    """
+    write_table(df, filename, categorical=CATEGORICAL_COLUMNS)
     print(f"Anonymized data saved to {filename}")
 
 if __name__ == "__main__":
-    # Generate and save sample medical data
-    medical_data = generate_medical_data(1000)
-    save_anonymized_data(medical_data) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic anonymized medical data")
+    parser.add_argument('--records', type=int, default=1000, help='Number of records (default: 1000)')
+    parser.add_argument('--output', default="anonymized_medical_data.csv", help='Output file, format picked by extension')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows per generated chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for large datasets (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    args = parser.parse_args()
+
+    if args.records <= args.chunk_size:
+        # Generate and save sample medical data
+        medical_data = generate_medical_data(args.records, seed=args.seed, chunk_size=args.chunk_size)
+        save_anonymized_data(medical_data, args.output)
+    else:
+        # Stream chunks generated in parallel straight to disk
+        generate_medical_data_to_file(args.records, args.output, seed=args.seed,
+                                      chunk_size=args.chunk_size, workers=args.workers)
@@ -0,0 +1,300 @@
+"""
+Lightweight stage timers, counters and histograms.
+
+Instrumented code calls `timer(stage)` / `@timed(stage)` / `record(stage, seconds)` for
+durations and `count(name)` for events. Durations go into the histogram
+`agentforge_stage_duration_seconds{stage=...}`. Events are appended to a JSON lines log,
+and aggregates can be rendered as Prometheus text, written to a file or served over HTTP.
+
+Metrics are off by default. Turn them on with `configure(...)`, or with the
+AGENTFORGE_METRICS_LOG / AGENTFORGE_METRICS_PROM environment variables. When they are
+off, every call is a single flag check. Only the process that enabled metrics records
+them; forked worker processes are ignored, so their parents report the stage instead,
+unless the work runs through `run_captured`, which hands the worker's events back to
+the parent to `replay`.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+PREFIX = "agentforge_"
+# Histogram bucket upper bounds in seconds (Prometheus defaults, extended for training runs)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = False
+_pid = None
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_jsonl_path = None
+_jsonl_file = None
+_prometheus_path = None
+# Events recorded by a worker process for its parent (see run_captured)
+_captured = None
+_NULL_TIMER = nullcontext()
+
+
+def configure(jsonl_path=None, prometheus_path=None, enabled=True):
+    """
+    Turns metrics on (or off) for this process.
+
+    Args:
+        jsonl_path (str | None): File every timer/counter event is appended to.
+        prometheus_path (str | None): File the Prometheus text is written to on flush() and at exit.
+        enabled (bool): Set False to turn instrumentation off again.
+    """
+    global _enabled, _pid, _jsonl_path, _prometheus_path
+    with _lock:
+        _close_jsonl()
+        _enabled = enabled
+        _pid = os.getpid()
+        _jsonl_path = jsonl_path
+        _prometheus_path = prometheus_path
+
+
+def configure_from_env():
+    """Enables metrics if AGENTFORGE_METRICS_LOG or AGENTFORGE_METRICS_PROM is set."""
+    jsonl_path = os.getenv("AGENTFORGE_METRICS_LOG") or None
+    prometheus_path = os.getenv("AGENTFORGE_METRICS_PROM") or None
+    if jsonl_path or prometheus_path:
+        configure(jsonl_path, prometheus_path)
+
+
+def enabled():
+    return _enabled and (os.getpid() == _pid or _captured is not None)
+
+
+def _capturing():
+    return _captured is not None and os.getpid() != _pid
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _emit(event):
+    """Appends one event to the JSON lines log; must be called with the lock held."""
+    global _jsonl_file
+    if _jsonl_path is None:
+        return
+    if _jsonl_file is None:
+        _jsonl_file = open(_jsonl_path, "a", buffering=1 << 16)
+    _jsonl_file.write(json.dumps(event, default=str) + "\n")
+
+
+def _close_jsonl():
+    global _jsonl_file
+    if _jsonl_file is not None:
+        _jsonl_file.close()
+        _jsonl_file = None
+
+
+def observe(name, value, **labels):
+    """Adds value to the histogram `name`."""
+    if not enabled():
+        return
+    if _capturing():
+        _captured.append(('histogram', name, value, labels, time.time()))
+        return
+    _observe(name, value, labels, time.time())
+
+
+def _observe(name, value, labels, ts):
+    key = (name, _label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(DEFAULT_BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(DEFAULT_BUCKETS, value)] += 1
+        histogram[-1] += value
+        _emit({'ts': ts, 'type': 'histogram', 'name': name, 'value': value, 'labels': labels})
+
+
+def record(stage, seconds, **labels):
+    """Records a stage duration measured elsewhere (e.g. by a worker process)."""
+    if not enabled():
+        return
+    observe("stage_duration_seconds", seconds, stage=stage, **labels)
+
+
+def count(name, value=1, **labels):
+    """Increments the counter `name` by value."""
+    if not enabled():
+        return
+    if _capturing():
+        _captured.append(('counter', name, value, labels, time.time()))
+        return
+    _count(name, value, labels, time.time())
+
+
+def _count(name, value, labels, ts):
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        _emit({'ts': ts, 'type': 'counter', 'name': name, 'value': value, 'labels': labels})
+
+
+def run_captured(fn, *args):
+    """
+    Runs fn(*args) in a worker process, recording its metrics into a list instead of the
+    parent's log, and returns (result, events). The parent passes events to replay().
+    Used for work submitted to a process pool while metrics are on.
+    """
+    global _enabled, _captured
+    previous = _enabled, _captured
+    _enabled, _captured = True, []
+    try:
+        return fn(*args), _captured
+    finally:
+        _enabled, _captured = previous
+
+
+def replay(events):
+    """Records events captured by run_captured in a worker, keeping their original timestamps."""
+    if not enabled():
+        return
+    for kind, name, value, labels, ts in events:
+        if kind == 'histogram':
+            _observe(name, value, labels, ts)
+        else:
+            _count(name, value, labels, ts)
+
+
+class _Timer:
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels, status="error") if exc_type is not None else self.labels
+        record(self.stage, time.perf_counter() - self.start, **labels)
+        return False
+
+
+def timer(stage, **labels):
+    """Context manager timing one pipeline stage (a no-op when metrics are off)."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage, labels)
+
+
+def timed(stage, **labels):
+    """Decorator timing every call of the wrapped function as `stage`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Timer(stage, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    """Returns all counters and histograms in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(values)) for key, values in _histograms.items())
+
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}{name}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    for (name, labels), values in histograms:
+        metric = f"{PREFIX}{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(DEFAULT_BUCKETS + ("+Inf",), values[:-1]):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {values[-1]}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=None):
+    """Writes the Prometheus text to path (default: the configured prometheus_path)."""
+    path = path or _prometheus_path
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    # Atomic replace, so a scraper never reads a half-written file
+    os.replace(tmp_path, path)
+
+
+def flush():
+    """Flushes the JSON lines log and rewrites the Prometheus file."""
+    if not enabled():
+        return
+    with _lock:
+        if _jsonl_file is not None:
+            _jsonl_file.flush()
+    write_prometheus()
+
+
+def serve_prometheus(port=9100, addr="127.0.0.1"):
+    """Serves the Prometheus text on http://addr:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def reset():
+    """Drops all recorded values."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _shutdown():
+    if enabled():
+        flush()
+        with _lock:
+            _close_jsonl()
+
+
+atexit.register(_shutdown)
+configure_from_env()
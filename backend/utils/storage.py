@@ -0,0 +1,175 @@
+import os
+import pandas as pd
+
+# File extension -> storage format
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+
+def detect_format(path):
+    """Picks the storage format from the file extension."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported data file extension '{ext}'. Expected one of {sorted(FORMATS)}.")
+    return FORMATS[ext]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError("Parquet/Arrow storage requires pyarrow: pip install pyarrow") from None
+
+
+def _apply_dtypes(df, dtype):
+    """Casts columns to the requested dtypes (e.g. shared categorical vocabularies)."""
+    if not dtype:
+        return df
+    for col, col_dtype in dtype.items():
+        if col in df.columns and df[col].dtype != col_dtype:
+            df[col] = df[col].astype(col_dtype)
+    return df
+
+
+def write_table(df, path, categorical=None):
+    """
+    Writes df to path in the format implied by its extension.
+
+    Args:
+        df (pd.DataFrame): The data to store.
+        path (str): Target file (.csv, .parquet/.pq or .arrow/.feather/.ipc).
+        categorical (list[str] | None): Columns stored as categorical (dictionary encoded)
+                                        in the binary formats.
+    """
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+
+    _require_pyarrow()
+    if categorical:
+        df = df.astype({col: 'category' for col in categorical if col in df.columns})
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        import pyarrow.feather as feather
+        # Uncompressed IPC files can be memory-mapped and read without copying
+        feather.write_feather(df.reset_index(drop=True), path, compression='uncompressed')
+
+
+def read_table(path, dtype=None):
+    """
+    Reads a table written by write_table, picking the format from the extension.
+
+    Arrow IPC files are memory-mapped, and every column is converted into its own
+    block, so numeric columns without nulls are views of the mapped file (zero-copy)
+    instead of being parsed or consolidated.
+    """
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, dtype=dtype)
+
+    pa = _require_pyarrow()
+    if fmt == 'parquet':
+        df = pd.read_parquet(path)
+    else:
+        import pyarrow.ipc as ipc
+        with pa.memory_map(str(path), 'r') as source:
+            table = ipc.open_file(source).read_all()
+        # split_blocks avoids copying columns into consolidated 2D blocks; the table is not reused
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+    return _apply_dtypes(df, dtype)
+
+
+def iter_table(path, chunksize=100_000, dtype=None):
+    """Streams a table in chunks of at most chunksize rows, for any supported format."""
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        with pd.read_csv(path, dtype=dtype, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+        return
+
+    pa = _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+        for batch in batches:
+            yield _apply_dtypes(batch.to_pandas(split_blocks=True, self_destruct=True), dtype)
+        return
+
+    import pyarrow.ipc as ipc
+    with pa.memory_map(str(path), 'r') as source:
+        table = ipc.open_file(source).read_all()
+        for start in range(0, table.num_rows, chunksize):
+            # Slices share the table's buffers, so they are converted without self_destruct
+            yield _apply_dtypes(table.slice(start, chunksize).to_pandas(split_blocks=True), dtype)
+
+
+class TableWriter:
+    """
+    Appends DataFrame chunks to a single file without holding the whole table in memory.
+
+    Usage:
+        with TableWriter("data.parquet") as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+
+    Every chunk must have the same columns and dtypes. Categorical columns should use
+    the same categories in every chunk so Parquet/Arrow dictionaries stay consistent.
+    """
+
+    def __init__(self, path, categorical=None):
+        self.path = path
+        self.format = detect_format(path)
+        self.categorical = categorical or []
+        self.rows_written = 0
+        self._started = False
+        self._writer = None
+        self._sink = None
+        if self.format != 'csv':
+            _require_pyarrow()
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='a' if self._started else 'w', header=not self._started, index=False)
+            self._started = True
+            self.rows_written += len(df)
+            return
+
+        import pyarrow as pa
+        df = df.astype({col: 'category' for col in self.categorical if col in df.columns})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                import pyarrow.ipc as ipc
+                self._sink = pa.OSFile(str(self.path), 'wb')
+                self._writer = ipc.new_file(self._sink, table.schema)
+        self._writer.write_table(table)
+        self._started = True
+        self.rows_written += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        self._writer = None
+        self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,169 @@
+"""
+Small task-graph scheduler.
+
+Stages are declared with `TaskGraph.add(name, fn, deps, kind)` and run as soon as their
+dependencies finish, so independent stages overlap. Each stage is called with the
+results of its dependencies, in declaration order. I/O-bound stages ("io") run on an
+asyncio loop: coroutine functions are awaited directly and plain functions run in a
+thread. CPU-bound stages ("cpu") run in a process pool. If a stage fails, its dependents
+are skipped and unrelated stages keep running.
+
+After a run, `critical_path()` returns the chain of stages that determined the total
+wall time.
+"""
+import asyncio
+import inspect
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils import metrics
+
+TASK_KINDS = ("io", "cpu")
+CPU_EXECUTORS = ("process", "thread")
+
+
+class Task:
+    __slots__ = ("name", "fn", "deps", "kind")
+
+    def __init__(self, name, fn, deps, kind):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.kind = kind
+
+
+class TaskGraph:
+    def __init__(self, cpu_executor="process", max_workers=None):
+        """
+        Args:
+            cpu_executor (str): "process" (default) or "thread" for "cpu" stages. Metrics
+                                recorded by stages in worker processes are sent back and
+                                replayed in this process.
+            max_workers (int | None): Size of the pool used for "cpu" stages.
+        """
+        if cpu_executor not in CPU_EXECUTORS:
+            raise ValueError(f"Unknown cpu_executor '{cpu_executor}'. Expected one of {CPU_EXECUTORS}.")
+        self.cpu_executor = cpu_executor
+        self.max_workers = max_workers
+        self.tasks = {}
+        # name -> {'status', 'start', 'end', 'duration', 'error'}; times are seconds since run start
+        self.records = {}
+        self.wall_time = 0.0
+
+    def add(self, name, fn, deps=(), kind="io"):
+        """Declares a stage. fn(*dependency_results) may be a plain or a coroutine function."""
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already defined.")
+        if kind not in TASK_KINDS:
+            raise ValueError(f"Unknown task kind '{kind}'. Expected one of {TASK_KINDS}.")
+        self.tasks[name] = Task(name, fn, deps, kind)
+        return self
+
+    def order(self):
+        """Returns the task names in a dependency-respecting order; raises on unknown deps or cycles."""
+        for task in self.tasks.values():
+            missing = [dep for dep in task.deps if dep not in self.tasks]
+            if missing:
+                raise ValueError(f"Task '{task.name}' depends on unknown task(s) {missing}.")
+        ordered, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.tasks[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            ordered.append(name)
+
+        for name in self.tasks:
+            visit(name, [])
+        return ordered
+
+    def run(self):
+        """Runs every stage and returns {name: result} for the stages that succeeded."""
+        return asyncio.run(self.run_async())
+
+    async def run_async(self):
+        self.order()
+        self.records = {}
+        results = {}
+        started = time.perf_counter()
+        pool_cls = ProcessPoolExecutor if self.cpu_executor == "process" else ThreadPoolExecutor
+        loop = asyncio.get_running_loop()
+
+        with pool_cls(max_workers=self.max_workers) as cpu_pool:
+            running = {}
+
+            async def run_task(task):
+                dep_states = await asyncio.gather(*(running[dep] for dep in task.deps))
+                if not all(dep_states):
+                    self.records[task.name] = {'status': "skipped"}
+                    return False
+                args = [results[dep] for dep in task.deps]
+                start = time.perf_counter()
+                try:
+                    if inspect.iscoroutinefunction(task.fn):
+                        result = await task.fn(*args)
+                    elif task.kind == "cpu" and self.cpu_executor == "process" and metrics.enabled():
+                        result, events = await loop.run_in_executor(cpu_pool, metrics.run_captured, task.fn, *args)
+                        metrics.replay(events)
+                    elif task.kind == "cpu":
+                        result = await loop.run_in_executor(cpu_pool, task.fn, *args)
+                    else:
+                        result = await asyncio.to_thread(task.fn, *args)
+                    status, error = "done", None
+                except Exception as e:
+                    status, error = "failed", e
+                end = time.perf_counter()
+                self.records[task.name] = {'status': status, 'start': start - started, 'end': end - started,
+                                           'duration': end - start, 'error': error}
+                metrics.record("task", end - start, task=task.name, status=status)
+                if status == "done":
+                    results[task.name] = result
+                    return True
+                print(f"❌ Stage '{task.name}' failed: {error}")
+                return False
+
+            # Tasks are created in dependency order, so every dependency already has its task
+            for name in self.order():
+                running[name] = asyncio.ensure_future(run_task(self.tasks[name]))
+            await asyncio.gather(*running.values())
+        self.wall_time = time.perf_counter() - started
+        return results
+
+    def critical_path(self):
+        """
+        Returns (names, seconds): the chain of stages, walking back from the last one to
+        finish through the dependency that finished last, that bounded the run's wall time.
+        """
+        finished = {name: r for name, r in self.records.items() if 'end' in r}
+        if not finished:
+            return [], 0.0
+        name = max(finished, key=lambda n: finished[n]['end'])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.tasks[name].deps if dep in finished]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: finished[n]['end'])
+            path.append(name)
+        path.reverse()
+        return path, finished[path[-1]]['end'] - finished[path[0]]['start']
+
+    def format_report(self):
+        """Per-stage timings followed by the critical path, as printable text."""
+        lines = ["Stage timings (seconds since start):"]
+        for name in self.order():
+            record = self.records.get(name, {'status': "not run"})
+            if 'end' in record:
+                lines.append(f"  {name:<24} {record['status']:<8} {record['start']:8.3f} -> {record['end']:8.3f}"
+                             f"  ({record['duration']:.3f}s, {self.tasks[name].kind})")
+            else:
+                lines.append(f"  {name:<24} {record['status']}")
+        path, seconds = self.critical_path()
+        if path:
+            lines.append(f"Critical path ({seconds:.3f}s of {self.wall_time:.3f}s wall time): " + " -> ".join(path))
+        return "\n".join(lines)